@@ -0,0 +1,204 @@
+import math
+import time
+
+import cv2
+
+class AdaptiveSampler:
+    """
+    Score a video coarse-to-fine and stop once the majority vote is settled
+    
+    The candidate frames are the same evenly spaced grid the fixed mode
+    scores. A sparse pass comes first; later rounds bisect the gaps between
+    scored frames, starting with gaps whose ends disagree. After each round
+    a stopping rule checks whether scoring the rest of the grid could still
+    flip the overall Real/Fake vote.
+    
+    Frames are read at their exact grid positions (keyframe snapping would
+    move them off the grid), with the access pattern costed once per video.
+    Frames that fail to decode are left out of the results and the vote.
+    """
+    
+    def __init__(self, video_processor, preprocess_fn, predict_fn, initial_frames=10,
+                 min_frames=10, confidence_z=2.58):
+        """
+        Args:
+            video_processor: VideoProcessor used to read frames
+            preprocess_fn: Callable frame -> model input tensor
+            predict_fn: Callable list of inputs -> list of prediction dicts
+            initial_frames: Frames in the first, sparse pass
+            min_frames: Never stop on the statistical rule before this many frames
+            confidence_z: z-score the estimated fake share must clear 50% by
+                (2.58 ~ 99% two-sided)
+        """
+        self.video_processor = video_processor
+        self.preprocess_fn = preprocess_fn
+        self.predict_fn = predict_fn
+        self.initial_frames = max(2, int(initial_frames))
+        self.min_frames = max(1, int(min_frames))
+        self.confidence_z = float(confidence_z)
+    
+    def run(self, video_path, max_frames, progress_callback=None):
+        """
+        Adaptively score up to max_frames evenly spaced frames
+        
+        Returns:
+            dict: Same shape as FramePipeline.run, plus 'frames_scored',
+                'frames_available' and 'stop_reason'
+        """
+        start_time = time.time()
+        cap = cv2.VideoCapture(video_path)
+        try:
+            if not cap.isOpened():
+                raise ValueError("Could not open video file")
+            
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            skip_frames = max(1, total_frames // max(1, max_frames))
+            grid = list(range(0, total_frames, skip_frames)[:max_frames])
+            costs = self.video_processor.sampler.measure_costs(cap, grid) if grid else None
+            
+            scored = {}  # grid position -> prediction dict
+            unreadable = set()  # Grid positions that could not be decoded
+            stop_reason = 'exhausted'
+            
+            for positions in self._rounds(grid, scored, unreadable):
+                self._score(cap, grid, positions, scored, unreadable, costs)
+                
+                if progress_callback:
+                    progress_callback(len(scored) + len(unreadable), len(grid))
+                
+                reason = self._stop_reason(scored, len(grid) - len(unreadable))
+                if reason:
+                    stop_reason = reason
+                    break
+        finally:
+            cap.release()
+        
+        positions = sorted(scored)
+        return {
+            'positions': positions,
+            'timestamps': [grid[p] / fps if fps > 0 else 0 for p in positions],
+            'predictions': [scored[p] for p in positions],
+            'reused_from': [None] * len(positions),
+            'frames_reused': 0,
+            'frames_scored': len(positions),
+            'frames_available': len(grid),
+            'stop_reason': stop_reason,
+            'processing_time': time.time() - start_time
+        }
+    
+    def _rounds(self, grid, scored, unreadable):
+        """Yield lists of grid positions to score, sparse first, then refining"""
+        count = len(grid)
+        if count == 0:
+            return
+        
+        first = sorted({int(round(i * (count - 1) / max(1, self.initial_frames - 1)))
+                        for i in range(min(self.initial_frames, count))})
+        yield first
+        
+        def is_fake(position):
+            return position in scored and self._is_fake(scored[position])
+        
+        while len(scored) + len(unreadable) < count:
+            known = sorted(set(scored) | unreadable)
+            changing, stable = [], []
+            for left, right in zip(known, known[1:]):
+                if right - left < 2:
+                    continue
+                middle = (left + right) // 2
+                if is_fake(left) != is_fake(right):
+                    changing.append(middle)
+                else:
+                    stable.append(middle)
+            
+            # Gaps at the ends of the grid (only when the first pass could not cover them)
+            if known[0] > 0:
+                stable.append(known[0] // 2)
+            if known[-1] < count - 1:
+                stable.append((known[-1] + count) // 2)
+            
+            if not changing and not stable:
+                # Only adjacent positions left; fill whatever remains
+                remaining = [p for p in range(count) if p not in scored and p not in unreadable]
+                if remaining:
+                    yield remaining
+                return
+            
+            # Refine where the verdict changes before spreading evenly
+            if changing:
+                yield changing
+            if stable:
+                yield stable
+    
+    def _score(self, cap, grid, positions, scored, unreadable, costs):
+        """Decode, preprocess and predict the given grid positions"""
+        positions = [p for p in positions if p not in scored and p not in unreadable]
+        if not positions:
+            return
+        
+        by_index = {grid[p]: p for p in positions}
+        frame_indices = sorted(by_index)
+        inputs = []
+        read_positions = []
+        for frame_idx, frame in self.video_processor.read_frames(cap, frame_indices, as_arrays=True,
+                                                                 exact=True, costs=costs):
+            inputs.append(self.preprocess_fn(frame))
+            read_positions.append(by_index[frame_idx])
+        
+        predictions = self.predict_fn(inputs) if inputs else []
+        for position, prediction in zip(read_positions, predictions):
+            scored[position] = prediction
+        
+        # Remembered so refinement terminates, but never scored or voted on
+        unreadable.update(p for p in positions if p not in scored)
+    
+    @staticmethod
+    def _is_fake(prediction):
+        return prediction['prediction'] == 'Fake'
+    
+    @staticmethod
+    def _is_error(prediction):
+        return prediction['prediction'] == 'Error'
+    
+    def _stop_reason(self, scored, grid_size):
+        """
+        Decide whether scoring more frames could still flip the vote
+        
+        Frames the model failed on (placeholder 'Error' predictions) vote
+        neither way and do not count as evidence.
+        
+        Args:
+            scored: Grid position -> prediction
+            grid_size: Grid positions that can be decoded
+        
+        Returns:
+            str: 'decided', 'confident' or None to keep going
+        """
+        if len(scored) >= grid_size:
+            return None
+        
+        errors = sum(1 for prediction in scored.values() if self._is_error(prediction))
+        scored_count = len(scored) - errors
+        grid_size -= errors
+        fake_count = sum(1 for prediction in scored.values() if self._is_fake(prediction))
+        real_count = scored_count - fake_count
+        
+        # The fixed mode calls "Fake" when more than half of the frames are fake
+        if fake_count * 2 > grid_size or real_count * 2 >= grid_size:
+            return 'decided'
+        
+        if scored_count < self.min_frames:
+            return None
+        
+        # Unscored frames are treated as a sample from the same video: estimate the
+        # fake share with a finite-population standard error (Laplace-smoothed so
+        # unanimous samples do not give a zero-width interval)
+        share = fake_count / scored_count
+        smoothed = (fake_count + 1) / (scored_count + 2)
+        finite_correction = (grid_size - scored_count) / max(1, grid_size - 1)
+        standard_error = math.sqrt(smoothed * (1 - smoothed) / scored_count * finite_correction)
+        
+        if abs(share - 0.5) > self.confidence_z * standard_error:
+            return 'confident'
+        return None
@@ -2,14 +2,33 @@ import os
 import uuid
 import time
 import json
-from flask import Flask, request, jsonify, send_file
+import hashlib
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
+from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
+from urllib.parse import quote
 import threading
+import multiprocessing
 from datetime import datetime
 
-from model_loader import DeepfakeDetector
-from video_processor import VideoProcessor
+from video_processor import VideoProcessor, MAX_ANALYSIS_FRAMES
+from frame_pipeline import FramePipeline
+from face_crops import FaceDetector, FaceTracker, FaceCropStage
+from score_aggregation import ScoreAggregator
+from adaptive_sampler import AdaptiveSampler
+from inference_scheduler import InferenceScheduler
+from job_executor import JobExecutor, QueueFullError
+from chunked_upload import ChunkedUploads, UploadError
+from job_store import create_job_store
+from job_events import JobEvents
+from memory_monitor import PeakRSSMonitor, current_rss
+from metrics import (JOB_SECONDS, PROFILE_MODES, QUEUE_WAIT_SECONDS, REGISTRY, UPLOAD_SECONDS, JobProfile,
+                     activate_profile, deactivate_profile, record_stage)
+from sampling_profiler import SamplingProfiler
+from result_cache import ResultCache, file_sha256, make_cache_key
+from results_format import (CONTENT_ENCODINGS, EncodedResponseCache, build_results, compress,
+                            parse_results_query, results_etag)
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -20,96 +39,428 @@ UPLOAD_FOLDER = 'uploads'
 MODEL_PATH = 'models/vision_transformer_model.pth'
 MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB
 ALLOWED_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv'}
+VIDEO_MIME_TYPES = {
+    '.mp4': 'video/mp4',
+    '.avi': 'video/x-msvideo',
+    '.mov': 'video/quicktime',
+    '.mkv': 'video/x-matroska',
+    '.wmv': 'video/x-ms-wmv',
+    '.flv': 'video/x-flv'
+}
+# Frames per model forward pass; an integer or 'auto' to size from free memory
+INFERENCE_BATCH_SIZE = os.environ.get('INFERENCE_BATCH_SIZE', '16')
+# Model execution backend: fp32, int8, torchscript, compile or onnx
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'fp32')
+# Input preprocessing: vectorized (batched, reused buffers) or pil (original per-frame transform)
+PREPROCESSING = os.environ.get('PREPROCESSING', 'vectorized')
+# EfficientNet-B0 checkpoint to screen frames before the ViT (empty disables the cascade);
+# only screener probabilities within [CASCADE_LOW, CASCADE_HIGH] are sent on to the ViT
+SCREENER_MODEL_PATH = os.environ.get('SCREENER_MODEL_PATH', '')
+CASCADE_LOW = float(os.environ.get('CASCADE_LOW', '0.2'))
+CASCADE_HIGH = float(os.environ.get('CASCADE_HIGH', '0.8'))
+# Load and warm up the model when the server starts instead of on the first job
+WARMUP_ON_STARTUP = os.environ.get('WARMUP_ON_STARTUP', 'true').lower() == 'true'
+# How long the shared scheduler waits to fill a batch across jobs
+SCHEDULER_MAX_WAIT_MS = float(os.environ.get('SCHEDULER_MAX_WAIT_MS', '10'))
+# Frame access pattern: auto, sequential, seek or keyframe
+SAMPLING_STRATEGY = os.environ.get('SAMPLING_STRATEGY', 'auto')
+# Allow 'auto' to move samples onto keyframes (faster, but changes sampled frames)
+SNAP_TO_KEYFRAMES = os.environ.get('SNAP_TO_KEYFRAMES', 'false').lower() == 'true'
+# Decoder processes for long videos (0 disables) and the duration that enables them
+PARALLEL_DECODE_WORKERS = int(os.environ.get('PARALLEL_DECODE_WORKERS', '0'))
+PARALLEL_DECODE_MIN_DURATION = float(os.environ.get('PARALLEL_DECODE_MIN_DURATION', '120'))
+# Shorter side decoded frames are shrunk to right after decoding (0 keeps full resolution)
+WORKING_RESOLUTION = int(os.environ.get('WORKING_RESOLUTION', '360'))
+# Decoded/preprocessed frames buffered between pipeline stages per job
+PIPELINE_BUFFER_SIZE = int(os.environ.get('PIPELINE_BUFFER_SIZE', '8'))
+# Reuse predictions for frames within this dHash Hamming distance (-1 disables)
+FRAME_DEDUP_DISTANCE = int(os.environ.get('FRAME_DEDUP_DISTANCE', '-1'))
+# 'fixed' scores every sampled frame; 'adaptive' scores coarse-to-fine and stops early
+SAMPLING_MODE = os.environ.get('SAMPLING_MODE', 'fixed')
+ADAPTIVE_MIN_FRAMES = int(os.environ.get('ADAPTIVE_MIN_FRAMES', '10'))
+ADAPTIVE_CONFIDENCE_Z = float(os.environ.get('ADAPTIVE_CONFIDENCE_Z', '2.58'))
+# Video-level score and suspicious segments: logit pooling (mean or trimmed_mean),
+# temporal smoothing (none, ema or median), and the smoothed fake score that marks a segment
+SCORE_POOLING = os.environ.get('SCORE_POOLING', 'trimmed_mean')
+SCORE_SMOOTHING = os.environ.get('SCORE_SMOOTHING', 'ema')
+SEGMENT_THRESHOLD = float(os.environ.get('SEGMENT_THRESHOLD', '0.5'))
+MIN_SEGMENT_FRAMES = int(os.environ.get('MIN_SEGMENT_FRAMES', '2'))
+# Score face crops instead of whole frames (OpenCV Haar cascade, or YuNet when a model path is set)
+FACE_CROP = os.environ.get('FACE_CROP', 'false').lower() == 'true'
+FACE_DETECTOR_MODEL = os.environ.get('FACE_DETECTOR_MODEL', '')
+MAX_FACES_PER_FRAME = int(os.environ.get('MAX_FACES_PER_FRAME', '4'))
+FACE_DETECT_INTERVAL = int(os.environ.get('FACE_DETECT_INTERVAL', '5'))
+# Job state backend: memory (single process) or sqlite (shared by several server processes)
+JOB_STORE = os.environ.get('JOB_STORE', 'memory')
+JOB_STORE_PATH = os.environ.get('JOB_STORE_PATH', 'cache/jobs.db')
+# Finished jobs and their videos are evicted this long after their last update
+JOB_TTL_SECONDS = float(os.environ.get('JOB_TTL_SECONDS', '3600'))
+JOB_EVICT_INTERVAL = float(os.environ.get('JOB_EVICT_INTERVAL', '60'))
+# A job processing in another worker that has not been updated this long is
+# failed as abandoned (sooner if that worker's process is gone from this host)
+JOB_STALE_SECONDS = float(os.environ.get('JOB_STALE_SECONDS', '600'))
+# Status streams send a keep-alive comment this often; long polls wait at most this long
+STATUS_STREAM_HEARTBEAT = float(os.environ.get('STATUS_STREAM_HEARTBEAT', '15'))
+STATUS_LONG_POLL_TIMEOUT = float(os.environ.get('STATUS_LONG_POLL_TIMEOUT', '25'))
+# Streams and long polls each hold a server thread while they wait; past this
+# many per process, clients are told to come back later (plain polling)
+MAX_STATUS_WAITERS = int(os.environ.get('MAX_STATUS_WAITERS', '16'))
+STATUS_BUSY_RETRY_SECONDS = int(os.environ.get('STATUS_BUSY_RETRY_SECONDS', '2'))
+# Changes made by other processes sharing the store do not notify this one, so
+# status waiters re-read a shared store this often
+STATUS_RECHECK_SECONDS = float(os.environ.get(
+    'STATUS_RECHECK_SECONDS', '1' if JOB_STORE == 'sqlite' else str(STATUS_STREAM_HEARTBEAT)))
+# Concurrent video jobs, jobs allowed to wait, and the Retry-After hint when full
+MAX_CONCURRENT_JOBS = int(os.environ.get('MAX_CONCURRENT_JOBS', '2'))
+MAX_PENDING_JOBS = int(os.environ.get('MAX_PENDING_JOBS', '20'))
+RETRY_AFTER_SECONDS = int(os.environ.get('RETRY_AFTER_SECONDS', '30'))
+# Result cache for re-uploaded videos: memory LRU entries, TTL, disk tier location/size
+RESULT_CACHE_SIZE = int(os.environ.get('RESULT_CACHE_SIZE', '256'))
+RESULT_CACHE_TTL = float(os.environ.get('RESULT_CACHE_TTL', '86400'))
+RESULT_CACHE_DIR = os.environ.get('RESULT_CACHE_DIR', 'cache/results')
+RESULT_CACHE_MAX_DISK_MB = int(os.environ.get('RESULT_CACHE_MAX_DISK_MB', '512'))
+# Completed results are immutable: clients and proxies may cache them this long (seconds)
+RESULTS_CACHE_MAX_AGE = int(os.environ.get('RESULTS_CACHE_MAX_AGE', '3600'))
+# Results responses at least this large are gzip/brotli compressed when the client accepts it
+RESULTS_COMPRESS_MIN_BYTES = int(os.environ.get('RESULTS_COMPRESS_MIN_BYTES', '1024'))
+RESULTS_COMPRESS_LEVEL = int(os.environ.get('RESULTS_COMPRESS_LEVEL', '6'))
+# Rendered results bodies kept in memory for repeat requests
+RESULTS_RESPONSE_CACHE_SIZE = int(os.environ.get('RESULTS_RESPONSE_CACHE_SIZE', '32'))
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+# Internal nginx location mapped to UPLOAD_FOLDER (e.g. /protected-uploads/); when set,
+# /api/video hands the transfer to nginx with X-Accel-Redirect instead of streaming it
+VIDEO_ACCEL_REDIRECT = os.environ.get('VIDEO_ACCEL_REDIRECT', '')
+# Uploaded videos never change: browsers may reuse them this long (seconds) without revalidating
+VIDEO_CACHE_MAX_AGE = int(os.environ.get('VIDEO_CACHE_MAX_AGE', '3600'))
+# Resumable uploads idle for longer than this (seconds) are discarded
+UPLOAD_SESSION_TTL = float(os.environ.get('UPLOAD_SESSION_TTL', '86400'))
+# Per-job profile added to results: off, stages (time per pipeline stage) or sampling
+# (stages plus sampled thread stacks); an upload can ask for one with its profile field
+JOB_PROFILE = os.environ.get('JOB_PROFILE', 'off')
+# Stack sampling interval and the most frequent stacks kept in a sampling profile
+PROFILER_INTERVAL_MS = float(os.environ.get('PROFILER_INTERVAL_MS', '10'))
+PROFILER_MAX_STACKS = int(os.environ.get('PROFILER_MAX_STACKS', '50'))
+# Threads that work on a job besides its worker (shared with jobs running at the same time)
+PROFILED_THREAD_NAMES = ('pipeline-decode', 'pipeline-preprocess', 'inference-scheduler')
 
-# Ensure upload directory exists
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# False in multiprocessing children: spawned decoder processes re-import this
+# module (as __mp_main__ under `python app.py`) and only need the decode function,
+# so they must not open the job store, start threads or create directories
+IS_SERVER_PROCESS = multiprocessing.parent_process() is None
+
+job_events = JobEvents()  # Wakes status streams and long polls when a job changes
+results_responses = EncodedResponseCache(RESULTS_RESPONSE_CACHE_SIZE)  # Rendered results bodies
+
+def on_job_changed(job_id, deleted=False):
+    """Job store listener: wake whoever is watching the job"""
+    if deleted:
+        job_events.forget(job_id)
+    else:
+        job_events.notify(job_id)
 
-# Global variables for job tracking
-jobs = {}  # Store job status and results
 detector = None  # Will be initialized on first use
-video_processor = VideoProcessor()
+scheduler = None  # Batches frames from all jobs onto the shared detector
+model_lock = threading.Lock()
+model_ready = threading.Event()  # Set once the model is loaded and warmed up
+model_error = None
+video_processor = VideoProcessor(
+    sampling_strategy=SAMPLING_STRATEGY,
+    snap_to_keyframes=SNAP_TO_KEYFRAMES,
+    parallel_workers=PARALLEL_DECODE_WORKERS,
+    parallel_min_duration=PARALLEL_DECODE_MIN_DURATION,
+    working_size=WORKING_RESOLUTION
+)
+score_aggregator = ScoreAggregator(
+    pooling=SCORE_POOLING,
+    smoothing=SCORE_SMOOTHING,
+    segment_threshold=SEGMENT_THRESHOLD,
+    min_segment_frames=MIN_SEGMENT_FRAMES
+)
+model_fingerprint = None  # SHA-256 of the weights file, computed on first upload
+fingerprint_lock = threading.Lock()
+
+if IS_SERVER_PROCESS:
+    # Ensure upload directory exists
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    
+    job_store = create_job_store(JOB_STORE, JOB_STORE_PATH, ttl_seconds=JOB_TTL_SECONDS)  # Job status and results
+    job_store.add_listener(on_job_changed)
+    chunked_uploads = ChunkedUploads(  # Resumable uploads in progress
+        os.path.join(UPLOAD_FOLDER, 'incoming'),
+        MAX_FILE_SIZE,
+        session_ttl=UPLOAD_SESSION_TTL,
+        chunk_size=UPLOAD_CHUNK_SIZE
+    )
+    job_executor = JobExecutor(max_workers=MAX_CONCURRENT_JOBS, max_pending=MAX_PENDING_JOBS)
+    result_cache = ResultCache(
+        max_entries=RESULT_CACHE_SIZE,
+        ttl_seconds=RESULT_CACHE_TTL,
+        cache_dir=RESULT_CACHE_DIR or None,
+        max_disk_bytes=RESULT_CACHE_MAX_DISK_MB * 1024 * 1024
+    )
+
+# Gauges read live state when /api/metrics is scraped; histograms are recorded where the work happens
+REGISTRY.gauge('deepfake_active_jobs', 'Jobs running on a worker', lambda: job_executor.get_stats()['active_jobs'])
+REGISTRY.gauge('deepfake_pending_jobs', 'Jobs waiting for a worker', lambda: job_executor.get_stats()['pending_jobs'])
+REGISTRY.gauge('deepfake_jobs', 'Jobs held by the job store', lambda: job_store.get_stats()['by_status'],
+               labelname='status')
+REGISTRY.gauge('deepfake_model_memory_bytes', 'Bytes of model weights loaded (ViT and screener)',
+               lambda: detector.model_memory_bytes if detector is not None else 0)
+REGISTRY.gauge('deepfake_model_loaded', '1 once the model is loaded and warmed up', lambda: int(model_ready.is_set()))
+REGISTRY.gauge('process_resident_memory_bytes', 'Resident memory of this server process', current_rss)
 
 def initialize_model():
-    """Initialize the deepfake detection model"""
-    global detector
+    """Initialize the deepfake detection model and its inference scheduler"""
+    global detector, scheduler, model_error
+    with model_lock:
+        if detector is None:
+            try:
+                # Imported here so spawned decoder processes never load torch
+                from model_loader import DeepfakeDetector
+                detector = DeepfakeDetector(
+                    MODEL_PATH,
+                    batch_size=INFERENCE_BATCH_SIZE,
+                    backend=INFERENCE_BACKEND,
+                    preprocessing=PREPROCESSING,
+                    screener_path=SCREENER_MODEL_PATH or None,
+                    cascade_band=(CASCADE_LOW, CASCADE_HIGH)
+                )
+                scheduler = InferenceScheduler(
+                    detector,
+                    max_batch_size=detector.batch_size,
+                    max_wait_ms=SCHEDULER_MAX_WAIT_MS
+                )
+                detector.warmup()
+                model_error = None
+                model_ready.set()
+                print("Model initialized successfully")
+            except Exception as e:
+                print(f"Error initializing model: {e}")
+                model_error = str(e)
+                detector = None
+                scheduler = None
+
+def model_stats():
+    """Model load and warm-up timings"""
     if detector is None:
-        try:
-            detector = DeepfakeDetector(MODEL_PATH)
-            print("Model initialized successfully")
-        except Exception as e:
-            print(f"Error initializing model: {e}")
-            detector = None
+        return {'loaded': False, 'error': model_error}
+    return {
+        'loaded': True,
+        'backend': detector.backend,
+        'batch_size': detector.batch_size,
+        'load_seconds': detector.load_time,
+        'first_inference_seconds': detector.warmup_time,
+        'cascade': {
+            'band': list(detector.cascade_band),
+            'decided_by': dict(detector.cascade_counts)
+        } if detector.cascade_band else None
+    }
+
+def get_model_fingerprint():
+    """Hash the model weights (and screener weights) once so cached results are tied to the exact models"""
+    global model_fingerprint
+    with fingerprint_lock:
+        if model_fingerprint is None and os.path.exists(MODEL_PATH):
+            fingerprint = file_sha256(MODEL_PATH)
+            if SCREENER_MODEL_PATH and os.path.exists(SCREENER_MODEL_PATH):
+                fingerprint = hashlib.sha256(f"{fingerprint}:{file_sha256(SCREENER_MODEL_PATH)}".encode()).hexdigest()
+            model_fingerprint = fingerprint
+    return model_fingerprint
+
+def analysis_params():
+    """Settings that change which frames are scored and how, for the cache key"""
+    return {
+        'max_frames': MAX_ANALYSIS_FRAMES,
+        'snap_to_keyframes': SNAP_TO_KEYFRAMES,
+        'sampling_strategy': SAMPLING_STRATEGY if SAMPLING_STRATEGY == 'keyframe' else 'exact',
+        'working_resolution': WORKING_RESOLUTION,
+        'parallel_decode': video_processor.parallel_decoder.max_side if video_processor.parallel_decoder else None,
+        'dedup_distance': FRAME_DEDUP_DISTANCE if FRAME_DEDUP_DISTANCE >= 0 else None,
+        'sampling_mode': SAMPLING_MODE,
+        'inference_backend': INFERENCE_BACKEND,
+        'preprocessing': PREPROCESSING,
+        'adaptive': [ADAPTIVE_MIN_FRAMES, ADAPTIVE_CONFIDENCE_Z] if SAMPLING_MODE == 'adaptive' else None,
+        'aggregation': score_aggregator.get_settings(),
+        'face_crop': [FACE_DETECTOR_MODEL or 'haar', MAX_FACES_PER_FRAME, FACE_DETECT_INTERVAL] if FACE_CROP else None,
+        'cascade': [CASCADE_LOW, CASCADE_HIGH] if SCREENER_MODEL_PATH else None
+    }
+
+def save_upload(file, file_path):
+    """Write an uploaded file to disk in chunks, hashing it on the way"""
+    digest = hashlib.sha256()
+    with open(file_path, 'wb') as out:
+        for chunk in iter(lambda: file.stream.read(UPLOAD_CHUNK_SIZE), b''):
+            digest.update(chunk)
+            out.write(chunk)
+    return digest.hexdigest()
+
+def requested_profile(value):
+    """
+    Validate the profile an upload asked for
+    
+    Returns:
+        str: One of PROFILE_MODES, or None to use the JOB_PROFILE default
+    
+    Raises:
+        ValueError: For an unknown mode
+    """
+    if not value:
+        return None
+    if value not in PROFILE_MODES:
+        raise ValueError(f"profile must be one of: {', '.join(PROFILE_MODES)}")
+    return value
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return os.path.splitext(filename)[1].lower() in ALLOWED_EXTENSIONS
 
-def process_video_job(job_id, video_path):
-    """Background job to process video"""
-    global jobs, detector
+def process_video_job(job_id, video_path, cache_key=None, profile_mode=None):
+    """Background job to process video (profile_mode overrides JOB_PROFILE for this job)"""
+    global detector, scheduler
+    
+    # Another server process may have picked the job up already
+    if not job_store.claim(job_id):
+        return
+    notify_queue_moved()
+    
+    claimed = time.perf_counter()
+    job = job_store.get(job_id, include_frames=False)
+    queue_wait = max(0.0, time.time() - job['created_ts']) if job else 0.0
+    QUEUE_WAIT_SECONDS.observe(queue_wait)
+    
+    # Stage timings recorded on this thread (and the pipeline threads it starts) go to the profile
+    profile_mode = profile_mode or JOB_PROFILE
+    profile = JobProfile() if profile_mode != 'off' else None
+    profile_token = activate_profile(profile)
+    stack_profiler = None
+    if profile_mode == 'sampling':
+        stack_profiler = SamplingProfiler(
+            PROFILER_INTERVAL_MS,
+            thread_ids=(threading.get_ident(),),
+            thread_names=PROFILED_THREAD_NAMES
+        ).start()
     
+    status = 'error'
+    memory_monitor = PeakRSSMonitor().start()
     try:
         # Update job status
-        jobs[job_id]['status'] = 'processing'
-        jobs[job_id]['progress'] = 10
-        jobs[job_id]['video_path'] = video_path  # Store video path for later serving
+        job_store.update(job_id, progress=10)
         
-        # Process video and extract frames
-        def progress_callback(progress):
-            jobs[job_id]['progress'] = min(30 + progress * 0.3, 60)
-        
-        video_results = video_processor.process_video_for_analysis(
-            video_path, 
-            progress_callback
-        )
-        
-        if 'error' in video_results:
-            jobs[job_id]['status'] = 'error'
-            jobs[job_id]['error'] = video_results['error']
+        video_info = video_processor.get_video_info(video_path)
+        if not video_info or video_info['frame_count'] <= 0:
+            job_store.update(job_id, status='error', error='Could not process video')
             return
         
-        jobs[job_id]['progress'] = 60
-        
         # Initialize model if not already done
         if detector is None:
             initialize_model()
-            
-        if detector is None:
-            jobs[job_id]['status'] = 'error'
-            jobs[job_id]['error'] = 'Model initialization failed'
+        
+        if scheduler is None:
+            job_store.update(job_id, status='error', error='Model initialization failed')
             return
         
-        # Process frames through the model
-        frames_data = video_results['frames_data']
-        frame_results = []
+        # Stream frames through decode -> preprocess -> shared batching scheduler
+        last_progress = [10]
+        
+        def inference_progress(done, total):
+            progress = int(10 + (done / total) * 85)
+            # Only write when the percentage changes
+            if progress != last_progress[0]:
+                last_progress[0] = progress
+                job_store.update(job_id, progress=progress)
+        
+        def predict_fn(inputs):
+            # Wall time the job waits for its frames, including queueing in shared batches
+            start = time.perf_counter()
+            predictions = scheduler.predict_frames(inputs)
+            if inputs:
+                record_stage('inference', (time.perf_counter() - start) / len(inputs), count=len(inputs))
+            return predictions
         
-        total_frames = len(frames_data)
+        preprocess_fn = detector.preprocess
+        face_stage = None
+        if FACE_CROP:
+            # Detect/track faces in the preprocess stage and score one crop per face
+            tracker = FaceTracker(
+                FaceDetector(FACE_DETECTOR_MODEL or None),
+                detect_interval=FACE_DETECT_INTERVAL,
+                max_faces=MAX_FACES_PER_FRAME
+            )
+            face_stage = FaceCropStage(tracker, preprocess_fn, predict_fn, source_width=video_info['width'])
+            preprocess_fn = face_stage.preprocess
+            predict_fn = face_stage.predict
+        
+        max_frames = min(MAX_ANALYSIS_FRAMES, video_info['frame_count'])
+        if SAMPLING_MODE == 'adaptive':
+            sampler = AdaptiveSampler(
+                video_processor,
+                preprocess_fn,
+                predict_fn,
+                min_frames=ADAPTIVE_MIN_FRAMES,
+                confidence_z=ADAPTIVE_CONFIDENCE_Z
+            )
+            pipeline_results = sampler.run(video_path, max_frames, progress_callback=inference_progress)
+        else:
+            pipeline = FramePipeline(
+                lambda path, count: video_processor.iter_frames_with_timestamps(path, count, as_arrays=True),
+                preprocess_fn,
+                predict_fn,
+                batch_size=detector.batch_size,
+                buffer_size=PIPELINE_BUFFER_SIZE,
+                dedup_distance=FRAME_DEDUP_DISTANCE if FRAME_DEDUP_DISTANCE >= 0 else None
+            )
+            pipeline_results = pipeline.run(video_path, max_frames, progress_callback=inference_progress)
+        
+        aggregation_start = time.perf_counter()
+        timestamps = pipeline_results['timestamps']
+        predictions = pipeline_results['predictions']
+        reused_from = pipeline_results['reused_from']
+        # Adaptive mode scores a subset of the grid; keep grid positions as frame numbers
+        positions = pipeline_results.get('positions', range(len(predictions)))
+        total_frames = len(predictions)
+        # Decode errors end the frame stream early rather than raising
+        if total_frames == 0:
+            raise ValueError('No frames could be decoded from the video')
+        
+        frame_results = []
+        probabilities = []
+        stage_counts = {}  # Cascade stage -> frames it decided
         fake_count = 0
+        failed_count = 0  # Frames the model could not score (placeholder 0.5 probability)
         
-        for i, (frame, timestamp) in enumerate(frames_data):
-            # Update progress
-            progress = 60 + (i / total_frames) * 35
-            jobs[job_id]['progress'] = int(progress)
-            
-            # Get prediction for this frame
-            prediction = detector.predict_single_frame(frame)
-            
+        for i, timestamp, prediction, source in zip(positions, timestamps, predictions, reused_from):
             frame_result = {
                 'frame_number': i,
                 'timestamp': timestamp,
                 'prediction': prediction['prediction'],
                 'confidence': prediction['confidence'],
-                'probability': prediction['probability']
+                'probability': prediction['probability'],
+                'reused': source is not None,
+                'reused_from': source
             }
+            if 'faces' in prediction:
+                frame_result['faces'] = prediction['faces']
+            if 'stage' in prediction:
+                frame_result['stage'] = prediction['stage']
+                stage_counts[prediction['stage']] = stage_counts.get(prediction['stage'], 0) + 1
             
             frame_results.append(frame_result)
+            probabilities.append(prediction['probability'])
             
             if prediction['prediction'] == 'Fake':
                 fake_count += 1
+            elif prediction['prediction'] == 'Error':
+                failed_count += 1
+        
+        if failed_count == total_frames:
+            raise RuntimeError('Inference failed for every frame')
         
         # Calculate overall results
-        fake_percentage = (fake_count / total_frames) * 100 if total_frames > 0 else 0
+        # Frames the model failed on vote neither way
+        fake_percentage = (fake_count / (total_frames - failed_count)) * 100
         overall_prediction = "Fake" if fake_percentage > 50 else "Real"
+        aggregation = score_aggregator.aggregate(probabilities, timestamps, frame_numbers=list(positions))
+        record_stage('aggregation', time.perf_counter() - aggregation_start)
         
         # Compile final results
         final_results = {
@@ -117,22 +468,64 @@ def process_video_job(job_id, video_path):
             'fake_percentage': fake_percentage,
             'total_frames_analyzed': total_frames,
             'fake_frames_count': fake_count,
-            'real_frames_count': total_frames - fake_count,
-            'video_info': video_results['video_info'],
+            'real_frames_count': total_frames - fake_count - failed_count,
+            'failed_frames_count': failed_count,
+            'pooled_score': aggregation['pooled_score'],
+            'pooled_prediction': aggregation['pooled_prediction'],
+            'segments': aggregation['segments'],
+            'aggregation': score_aggregator.get_settings(),
+            'frames_reused': pipeline_results['frames_reused'],
+            'skip_ratio': pipeline_results['frames_reused'] / total_frames if total_frames > 0 else 0,
+            'sampling': {
+                'mode': SAMPLING_MODE,
+                'frames_scored': total_frames - pipeline_results['frames_reused'],
+                'frames_available': pipeline_results.get('frames_available', total_frames),
+                'stop_reason': pipeline_results.get('stop_reason', 'exhausted')
+            },
+            'faces': {
+                'detector': tracker.detector.name,
+                'detector_runs': tracker.detector_runs,
+                'faces_scored': face_stage.faces_scored,
+                'max_faces_per_frame': MAX_FACES_PER_FRAME
+            } if face_stage else None,
+            'cascade': {
+                'band': [CASCADE_LOW, CASCADE_HIGH],
+                'decided_by': stage_counts
+            } if stage_counts else None,
+            'video_info': video_info,
             'frame_results': frame_results,
-            'processing_time': video_results['processing_time'],
+            'processing_time': pipeline_results['processing_time'],
+            'memory': memory_monitor.stop(),
             'video_url': f'/api/video/{job_id}'  # Add video URL for frontend
         }
+        if profile is not None:
+            final_results['profile'] = {
+                'mode': profile_mode,
+                'queue_wait_seconds': round(queue_wait, 4),
+                'total_seconds': round(time.perf_counter() - claimed, 4),
+                'stages': profile.to_dict(),
+                'sampling': stack_profiler.stop(PROFILER_MAX_STACKS) if stack_profiler else None
+            }
         
-        jobs[job_id]['status'] = 'completed'
-        jobs[job_id]['progress'] = 100
-        jobs[job_id]['results'] = final_results
+        job_store.update(job_id, status='completed', progress=100, results=final_results)
+        status = 'completed'
         
+        # Placeholder predictions from a failed batch must not outlive this job
+        if cache_key and failed_count == 0:
+            # A profile describes this run only
+            result_cache.put(cache_key, {k: v for k, v in final_results.items() if k != 'profile'})
+    
     except Exception as e:
-        jobs[job_id]['status'] = 'error'
-        jobs[job_id]['error'] = str(e)
+        job_store.update(job_id, status='error', error=str(e))
         print(f"Error processing video {job_id}: {e}")
     
+    finally:
+        memory_monitor.stop()
+        if stack_profiler is not None:
+            stack_profiler.stop()
+        deactivate_profile(profile_token)
+        JOB_SECONDS.observe(time.perf_counter() - claimed, status=status)
+    
     # Don't delete video file immediately - keep it for serving
 
 @app.route('/api/health', methods=['GET'])
@@ -140,9 +533,45 @@ def health_check():
     """Health check endpoint"""
     return jsonify({'status': 'healthy', 'timestamp': datetime.now().isoformat()})
 
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """Readiness endpoint: only ready once the model is loaded and warmed up"""
+    # Without eager warm-up the model loads on the first job, so accept traffic right away
+    ready = model_ready.is_set() or (not WARMUP_ON_STARTUP and model_error is None)
+    return jsonify({
+        'ready': ready,
+        'model': model_stats(),
+        'timestamp': datetime.now().isoformat()
+    }), 200 if ready else 503
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """Runtime statistics for tuning the inference pipeline"""
+    return jsonify({
+        'model': model_stats(),
+        'scheduler': scheduler.get_stats() if scheduler is not None else None,
+        'executor': job_executor.get_stats(),
+        'result_cache': result_cache.get_stats(),
+        'job_store': job_store.get_stats(),
+        'job_events': job_events.get_stats(),
+        'results_responses': results_responses.get_stats(),
+        'chunked_uploads': chunked_uploads.get_stats(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Latency histograms and gauges in the Prometheus text format (this process only)"""
+    return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/api/upload', methods=['POST'])
 def upload_video():
-    """Upload video for analysis"""
+    """
+    Upload video for analysis
+    
+    Form fields: video (the file) and an optional profile (off, stages or
+    sampling) that adds a profile of this job to its results.
+    """
     try:
         # Check if file is present
         if 'video' not in request.files:
@@ -156,100 +585,476 @@ def upload_video():
         if not allowed_file(file.filename):
             return jsonify({'error': 'File type not supported'}), 400
         
+        try:
+            profile_mode = requested_profile(request.form.get('profile') or request.args.get('profile'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Reject early, before writing the upload to disk, when the queue is full
+        if job_executor.is_full():
+            return server_busy_response()
+        
         # Generate unique job ID
         job_id = str(uuid.uuid4())
         
-        # Save file
+        # Save file, hashing the content as it is written
         filename = secure_filename(f"{job_id}_{file.filename}")
         file_path = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(file_path)
-        
-        # Initialize job tracking
-        jobs[job_id] = {
-            'status': 'queued',
-            'progress': 0,
-            'created_at': datetime.now().isoformat(),
-            'filename': file.filename
-        }
-        
-        # Start processing in background
-        threading.Thread(
-            target=process_video_job, 
-            args=(job_id, file_path)
-        ).start()
+        start = time.perf_counter()
+        content_hash = save_upload(file, file_path)
+        UPLOAD_SECONDS.observe(time.perf_counter() - start, kind='file')
         
+        return start_job(job_id, file.filename, file_path, content_hash, profile_mode)
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def start_job(job_id, filename, file_path, content_hash, profile_mode=None):
+    """
+    Create the job for a fully uploaded video and queue it, or answer from the result cache
+    
+    Args:
+        profile_mode: Profile requested by the upload; asking for one always runs the job
+    
+    Returns:
+        Response: The upload response (503 if the queue filled up meanwhile)
+    """
+    # Same video, model and settings as an earlier job: reuse its results
+    fingerprint = get_model_fingerprint()
+    cache_key = make_cache_key(content_hash, fingerprint, analysis_params()) if fingerprint else None
+    profiled = profile_mode not in (None, 'off')
+    cached = result_cache.get(cache_key) if cache_key and not profiled else None
+    if cached is not None:
+        results = dict(cached, video_url=f'/api/video/{job_id}')
+        job_store.create(
+            job_id,
+            status='completed',
+            progress=100,
+            filename=filename,
+            video_path=file_path,
+            cache_key=cache_key,
+            results=results
+        )
         return jsonify({
             'job_id': job_id,
-            'status': 'queued',
-            'message': 'Video uploaded successfully and queued for processing'
+            'status': 'completed',
+            'cached': True,
+            'results': results,
+            'message': 'Video already analyzed; returning cached results'
         })
+    
+    # Initialize job tracking
+    job_store.create(job_id, filename=filename, video_path=file_path, cache_key=cache_key, profile=profile_mode)
+    
+    # Queue processing on the bounded worker pool
+    try:
+        job_executor.submit(job_id, process_video_job, job_id, file_path, cache_key, profile_mode)
+    except QueueFullError:
+        job_store.delete(job_id)
+        os.remove(file_path)
+        return server_busy_response()
+    
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'message': 'Video uploaded successfully and queued for processing'
+    })
+
+def server_busy_response():
+    """503 response telling the client when to retry an upload"""
+    job_executor.record_rejection()
+    response = jsonify({
+        'error': 'Server is busy processing other videos. Please retry later.',
+        'retry_after': RETRY_AFTER_SECONDS
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+    return response
+
+def upload_error_response(error):
+    """JSON error for a rejected chunked-upload request, with the committed offset if known"""
+    body = {'error': str(error)}
+    if error.offset is not None:
+        body['offset'] = error.offset
+    response = jsonify(body)
+    response.status_code = error.status
+    if error.offset is not None:
+        response.headers['Upload-Offset'] = str(error.offset)
+    return response
+
+@app.route('/api/uploads', methods=['POST'])
+def create_chunked_upload():
+    """
+    Start a resumable upload
+    
+    JSON body: {"filename": str, "size": int (bytes), "profile": optional
+    profile mode for the job}. Send the file with PATCH
+    /api/uploads/<upload_id> in order; the upload ID becomes the job ID.
+    """
+    data = request.get_json(silent=True) or {}
+    filename = data.get('filename') or ''
+    try:
+        size = int(data.get('size', 0))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'size must be an integer'}), 400
+    try:
+        profile_mode = requested_profile(data.get('profile'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if job_executor.is_full():
+        return server_busy_response()
+    
+    try:
+        session = chunked_uploads.create(str(uuid.uuid4()), filename, size, metadata={'profile': profile_mode})
+    except UploadError as e:
+        return upload_error_response(e)
+    
+    response = jsonify({
+        'upload_id': session['upload_id'],
+        'offset': 0,
+        'size': session['size'],
+        'chunk_size': UPLOAD_CHUNK_SIZE
+    })
+    response.status_code = 201
+    response.headers['Location'] = f"/api/uploads/{session['upload_id']}"
+    return response
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def get_chunked_upload(upload_id):
+    """Committed offset of an upload, to resume it after an interruption"""
+    try:
+        session = chunked_uploads.status(upload_id)
+    except UploadError as e:
+        return upload_error_response(e)
+    
+    response = jsonify({
+        'upload_id': upload_id,
+        'offset': session['offset'],
+        'size': session['size']
+    })
+    response.headers['Upload-Offset'] = str(session['offset'])
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@app.route('/api/uploads/<upload_id>', methods=['PATCH'])
+def append_chunked_upload(upload_id):
+    """
+    Append the next chunk (raw request body) of an upload
+    
+    The Upload-Offset header must equal the committed offset; on a mismatch
+    the response is 409 with the offset to resume from. The chunk that
+    completes the file starts the job, and the response is the same as
+    /api/upload's. Repeating the final chunk returns the job it started.
+    """
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return jsonify({'error': 'Upload-Offset header required'}), 400
+    
+    # Appending, committing and starting the job happen under the upload's lock,
+    # so concurrent final chunks cannot both move the file or create the job
+    with chunked_uploads.locked(upload_id):
+        # A repeated final chunk (a retry, or a request that raced the first) gets the job already started
+        job = job_store.get(upload_id, include_frames=False)
+        if job is not None:
+            return jsonify({
+                'job_id': upload_id,
+                'status': job['status'],
+                'message': 'Upload already complete'
+            })
         
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        try:
+            session = chunked_uploads.status(upload_id)
+            # Refuse the final chunk while the queue is full, so the client can retry it later
+            if request.content_length is not None and offset + request.content_length >= session['size'] \
+                    and job_executor.is_full():
+                return server_busy_response()
+            
+            start = time.perf_counter()
+            session = chunked_uploads.append(upload_id, offset, request.stream, request.content_length)
+            UPLOAD_SECONDS.observe(time.perf_counter() - start, kind='chunk')
+        except UploadError as e:
+            return upload_error_response(e)
+        
+        if not session['complete']:
+            response = jsonify({
+                'upload_id': upload_id,
+                'offset': session['offset'],
+                'size': session['size'],
+                'complete': False
+            })
+            response.headers['Upload-Offset'] = str(session['offset'])
+            return response
+        
+        # The queue can fill while the last chunk is arriving (or its length was
+        # unknown up front); keep the upload so an empty final chunk can start the job later
+        if job_executor.is_full():
+            return server_busy_response()
+        
+        try:
+            file_path = os.path.join(UPLOAD_FOLDER, secure_filename(f"{upload_id}_{session['filename']}"))
+            chunked_uploads.commit(upload_id, file_path)
+            profile_mode = session.get('metadata', {}).get('profile')
+            return start_job(upload_id, session['filename'], file_path, session['content_hash'], profile_mode)
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
 
-@app.route('/api/status/<job_id>', methods=['GET'])
-def get_job_status(job_id):
-    """Get job processing status"""
-    if job_id not in jobs:
-        return jsonify({'error': 'Job not found'}), 404
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+def delete_chunked_upload(upload_id):
+    """Abandon an upload and free its disk space"""
+    chunked_uploads.discard(upload_id)
+    return jsonify({'upload_id': upload_id, 'message': 'Upload discarded'})
+
+FINAL_STATUSES = ('completed', 'error')
+
+def notify_queue_moved():
+    """Queue positions shift when a job starts; wake everyone watching a queued job"""
+    for job in job_store.list_jobs():
+        if job['status'] == 'queued':
+            job_events.notify(job['job_id'])
+
+def job_status_payload(job_id, job):
+    """Status fields shared by the status, stream and long-poll endpoints"""
+    queue_position = None
+    if job['status'] == 'queued':
+        # Queued in this process, or in another one sharing the store
+        queue_position = job_executor.queue_position(job_id) or job_store.queue_position(job_id)
     
-    job = jobs[job_id]
-    return jsonify({
+    return {
         'job_id': job_id,
         'status': job['status'],
         'progress': job.get('progress', 0),
         'created_at': job['created_at'],
         'filename': job.get('filename', ''),
-        'error': job.get('error', None)
+        'error': job.get('error', None),
+        'queue_position': queue_position,
+        'version': job['updated_ts']
+    }
+
+@app.route('/api/status/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """Get job processing status"""
+    job = job_store.get(job_id, include_frames=False)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify(job_status_payload(job_id, job))
+
+# Held by every open status stream and waiting long poll in this process
+status_waiter_slots = threading.BoundedSemaphore(MAX_STATUS_WAITERS)
+
+def status_busy_response():
+    """503 telling a status watcher to poll again later, when every waiter slot is taken"""
+    response = jsonify({
+        'error': 'Too many status watchers; poll again later',
+        'retry_after': STATUS_BUSY_RETRY_SECONDS
     })
+    response.status_code = 503
+    response.headers['Retry-After'] = str(STATUS_BUSY_RETRY_SECONDS)
+    return response
+
+def format_sse(event, data):
+    """Encode one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/status/<job_id>/stream', methods=['GET'])
+def stream_job_status(job_id):
+    """
+    Stream status changes as Server-Sent Events
+    
+    Sends the current status right away, then a 'status' event whenever the
+    job changes, and closes after the job completes or fails.
+    """
+    # Take the event version before reading so a change in between is not missed
+    version = job_events.version(job_id)
+    job = job_store.get(job_id, include_frames=False)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    if not status_waiter_slots.acquire(blocking=False):
+        return status_busy_response()
+    
+    def generate(job, version):
+        yield 'retry: 3000\n\n'
+        last_payload = None
+        last_sent = time.monotonic()
+        while True:
+            if job is None:
+                yield format_sse('error', {'error': 'Job not found'})
+                return
+            
+            payload = job_status_payload(job_id, job)
+            if payload != last_payload:
+                yield format_sse('status', payload)
+                last_payload = payload
+                last_sent = time.monotonic()
+                if payload['status'] in FINAL_STATUSES:
+                    return
+            elif time.monotonic() - last_sent >= STATUS_STREAM_HEARTBEAT:
+                # Comment line keeps proxies from closing an idle connection
+                yield ': keep-alive\n\n'
+                last_sent = time.monotonic()
+            
+            wait = min(STATUS_RECHECK_SECONDS, max(0.0, STATUS_STREAM_HEARTBEAT - (time.monotonic() - last_sent)))
+            version = job_events.wait(job_id, version, timeout=wait)
+            job = job_store.get(job_id, include_frames=False)
+    
+    response = Response(
+        stream_with_context(generate(job, version)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Runs however the stream ends, including a client that never read it
+    response.call_on_close(status_waiter_slots.release)
+    return response
+
+@app.route('/api/status/<job_id>/wait', methods=['GET'])
+def wait_job_status(job_id):
+    """
+    Long-poll for a status change
+    
+    Query parameters:
+        since: 'version' from the last status the client saw; returns as soon
+            as the job has changed since then (immediately if omitted)
+        timeout: Seconds to wait at most (capped by STATUS_LONG_POLL_TIMEOUT)
+    """
+    since = request.args.get('since', type=float)
+    timeout = min(request.args.get('timeout', STATUS_LONG_POLL_TIMEOUT, type=float), STATUS_LONG_POLL_TIMEOUT)
+    if since is None or timeout <= 0:
+        # Answered right away; no waiter slot needed
+        return wait_for_status_change(job_id, since, timeout)
+    
+    if not status_waiter_slots.acquire(blocking=False):
+        return status_busy_response()
+    try:
+        return wait_for_status_change(job_id, since, timeout)
+    finally:
+        status_waiter_slots.release()
+
+def wait_for_status_change(job_id, since, timeout):
+    """Long-poll body: the status once it changed since 'since', or after timeout seconds"""
+    deadline = time.monotonic() + max(0.0, timeout)
+    
+    version = job_events.version(job_id)
+    job = job_store.get(job_id, include_frames=False)
+    changed = since is None
+    while job is not None and not changed:
+        if job['updated_ts'] > since or job['status'] in FINAL_STATUSES:
+            changed = True
+            break
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        
+        new_version = job_events.wait(job_id, version, timeout=min(remaining, STATUS_RECHECK_SECONDS))
+        # Local notifications also cover queue position changes
+        changed = new_version != version
+        version = new_version
+        job = job_store.get(job_id, include_frames=False)
+    
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify(dict(job_status_payload(job_id, job), changed=changed))
 
 @app.route('/api/results/<job_id>', methods=['GET'])
 def get_job_results(job_id):
-    """Get job results"""
-    if job_id not in jobs:
-        return jsonify({'error': 'Job not found'}), 404
+    """
+    Get job results
     
-    job = jobs[job_id]
+    Query parameters:
+        view: full (default), summary (no per-frame results) or columnar
+            (parallel arrays instead of one dict per frame)
+        encoding: json (default) or packed (base64 typed arrays) for the columnar view
+        offset, limit: Page through the per-frame results
+        start, end: Only frames within this timestamp window, in seconds
+    """
+    job = job_store.get(job_id, include_frames=False)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
     
     if job['status'] != 'completed':
         return jsonify({'error': 'Job not completed yet'}), 400
     
-    return jsonify({
-        'job_id': job_id,
-        'status': job['status'],
-        'results': job['results']
-    })
+    try:
+        query = parse_results_query(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Weak, since the same tag covers every content encoding of the results
+    etag = results_etag(job_id, job['updated_ts'], query)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        accepted = request.accept_encodings.best_match(CONTENT_ENCODINGS)
+        cached = results_responses.get((etag, accepted))
+        if cached is not None:
+            encoding, body = cached
+        else:
+            frames = job_store.get_frame_columns(job_id) if query['view'] != 'summary' else None
+            body = json.dumps({
+                'job_id': job_id,
+                'status': job['status'],
+                'results': build_results(job['results'], frames, query)
+            }, separators=(',', ':')).encode('utf-8')
+            
+            encoding = accepted if len(body) >= RESULTS_COMPRESS_MIN_BYTES else None
+            if encoding:
+                body = compress(body, encoding, RESULTS_COMPRESS_LEVEL)
+            results_responses.put((etag, accepted), encoding, body)
+        
+        response = Response(body, mimetype='application/json')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = f'public, max-age={RESULTS_CACHE_MAX_AGE}'
+    response.vary.add('Accept-Encoding')
+    return response
 
 @app.route('/api/video/<job_id>', methods=['GET'])
 def serve_video(job_id):
-    """Serve the processed video file"""
-    if job_id not in jobs:
-        return jsonify({'error': 'Job not found'}), 404
+    """
+    Serve the processed video file
     
-    job = jobs[job_id]
+    Supports Range/If-Range (206 partial content) so the player can seek
+    without re-downloading, and conditional GET with ETag/Last-Modified.
+    With VIDEO_ACCEL_REDIRECT set, nginx sends the bytes instead.
+    """
+    job = job_store.get(job_id, include_frames=False)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
     
-    if 'video_path' not in job or not os.path.exists(job['video_path']):
+    if not job.get('video_path') or not os.path.exists(job['video_path']):
         return jsonify({'error': 'Video file not found'}), 404
     
     try:
         # Determine MIME type based on file extension
         file_ext = os.path.splitext(job['video_path'])[1].lower()
-        mime_types = {
-            '.mp4': 'video/mp4',
-            '.avi': 'video/x-msvideo',
-            '.mov': 'video/quicktime',
-            '.mkv': 'video/x-matroska',
-            '.wmv': 'video/x-ms-wmv',
-            '.flv': 'video/x-flv'
-        }
+        mime_type = VIDEO_MIME_TYPES.get(file_ext, 'video/mp4')
         
-        mime_type = mime_types.get(file_ext, 'video/mp4')
+        if VIDEO_ACCEL_REDIRECT:
+            # nginx answers ranges and conditional requests itself and sends the
+            # file with sendfile, so no worker is tied up streaming it
+            response = Response(mimetype=mime_type)
+            response.headers['X-Accel-Redirect'] = (
+                VIDEO_ACCEL_REDIRECT.rstrip('/') + '/' + quote(os.path.basename(job['video_path']))
+            )
+            response.headers['Cache-Control'] = f'public, max-age={VIDEO_CACHE_MAX_AGE}'
+            return response
         
+        # Absolute, since send_file resolves relative paths against the app root, not the cwd
         return send_file(
-            job['video_path'],
+            os.path.abspath(job['video_path']),
             as_attachment=False,
-            mimetype=mime_type
+            mimetype=mime_type,
+            conditional=True,
+            etag=True,
+            max_age=VIDEO_CACHE_MAX_AGE
         )
+    except HTTPException:
+        raise  # e.g. 416 for a range past the end of the file
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -258,40 +1063,60 @@ def list_jobs():
     """List all jobs (for debugging)"""
     return jsonify({
         'jobs': [{
-            'job_id': job_id,
+            'job_id': job['job_id'],
             'status': job['status'],
             'progress': job.get('progress', 0),
             'created_at': job['created_at'],
             'filename': job.get('filename', '')
-        } for job_id, job in jobs.items()]
+        } for job in job_store.list_jobs()]
     })
 
-def cleanup_old_videos():
-    """Clean up old video files (older than 1 hour)"""
-    current_time = time.time()
-    to_remove = []
-    
-    for job_id, job in jobs.items():
-        if 'video_path' in job and os.path.exists(job['video_path']):
-            # Check if job is older than 1 hour
-            created_time = datetime.fromisoformat(job['created_at']).timestamp()
-            if current_time - created_time > 3600:  # 1 hour
-                try:
-                    os.remove(job['video_path'])
-                    to_remove.append(job_id)
-                except:
-                    pass
-    
-    # Remove old job entries
-    for job_id in to_remove:
-        if job_id in jobs:
-            del jobs[job_id]
+def fail_abandoned_jobs():
+    """
+    Fail jobs left processing by a worker that died, so status waiters get an answer
+    
+    Returns:
+        int: Number of jobs failed
+    """
+    failed = 0
+    for job in job_store.abandoned_jobs(JOB_STALE_SECONDS):
+        if job_store.fail_abandoned(job['job_id'], job['owner'], 'Processing was interrupted; please upload the video again'):
+            failed += 1
+    return failed
+
+def evict_expired_jobs():
+    """Background loop: drop expired jobs with their videos, fail abandoned jobs, and discard abandoned uploads"""
+    while True:
+        try:
+            failed = fail_abandoned_jobs()
+            if failed:
+                print(f"Failed {failed} jobs abandoned by a stopped worker")
+            evicted = job_store.evict_expired()
+            if evicted:
+                print(f"Evicted {evicted} expired jobs")
+            abandoned = chunked_uploads.expire_sessions()
+            if abandoned:
+                print(f"Discarded {abandoned} abandoned uploads")
+        except Exception as e:
+            print(f"Error evicting expired jobs: {e}")
+        time.sleep(JOB_EVICT_INTERVAL)
+
+def resume_queued_jobs():
+    """Re-queue jobs left waiting by a previous run (claims keep them from running twice)"""
+    for job in job_store.list_jobs():
+        if job['status'] != 'queued':
+            continue
+        try:
+            job_executor.submit(job['job_id'], process_video_job, job['job_id'], job['video_path'], job['cache_key'],
+                                job.get('profile'))
+        except QueueFullError:
+            break
 
 @app.route('/api/cleanup', methods=['POST'])
 def manual_cleanup():
-    """Manual cleanup endpoint"""
-    cleanup_old_videos()
-    return jsonify({'message': 'Cleanup completed'})
+    """Manual cleanup endpoint (expired jobs are also evicted automatically)"""
+    evicted = job_store.evict_expired()
+    return jsonify({'message': 'Cleanup completed', 'evicted_jobs': evicted})
 
 @app.errorhandler(413)
 def request_entity_too_large(error):
@@ -303,6 +1128,14 @@ def internal_server_error(error):
     """Handle internal server errors"""
     return jsonify({'error': 'Internal server error'}), 500
 
+# Warm up in the background so the server can answer health checks meanwhile
+if IS_SERVER_PROCESS:
+    if WARMUP_ON_STARTUP:
+        threading.Thread(target=initialize_model, name='model-warmup', daemon=True).start()
+    fail_abandoned_jobs()
+    threading.Thread(target=evict_expired_jobs, name='job-evictor', daemon=True).start()
+    resume_queued_jobs()
+
 if __name__ == '__main__':
     # Initialize model on startup
     print("Starting Flask server...")
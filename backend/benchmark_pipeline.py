@@ -0,0 +1,366 @@
+"""
+End-to-end benchmark for the detection pipeline
+
+Runs fully offline: synthetic videos are generated with OpenCV at several
+resolutions, lengths and codecs, and the ViT is built with random weights
+(fixed seed), so no model download or dataset is needed. Scores are
+meaningless but the work per frame is the same as with the real checkpoint.
+
+Pipeline mode times each stage separately for every video:
+    probe        VideoProcessor.get_video_info
+    decode       VideoProcessor.iter_frames_with_timestamps (sampling + decode + downscale)
+    preprocess   DeepfakeDetector.preprocess per frame
+    inference    DeepfakeDetector.predict_batch
+    aggregation  per-frame result dicts + ScoreAggregator
+    serialize    JSON encoding of the results
+and reports seconds, frames/s and peak RSS for each.
+
+HTTP mode starts the Flask app in-process (or targets --url) and drives
+/api/upload, /api/status/<id>/wait and /api/results/<id> with concurrent
+clients, reporting latency percentiles and job throughput.
+
+Results are written as JSON; --compare prints the per-stage speedup in
+frames/s against an earlier results file.
+
+Usage:
+    python benchmark_pipeline.py [--mode pipeline|http|both] [--output bench_results.json]
+                                 [--compare previous.json] [--max-frames 100]
+                                 [--clients 4] [--jobs-per-client 2] [--url http://host:5000]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from datetime import datetime
+
+import cv2
+import numpy as np
+import torch
+
+from benchmark_sampling import generate_video
+from memory_monitor import PeakRSSMonitor
+from model_loader import DeepfakeDetector, ViTModel
+from score_aggregation import ScoreAggregator
+from video_processor import VideoProcessor
+
+# (name, width, height, frame count, fourcc, extension)
+VIDEO_CONFIGS = [
+    ('360p_10s_mp4v', 640, 360, 300, 'mp4v', '.mp4'),
+    ('720p_10s_mp4v', 1280, 720, 300, 'mp4v', '.mp4'),
+    ('1080p_10s_mp4v', 1920, 1080, 300, 'mp4v', '.mp4'),
+    ('720p_60s_mp4v', 1280, 720, 1800, 'mp4v', '.mp4'),
+    ('720p_10s_mjpg', 1280, 720, 300, 'MJPG', '.avi'),
+]
+STAGES = ('probe', 'decode', 'preprocess', 'inference', 'aggregation', 'serialize')
+SEED = 0
+
+def random_weights(path):
+    """Save a randomly initialized ViTModel checkpoint (fixed seed) if it is not there yet"""
+    if not os.path.exists(path):
+        torch.manual_seed(SEED)
+        torch.save(ViTModel().state_dict(), path)
+    return path
+
+def prepare_videos(video_dir, configs):
+    """Generate the synthetic videos, skipping codecs this OpenCV build cannot write"""
+    os.makedirs(video_dir, exist_ok=True)
+    videos = []
+    for name, width, height, frame_count, fourcc, extension in configs:
+        path = os.path.join(video_dir, name + extension)
+        if not os.path.exists(path):
+            try:
+                generate_video(path, width, height, frame_count, fourcc)
+            except RuntimeError as e:
+                print(f"Skipping {name}: {e}")
+                continue
+        videos.append({'name': name, 'path': path, 'width': width, 'height': height,
+                       'frame_count': frame_count, 'codec': fourcc})
+    return videos
+
+def run_stage(stages, name, frames, fn):
+    """Time fn with an RSS monitor and record seconds, frames/s and peak RSS under stages[name]"""
+    monitor = PeakRSSMonitor(interval=0.01).start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    memory = monitor.stop()
+    stages[name] = {
+        'seconds': round(elapsed, 4),
+        'fps': round(frames / elapsed, 2) if elapsed > 0 and frames else None,
+        'rss_peak_mb': memory['rss_peak_mb'],
+        'rss_peak_delta_mb': memory['rss_peak_delta_mb']
+    }
+    return result
+
+def benchmark_video(video, detector, video_processor, aggregator, max_frames):
+    """Run every stage once on one video"""
+    stages = {}
+    info = run_stage(stages, 'probe', 1, lambda: video_processor.get_video_info(video['path']))
+    frame_count = min(max_frames, info['frame_count'])
+    
+    decoded = run_stage(stages, 'decode', frame_count, lambda: list(
+        video_processor.iter_frames_with_timestamps(video['path'], max_frames, as_arrays=True)))
+    frames = [frame for frame, _ in decoded]
+    timestamps = [timestamp for _, timestamp in decoded]
+    del decoded
+    
+    inputs = run_stage(stages, 'preprocess', len(frames), lambda: [detector.preprocess(f) for f in frames])
+    
+    def infer():
+        predictions = []
+        for start in range(0, len(inputs), detector.batch_size):
+            predictions.extend(detector.predict_batch(inputs[start:start + detector.batch_size]))
+        return predictions
+    predictions = run_stage(stages, 'inference', len(inputs), infer)
+    
+    def aggregate():
+        frame_results = [{
+            'frame_number': i,
+            'timestamp': timestamp,
+            'prediction': p['prediction'],
+            'confidence': p['confidence'],
+            'probability': p['probability'],
+            'reused': False,
+            'reused_from': None
+        } for i, (timestamp, p) in enumerate(zip(timestamps, predictions))]
+        summary = aggregator.aggregate([p['probability'] for p in predictions], timestamps)
+        return dict(summary, frame_results=frame_results, video_info=info)
+    results = run_stage(stages, 'aggregation', len(predictions), aggregate)
+    
+    body = run_stage(stages, 'serialize', len(predictions), lambda: json.dumps(results))
+    
+    total = sum(stage['seconds'] for stage in stages.values())
+    return {
+        'video': video['name'],
+        'resolution': f"{video['width']}x{video['height']}",
+        'codec': video['codec'],
+        'video_frames': video['frame_count'],
+        'frames_analyzed': len(predictions),
+        'stages': stages,
+        'total_seconds': round(total, 4),
+        'end_to_end_fps': round(len(predictions) / total, 2) if total > 0 else None,
+        'response_bytes': len(body)
+    }
+
+def run_pipeline(args, model_path, videos):
+    """Pipeline mode: per-stage timings for every video (best of --repeats by total time)"""
+    detector = DeepfakeDetector(model_path, batch_size=args.batch_size, backend=args.backend,
+                                preprocessing=args.preprocessing)
+    detector.warmup()
+    video_processor = VideoProcessor(working_size=args.working_resolution)
+    aggregator = ScoreAggregator()
+    
+    runs = []
+    for video in videos:
+        best = None
+        for _ in range(args.repeats):
+            run = benchmark_video(video, detector, video_processor, aggregator, args.max_frames)
+            if best is None or run['total_seconds'] < best['total_seconds']:
+                best = run
+        runs.append(best)
+        cells = ''.join(f"{best['stages'][s]['seconds'] * 1000:>16.1f}" for s in STAGES)
+        print(f"{best['video']:<18}{best['frames_analyzed']:>7}{cells}{best['end_to_end_fps']:>9.1f}"
+              f"{max(s['rss_peak_mb'] for s in best['stages'].values()):>10.0f}")
+    return runs
+
+def _multipart(field, filename, data):
+    """Encode one file as a multipart/form-data body"""
+    boundary = uuid.uuid4().hex
+    head = (f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n').encode()
+    return head + data + f'\r\n--{boundary}--\r\n'.encode(), f'multipart/form-data; boundary={boundary}'
+
+def _request(url, data=None, headers=None, method=None, timeout=600):
+    """Return (status, parsed JSON body) without raising on HTTP errors"""
+    request = urllib.request.Request(url, data=data, headers=headers or {}, method=method)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, json.loads(response.read() or b'null')
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b'null')
+
+def run_client(base_url, video, jobs, records):
+    """One client: upload, wait for completion, fetch results, jobs times in a row"""
+    with open(video['path'], 'rb') as f:
+        body, content_type = _multipart('video', os.path.basename(video['path']), f.read())
+    
+    for _ in range(jobs):
+        record = {'video': video['name']}
+        start = time.perf_counter()
+        status, response = _request(f'{base_url}/api/upload', body, {'Content-Type': content_type})
+        record['upload_seconds'] = time.perf_counter() - start
+        record['upload_status'] = status
+        if status != 200:
+            records.append(record)
+            continue
+        
+        job_id = response['job_id']
+        version = None
+        while response.get('status') not in ('completed', 'error'):
+            query = '?timeout=25' + (f'&since={version}' if version is not None else '')
+            _, response = _request(f'{base_url}/api/status/{job_id}/wait{query}')
+            version = response.get('version')
+        record['completed_seconds'] = time.perf_counter() - start
+        record['job_status'] = response['status']
+        
+        fetch_start = time.perf_counter()
+        _request(f'{base_url}/api/results/{job_id}')
+        record['results_seconds'] = time.perf_counter() - fetch_start
+        records.append(record)
+
+def _percentiles(values):
+    if not values:
+        return None
+    values = np.array(values)
+    return {
+        'p50': round(float(np.percentile(values, 50)), 4),
+        'p95': round(float(np.percentile(values, 95)), 4),
+        'max': round(float(values.max()), 4)
+    }
+
+def start_local_server(model_path):
+    """Serve the Flask app on a free local port with the random-weight model; returns its URL"""
+    # Before importing app: no warm-up thread, and no cached results between identical uploads
+    os.environ['WARMUP_ON_STARTUP'] = 'false'
+    os.environ['RESULT_CACHE_SIZE'] = '0'
+    os.environ['RESULT_CACHE_DIR'] = ''
+    import logging
+    import app as server_app
+    from werkzeug.serving import make_server
+    
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)  # No per-request access log
+    
+    server_app.MODEL_PATH = model_path
+    server_app.initialize_model()
+    server = make_server('127.0.0.1', 0, server_app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='bench-server', daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}'
+
+def run_http(args, model_path, videos):
+    """HTTP mode: concurrent clients through upload, status and results"""
+    base_url = args.url.rstrip('/') if args.url else start_local_server(model_path)
+    video = next((v for v in videos if v['name'] == args.http_video), videos[0])
+    
+    records = []
+    clients = [threading.Thread(target=run_client, args=(base_url, video, args.jobs_per_client, records))
+               for _ in range(args.clients)]
+    start = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - start
+    
+    completed = [r for r in records if r.get('job_status') == 'completed']
+    result = {
+        'url': args.url or 'in-process',
+        'video': video['name'],
+        'clients': args.clients,
+        'jobs': len(records),
+        'completed': len(completed),
+        'rejected_503': sum(1 for r in records if r['upload_status'] == 503),
+        'failed': sum(1 for r in records if r.get('job_status') == 'error'
+                      or r['upload_status'] not in (200, 503)),
+        'wall_seconds': round(elapsed, 3),
+        'jobs_per_second': round(len(completed) / elapsed, 3) if elapsed > 0 else None,
+        'upload_seconds': _percentiles([r['upload_seconds'] for r in records]),
+        'completion_seconds': _percentiles([r['completed_seconds'] for r in completed]),
+        'results_seconds': _percentiles([r['results_seconds'] for r in completed])
+    }
+    print(f"\nHTTP: {result['completed']}/{result['jobs']} jobs in {result['wall_seconds']}s "
+          f"({result['jobs_per_second']} jobs/s), 503s: {result['rejected_503']}, "
+          f"completion p50/p95: {result['completion_seconds'] and result['completion_seconds']['p50']}"
+          f"/{result['completion_seconds'] and result['completion_seconds']['p95']}s")
+    return result
+
+def environment():
+    """What the numbers depend on, so runs can be compared fairly"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'git_commit': commit or None,
+        'python': platform.python_version(),
+        'torch': torch.__version__,
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'cpu_count': os.cpu_count(),
+        'torch_threads': torch.get_num_threads(),
+        'cuda': torch.cuda.is_available()
+    }
+
+def compare(current, previous_path):
+    """Print per-stage speedups (current frames/s over previous) for videos in both runs"""
+    with open(previous_path) as f:
+        previous = {run['video']: run for run in json.load(f).get('pipeline') or []}
+    
+    print(f"\nSpeedup vs {previous_path} in frames/s (>1 is faster)")
+    print(f"{'video':<18}" + ''.join(f"{s:>13}" for s in STAGES) + f"{'total':>9}")
+    for run in current:
+        old = previous.get(run['video'])
+        if old is None:
+            continue
+        cells = []
+        for stage in STAGES:
+            before, after = old['stages'].get(stage, {}).get('fps'), run['stages'][stage]['fps']
+            cells.append(f"{after / before:>12.2f}x" if before and after else f"{'-':>13}")
+        before, after = old.get('end_to_end_fps'), run['end_to_end_fps']
+        total = f"{after / before:>8.2f}x" if before and after else f"{'-':>9}"
+        print(f"{run['video']:<18}" + ''.join(cells) + total)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the detection pipeline offline')
+    parser.add_argument('--mode', choices=('pipeline', 'http', 'both'), default='pipeline')
+    parser.add_argument('--output', default='bench_results.json', help='Where to write the JSON results')
+    parser.add_argument('--compare', help='Earlier results file to compare against')
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'deepfake_bench'),
+                        help='Synthetic videos and random weights are kept here between runs')
+    parser.add_argument('--videos', nargs='+', help='Only these video configs (by name)')
+    parser.add_argument('--max-frames', type=int, default=100, help='Frames analyzed per video')
+    parser.add_argument('--batch-size', type=int, default=16, help='Frames per forward pass')
+    parser.add_argument('--backend', default='fp32', help='Inference backend')
+    parser.add_argument('--preprocessing', default='vectorized', help='Preprocessing engine')
+    parser.add_argument('--working-resolution', type=int, default=360, help='Decode-time shorter side (0 keeps full size)')
+    parser.add_argument('--repeats', type=int, default=1, help='Runs per video (fastest is kept)')
+    parser.add_argument('--threads', type=int, help='torch.set_num_threads for stable numbers')
+    parser.add_argument('--url', help='Benchmark a running server instead of an in-process one')
+    parser.add_argument('--clients', type=int, default=4, help='Concurrent HTTP clients')
+    parser.add_argument('--jobs-per-client', type=int, default=2, help='Uploads per HTTP client')
+    parser.add_argument('--http-video', default='720p_10s_mp4v', help='Video config uploaded in HTTP mode')
+    args = parser.parse_args()
+    
+    np.random.seed(SEED)
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    
+    configs = [c for c in VIDEO_CONFIGS if not args.videos or c[0] in args.videos]
+    videos = prepare_videos(os.path.join(args.work_dir, 'videos'), configs)
+    model_path = random_weights(os.path.join(args.work_dir, 'vit_random.pth'))
+    
+    report = {'environment': environment(), 'settings': vars(args), 'pipeline': None, 'http': None}
+    if args.mode in ('pipeline', 'both'):
+        print(f"{'video':<18}{'frames':>7}" + ''.join(f"{s + ' ms':>16}" for s in STAGES)
+              + f"{'fps':>9}{'peak MB':>10}")
+        report['pipeline'] = run_pipeline(args, model_path, videos)
+    if args.mode in ('http', 'both'):
+        report['http'] = run_http(args, model_path, videos)
+    
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {args.output}")
+    
+    if args.compare and report['pipeline']:
+        compare(report['pipeline'], args.compare)
+
+if __name__ == '__main__':
+    main()
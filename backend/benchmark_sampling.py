@@ -0,0 +1,222 @@
+"""
+Compare frame sampling strategies on synthetic videos
+
+Generates test videos locally with OpenCV's VideoWriter, then times each
+FrameSampler strategy at several sampling densities. OpenCV's writer always
+puts a keyframe every 12 frames, so the long-GOP variants (an H.264 file and
+a sweep over keyframe intervals) are re-encoded with the ffmpeg command line
+tool; they are skipped when ffmpeg or the encoder is missing. The GOP column
+is read back from the MP4 sync sample table.
+
+Usage:
+    python benchmark_sampling.py [--output-dir bench_videos] [--repeats 3]
+                                 [--gop-sweep 1 12 30 60 120 300]
+"""
+import argparse
+import os
+import shutil
+import struct
+import subprocess
+import time
+
+import cv2
+import numpy as np
+
+from frame_sampler import FrameSampler, SAMPLING_STRATEGIES
+
+# (name, width, height, frame count, fourcc, keyframe interval or None for OpenCV's writer)
+VIDEO_CONFIGS = [
+    ('480p_short', 854, 480, 300, 'mp4v', None),
+    ('720p_medium', 1280, 720, 900, 'mp4v', None),
+    ('1080p_long', 1920, 1080, 1800, 'mp4v', None),
+    # H.264 at x264's default GOP, as most phone and web uploads are encoded
+    ('720p_avc1_gop250', 1280, 720, 900, 'avc1', 250),
+]
+# The sweep re-encodes one video at each interval, keeping the codec fixed
+GOP_SWEEP = [1, 12, 30, 60, 120, 300]
+GOP_SWEEP_VIDEO = (1280, 720, 900, 'mp4v')
+SAMPLE_COUNTS = [10, 100, 300]
+
+# ffmpeg encoders for the fourccs used above
+FFMPEG_ENCODERS = {'mp4v': 'mpeg4', 'avc1': 'libx264'}
+
+def generate_video(path, width, height, frame_count, fourcc, fps=30, keyframe_interval=None):
+    """
+    Write a synthetic video with moving shapes and noise so it does not compress to nothing
+    
+    Args:
+        keyframe_interval: Frames between keyframes; None keeps OpenCV's
+            writer (and its fixed interval), anything else needs ffmpeg
+    
+    Raises:
+        RuntimeError: The video cannot be written with this codec or interval
+    """
+    if keyframe_interval is not None:
+        source_path = path + '.source.mp4'
+        try:
+            generate_video(source_path, width, height, frame_count, 'mp4v', fps)
+            reencode(source_path, path, fourcc, keyframe_interval)
+        finally:
+            if os.path.exists(source_path):
+                os.remove(source_path)
+        return
+    
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"VideoWriter could not open {path} with codec {fourcc}")
+    
+    rng = np.random.default_rng(0)
+    noise = rng.integers(0, 32, size=(height, width, 3), dtype=np.uint8)
+    for i in range(frame_count):
+        frame = np.roll(noise, i * 4, axis=1)
+        cv2.circle(frame, ((i * 7) % width, height // 2), height // 6, (0, 0, 255), -1)
+        cv2.putText(frame, str(i), (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
+        writer.write(frame)
+    
+    writer.release()
+
+def reencode(source_path, path, fourcc, keyframe_interval):
+    """Re-encode with ffmpeg at a fixed keyframe interval (no B-frames or scene-cut keyframes)"""
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg is None:
+        raise RuntimeError('ffmpeg not found (needed to set the keyframe interval)')
+    
+    encoder = FFMPEG_ENCODERS[fourcc]
+    quality = ['-crf', '23'] if encoder == 'libx264' else ['-q:v', '4']
+    command = [ffmpeg, '-y', '-loglevel', 'error', '-i', source_path, '-c:v', encoder, *quality,
+               '-g', str(keyframe_interval), '-keyint_min', str(keyframe_interval),
+               '-sc_threshold', '0', '-bf', '0', '-an', path]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        if os.path.exists(path):
+            os.remove(path)
+        message = result.stderr.strip().splitlines()
+        raise RuntimeError(f"ffmpeg could not encode with {encoder}: {message[-1] if message else result.returncode}")
+
+def _mp4_boxes(data):
+    """(type, payload) of the boxes directly inside an MP4 box payload"""
+    offset = 0
+    while offset + 8 <= len(data):
+        size, kind = struct.unpack('>I4s', data[offset:offset + 8])
+        header = 8
+        if size == 1:
+            size, header = struct.unpack('>Q', data[offset + 8:offset + 16])[0], 16
+        elif size == 0:
+            size = len(data) - offset
+        if size < header:
+            return
+        yield kind, data[offset + header:offset + size]
+        offset += size
+
+def _read_moov(path):
+    """The moov box payload of an MP4 file, skipping over the media data"""
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return None
+            size, kind = struct.unpack('>I4s', header)
+            header_size = 8
+            if size == 1:
+                size, header_size = struct.unpack('>Q', f.read(8))[0], 16
+            if size < header_size:
+                return None
+            if kind == b'moov':
+                return f.read(size - header_size)
+            f.seek(size - header_size, os.SEEK_CUR)
+
+def keyframe_interval(path):
+    """
+    Median spacing of keyframes in an MP4's video track
+    
+    Returns:
+        int: Frames between keyframes (1 if every frame is one), or None if
+            the file has no readable sample table
+    """
+    moov = _read_moov(path)
+    if moov is None:
+        return None
+    
+    for kind, trak in _mp4_boxes(moov):
+        if kind != b'trak':
+            continue
+        mdia = dict(_mp4_boxes(trak)).get(b'mdia', b'')
+        mdia_boxes = dict(_mp4_boxes(mdia))
+        # hdlr: version/flags, pre_defined, then the handler type
+        if mdia_boxes.get(b'hdlr', b'')[8:12] != b'vide':
+            continue
+        minf = dict(_mp4_boxes(mdia_boxes.get(b'minf', b'')))
+        stbl = dict(_mp4_boxes(minf.get(b'stbl', b'')))
+        if b'stss' not in stbl:
+            # No sync sample table: every sample is a keyframe
+            return 1
+        stss = stbl[b'stss']
+        count = struct.unpack('>I', stss[4:8])[0]
+        keyframes = struct.unpack(f'>{count}I', stss[8:8 + 4 * count])
+        if count >= 2:
+            return int(np.median(np.diff(keyframes)))
+        # A single keyframe: the GOP spans the whole track (stsz holds the sample count)
+        return struct.unpack('>I', stbl.get(b'stsz', b'\0' * 12)[8:12])[0] or None
+    return None
+
+def evenly_spaced_indices(total_frames, max_frames):
+    """Same spacing rule as VideoProcessor.iter_frames_with_timestamps"""
+    skip_frames = max(1, total_frames // max_frames)
+    return list(range(0, total_frames, skip_frames)[:max_frames])
+
+def time_strategy(video_path, strategy, frame_indices, repeats):
+    """Best-of-N wall time and frame count for one strategy"""
+    best = None
+    frames_read = 0
+    for _ in range(repeats):
+        cap = cv2.VideoCapture(video_path)
+        sampler = FrameSampler(strategy, snap_to_keyframes=True)
+        start = time.perf_counter()
+        frames_read = sum(1 for _ in sampler.iter_frames(cap, frame_indices))
+        elapsed = time.perf_counter() - start
+        cap.release()
+        best = elapsed if best is None else min(best, elapsed)
+    return best, frames_read
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark frame sampling strategies')
+    parser.add_argument('--output-dir', default='bench_videos', help='Where to write synthetic videos')
+    parser.add_argument('--repeats', type=int, default=3, help='Runs per strategy (best time is reported)')
+    parser.add_argument('--gop-sweep', type=int, nargs='*', default=GOP_SWEEP,
+                        help='Keyframe intervals to sweep (none skips the sweep)')
+    args = parser.parse_args()
+    
+    os.makedirs(args.output_dir, exist_ok=True)
+    
+    configs = list(VIDEO_CONFIGS)
+    width, height, frame_count, fourcc = GOP_SWEEP_VIDEO
+    configs += [(f'{height}p_gop{gop}', width, height, frame_count, fourcc, gop) for gop in args.gop_sweep]
+    
+    print(f"{'video':<18}{'gop':>5}{'samples':>8}  " + ''.join(f"{s:>14}" for s in SAMPLING_STRATEGIES)
+          + '  auto picked')
+    for name, width, height, frame_count, fourcc, gop in configs:
+        video_path = os.path.join(args.output_dir, f'{name}.mp4')
+        if not os.path.exists(video_path):
+            try:
+                generate_video(video_path, width, height, frame_count, fourcc, keyframe_interval=gop)
+            except RuntimeError as e:
+                print(f"{name:<18}skipped: {e}")
+                continue
+        measured_gop = keyframe_interval(video_path)
+        
+        for sample_count in SAMPLE_COUNTS:
+            frame_indices = evenly_spaced_indices(frame_count, sample_count)
+            cells = []
+            for strategy in SAMPLING_STRATEGIES:
+                elapsed, frames_read = time_strategy(video_path, strategy, frame_indices, args.repeats)
+                cells.append(f"{elapsed * 1000:>9.0f}ms/{frames_read:<3}")
+            
+            cap = cv2.VideoCapture(video_path)
+            chosen, _ = FrameSampler('auto', snap_to_keyframes=True).choose_strategy(cap, frame_indices)
+            cap.release()
+            
+            print(f"{name:<18}{measured_gop or '?':>5}{len(frame_indices):>8}  " + ''.join(f"{c:>14}" for c in cells)
+                  + f"  {chosen}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,475 @@
+"""
+Scan large collections of videos offline with the backend's detection engine
+
+Takes directory trees (searched recursively for supported video files)
+and/or a manifest with one path per line, and scores every video the way
+the server does: evenly spaced frames decoded at the working resolution,
+the same preprocessing and model, and the same score aggregation. There is
+no HTTP, upload or job store involved.
+
+Videos are probed and decoded in a pool of worker processes, which also
+resize frames to the model resolution so only small arrays cross the
+process boundary. All videos in flight share one batched inference worker
+(the server's InferenceScheduler), so batches fill up with frames from
+several videos. Each result is written as soon as its video finishes, to
+JSONL (one object per line) or Parquet (a directory of part files, needs
+pyarrow). Re-running with the same output skips videos it already holds,
+so an interrupted scan resumes where it stopped. Videos/s and frames/s are
+reported while the scan runs and at the end.
+
+Usage:
+    python bulk_scan.py ARCHIVE_DIR [MORE_DIRS_OR_FILES ...] --output scan.jsonl
+    python bulk_scan.py --manifest videos.txt --output scan/ --format parquet
+                        [--model models/vision_transformer_model.pth] [--screener ...]
+                        [--decode-workers 8] [--max-in-flight 16] [--max-frames 100]
+                        [--frames] [--retry-errors]
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import torch
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional
+    pa = pq = None
+
+from inference_scheduler import InferenceScheduler
+from model_loader import DeepfakeDetector, DEFAULT_CASCADE_BAND
+from preprocessing import BatchPreprocessor, PREPROCESSING_ENGINES
+from score_aggregation import ScoreAggregator
+from video_processor import VideoProcessor, MAX_ANALYSIS_FRAMES
+
+OUTPUT_FORMATS = ('jsonl', 'parquet')
+
+def iter_video_paths(inputs, manifest=None):
+    """
+    Absolute paths of the videos to scan, in a stable order
+    
+    Args:
+        inputs: Directories (searched recursively) and video files
+        manifest: Optional file with one video path per line; blank lines and
+            lines starting with # are ignored, relative paths are resolved
+            against the manifest's directory
+    
+    Yields:
+        str: Video path (directory entries are filtered by extension, listed
+            files and manifest entries are taken as they are)
+    """
+    checker = VideoProcessor()
+    for path in inputs:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if checker.is_supported_format(name):
+                        yield os.path.abspath(os.path.join(root, name))
+        else:
+            yield os.path.abspath(path)
+    
+    if manifest:
+        base = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest) as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    yield os.path.abspath(os.path.join(base, line))
+
+# Decoder state of each worker process, set by _init_decoder
+_decoder = None
+
+def _init_decoder(sampling_strategy, working_size, model_size):
+    """Worker process initializer: one VideoProcessor (and resizer) per process"""
+    global _decoder
+    # Parallelism comes from the processes; more threads each would only contend
+    torch.set_num_threads(1)
+    resizer = BatchPreprocessor(model_size) if model_size else None
+    _decoder = (VideoProcessor(sampling_strategy=sampling_strategy, working_size=working_size), resizer)
+
+def decode_video(path, max_frames):
+    """
+    Worker process: probe a video and decode its sampled frames
+    
+    Returns:
+        dict: video_info, frames (N x H x W x 3 uint8, already at the model
+            resolution when the worker has a resizer), timestamps and
+            decode_seconds
+    """
+    processor, resizer = _decoder
+    start = time.perf_counter()
+    info = processor.get_video_info(path)
+    if not info or info['frame_count'] <= 0:
+        raise ValueError('Could not read video')
+    
+    frames = []
+    timestamps = []
+    for frame, timestamp in processor.iter_frames_with_timestamps(path, min(max_frames, info['frame_count']),
+                                                                  as_arrays=True):
+        frames.append(resizer.resize(frame) if resizer is not None else frame)
+        timestamps.append(timestamp)
+    if not frames:
+        raise ValueError('No frames could be decoded')
+    
+    return {
+        'video_info': info,
+        'frames': np.stack(frames),
+        'timestamps': timestamps,
+        'decode_seconds': time.perf_counter() - start
+    }
+
+def build_record(path, decoded, predictions, aggregator, inference_seconds, include_frames=False):
+    """One output row for a scored video (the summary fields of the server's results)"""
+    probabilities = [p['probability'] for p in predictions]
+    fake_count = sum(1 for p in predictions if p['prediction'] == 'Fake')
+    total = len(predictions)
+    fake_percentage = (fake_count / total) * 100 if total > 0 else 0
+    aggregation = aggregator.aggregate(probabilities, decoded['timestamps'])
+    info = decoded['video_info']
+    
+    return {
+        'path': path,
+        'status': 'ok',
+        'error': None,
+        'overall_prediction': 'Fake' if fake_percentage > 50 else 'Real',
+        'fake_percentage': fake_percentage,
+        'pooled_score': aggregation['pooled_score'],
+        'pooled_prediction': aggregation['pooled_prediction'],
+        'frames_analyzed': total,
+        'fake_frames': fake_count,
+        'segments': aggregation['segments'],
+        'duration': info['duration'],
+        'fps': info['fps'],
+        'width': info['width'],
+        'height': info['height'],
+        'size_mb': info['size_mb'],
+        'decode_seconds': round(decoded['decode_seconds'], 4),
+        'inference_seconds': round(inference_seconds, 4),
+        'scanned_at': datetime.now().isoformat(),
+        'probabilities': probabilities if include_frames else None,
+        'timestamps': decoded['timestamps'] if include_frames else None
+    }
+
+def error_record(path, error):
+    """Output row for a video that could not be scored"""
+    return {'path': path, 'status': 'error', 'error': str(error) or type(error).__name__,
+            'scanned_at': datetime.now().isoformat()}
+
+class JsonlOutput:
+    """Results as one JSON object per line, flushed after every video"""
+    
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file = None
+    
+    def recorded_paths(self, retry_errors=False):
+        """Paths already in the output (a line cut off by an interrupted run is ignored)"""
+        paths = set()
+        if not os.path.exists(self.path):
+            return paths
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if not (retry_errors and record.get('status') == 'error'):
+                    paths.add(record['path'])
+        return paths
+    
+    def write(self, record):
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a+')
+                # Start on a fresh line if the previous run stopped mid-line
+                self._file.seek(0, os.SEEK_END)
+                if self._file.tell() > 0:
+                    self._file.seek(self._file.tell() - 1)
+                    if self._file.read(1) != '\n':
+                        self._file.write('\n')
+            self._file.write(json.dumps(record, separators=(',', ':')) + '\n')
+            self._file.flush()
+    
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+class ParquetOutput:
+    """
+    Results as a directory of Parquet part files
+    
+    Rows are buffered and written rows_per_part at a time as a new part
+    file, renamed into place only once complete, so an interrupted run never
+    leaves a damaged file (its buffered rows are scanned again on resume).
+    The directory reads as one table with pyarrow.dataset or pandas.
+    """
+    
+    def __init__(self, directory, rows_per_part=1000):
+        if pa is None:
+            raise RuntimeError('Parquet output needs pyarrow: pip install pyarrow')
+        self.directory = directory
+        self.rows_per_part = max(1, int(rows_per_part))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._rows = []
+        # Continue numbering after the parts of earlier runs
+        existing = [int(os.path.basename(p)[5:-8]) for p in glob.glob(os.path.join(directory, 'part-*.parquet'))]
+        self._part = max(existing, default=-1) + 1
+        
+        segment = pa.struct([
+            ('start_time', pa.float64()), ('end_time', pa.float64()),
+            ('start_frame', pa.int64()), ('end_frame', pa.int64()), ('frames', pa.int64()),
+            ('mean_score', pa.float64()), ('peak_score', pa.float64())
+        ])
+        self.schema = pa.schema([
+            ('path', pa.string()), ('status', pa.string()), ('error', pa.string()),
+            ('overall_prediction', pa.string()), ('fake_percentage', pa.float64()),
+            ('pooled_score', pa.float64()), ('pooled_prediction', pa.string()),
+            ('frames_analyzed', pa.int64()), ('fake_frames', pa.int64()),
+            ('segments', pa.list_(segment)),
+            ('duration', pa.float64()), ('fps', pa.float64()), ('width', pa.int64()), ('height', pa.int64()),
+            ('size_mb', pa.float64()), ('decode_seconds', pa.float64()), ('inference_seconds', pa.float64()),
+            ('scanned_at', pa.string()),
+            ('probabilities', pa.list_(pa.float32())), ('timestamps', pa.list_(pa.float64()))
+        ])
+    
+    def recorded_paths(self, retry_errors=False):
+        """Paths in the complete part files (leftover temporary parts are removed)"""
+        for leftover in glob.glob(os.path.join(self.directory, 'part-*.parquet.tmp')):
+            os.remove(leftover)
+        paths = set()
+        for part in sorted(glob.glob(os.path.join(self.directory, 'part-*.parquet'))):
+            table = pq.read_table(part, columns=['path', 'status'])
+            for path, status in zip(table.column('path').to_pylist(), table.column('status').to_pylist()):
+                if not (retry_errors and status == 'error'):
+                    paths.add(path)
+        return paths
+    
+    def write(self, record):
+        with self._lock:
+            self._rows.append(record)
+            if len(self._rows) >= self.rows_per_part:
+                self._flush()
+    
+    def _flush(self):
+        if not self._rows:
+            return
+        path = os.path.join(self.directory, f'part-{self._part:05d}.parquet')
+        pq.write_table(pa.Table.from_pylist(self._rows, schema=self.schema), path + '.tmp')
+        os.replace(path + '.tmp', path)
+        self._part += 1
+        self._rows = []
+    
+    def close(self):
+        with self._lock:
+            self._flush()
+
+class ScanProgress:
+    """Counts finished videos and scored frames for throughput reporting"""
+    
+    def __init__(self):
+        self.skipped = 0  # Videos left out because the output already had them
+        self.videos = 0
+        self.errors = 0
+        self.frames = 0
+        self.start_time = time.perf_counter()
+        self._lock = threading.Lock()
+    
+    def skip(self):
+        """Count a video the output already had"""
+        with self._lock:
+            self.skipped += 1
+    
+    def add(self, record):
+        with self._lock:
+            self.videos += 1
+            if record['status'] == 'error':
+                self.errors += 1
+            else:
+                self.frames += record['frames_analyzed']
+    
+    def get_stats(self):
+        """
+        Returns:
+            dict: Videos done (and failed), frames scored, elapsed seconds,
+                videos/s and frames/s since the scan started
+        """
+        with self._lock:
+            videos, errors, skipped, frames = self.videos, self.errors, self.skipped, self.frames
+        elapsed = time.perf_counter() - self.start_time
+        return {
+            'videos': videos,
+            'errors': errors,
+            'skipped': skipped,
+            'frames': frames,
+            'elapsed_seconds': round(elapsed, 1),
+            'videos_per_second': round(videos / elapsed, 3) if elapsed > 0 else 0.0,
+            'frames_per_second': round(frames / elapsed, 1) if elapsed > 0 else 0.0
+        }
+    
+    def line(self):
+        """One-line progress report"""
+        stats = self.get_stats()
+        skipped = f", {stats['skipped']} skipped" if stats['skipped'] else ''
+        return (f"{stats['videos']} videos ({stats['errors']} errors{skipped}) in {stats['elapsed_seconds']:.0f}s: "
+                f"{stats['videos_per_second']:.2f} videos/s, {stats['frames_per_second']:.1f} frames/s")
+
+def scan(paths, detector, output, args, progress=None):
+    """
+    Decode, score and record every video in paths
+    
+    Decoding runs in worker processes; for each decoded video a finisher
+    thread submits its frames to the shared scheduler, waits for the
+    predictions and writes the record. At most max_in_flight videos are
+    decoded or waiting for inference at once, which bounds memory.
+    
+    Args:
+        progress: ScanProgress to count into, e.g. one that paths also
+            counts skipped videos into (default: a new one)
+    
+    Returns:
+        ScanProgress: Final counts
+    """
+    progress = progress or ScanProgress()
+    scheduler = InferenceScheduler(detector, max_batch_size=detector.batch_size, max_wait_ms=args.max_wait_ms)
+    aggregator = ScoreAggregator()
+    in_flight = threading.BoundedSemaphore(args.max_in_flight)
+    # Frames are resized in the workers only for the vectorized engine, whose predict_batch takes them as they are
+    model_size = detector.batch_preprocessor.size if detector.batch_preprocessor is not None else None
+    
+    decoders = ProcessPoolExecutor(
+        max_workers=args.decode_workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_decoder,
+        initargs=(args.sampling_strategy, args.working_resolution, model_size)
+    )
+    finishers = ThreadPoolExecutor(max_workers=args.max_in_flight, thread_name_prefix='scan-finish')
+    
+    def finish(path, future):
+        try:
+            if future.cancelled():
+                return  # Interrupted before decoding; not recorded, so a resumed scan picks it up
+            try:
+                decoded = future.result()
+                start = time.perf_counter()
+                predictions = scheduler.predict_frames(list(decoded['frames']))
+                record = build_record(path, decoded, predictions, aggregator,
+                                      time.perf_counter() - start, args.frames)
+            except Exception as e:
+                record = error_record(path, e)
+            output.write(record)
+            progress.add(record)
+        except Exception as e:
+            print(f"Error recording {path}: {e}", file=sys.stderr)
+        finally:
+            in_flight.release()
+    
+    stop_reporting = threading.Event()
+    
+    def report():
+        while not stop_reporting.wait(args.report_interval):
+            print(progress.line(), file=sys.stderr)
+    
+    reporter = threading.Thread(target=report, name='scan-progress', daemon=True)
+    reporter.start()
+    try:
+        for path in paths:
+            in_flight.acquire()
+            future = decoders.submit(decode_video, path, args.max_frames)
+            future.add_done_callback(lambda f, path=path: finishers.submit(finish, path, f))
+    except KeyboardInterrupt:
+        print("Interrupted; finishing the videos in flight (run again to resume)", file=sys.stderr)
+        decoders.shutdown(wait=False, cancel_futures=True)
+    finally:
+        # Every finished or cancelled video releases its slot
+        for _ in range(args.max_in_flight):
+            in_flight.acquire()
+        finishers.shutdown()
+        decoders.shutdown()
+        scheduler.shutdown()
+        stop_reporting.set()
+        output.close()
+    return progress
+
+def main():
+    parser = argparse.ArgumentParser(description='Scan directories or manifests of videos for deepfakes')
+    parser.add_argument('inputs', nargs='*', help='Directories (searched recursively) or video files')
+    parser.add_argument('--manifest', help='File listing one video path per line')
+    parser.add_argument('--output', required=True, help='JSONL file, or directory for Parquet parts')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='jsonl', help='Output format')
+    parser.add_argument('--rows-per-part', type=int, default=1000, help='Rows per Parquet part file')
+    parser.add_argument('--retry-errors', action='store_true', help='Scan again videos recorded as errors')
+    parser.add_argument('--frames', action='store_true', help='Also record per-frame probabilities and timestamps')
+    parser.add_argument('--model', default='models/vision_transformer_model.pth', help='ViT weights path')
+    parser.add_argument('--screener', default=None, help='EfficientNet-B0 weights; enables the cascade')
+    parser.add_argument('--cascade-low', type=float, default=DEFAULT_CASCADE_BAND[0])
+    parser.add_argument('--cascade-high', type=float, default=DEFAULT_CASCADE_BAND[1])
+    parser.add_argument('--backend', default='fp32', help='Inference backend (fp32, int8, torchscript, compile, onnx)')
+    parser.add_argument('--preprocessing', choices=PREPROCESSING_ENGINES, default='vectorized')
+    parser.add_argument('--batch-size', default='16', help="Frames per forward pass, or 'auto'")
+    parser.add_argument('--max-wait-ms', type=float, default=10,
+                        help='How long the inference worker waits to fill a batch')
+    parser.add_argument('--decode-workers', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help='Decoder processes')
+    parser.add_argument('--max-in-flight', type=int, default=None,
+                        help='Videos decoded or awaiting inference at once (default: 2 per decode worker)')
+    parser.add_argument('--max-frames', type=int, default=MAX_ANALYSIS_FRAMES, help='Frames sampled per video')
+    parser.add_argument('--working-resolution', type=int, default=360,
+                        help='Shorter side frames are shrunk to after decoding (0 keeps full size)')
+    parser.add_argument('--sampling-strategy', default='auto', help='auto, sequential, seek or keyframe')
+    parser.add_argument('--report-interval', type=float, default=10, help='Seconds between progress lines')
+    args = parser.parse_args()
+    
+    if not args.inputs and not args.manifest:
+        parser.error('Give at least one directory or file, or --manifest')
+    args.max_in_flight = max(1, args.max_in_flight or 2 * args.decode_workers)
+    
+    try:
+        output = ParquetOutput(args.output, args.rows_per_part) if args.format == 'parquet' else JsonlOutput(args.output)
+    except RuntimeError as e:
+        parser.error(str(e))
+    
+    recorded = output.recorded_paths(args.retry_errors)
+    if recorded:
+        print(f"Resuming: {len(recorded)} videos already in {args.output}", file=sys.stderr)
+    
+    def pending_paths(progress):
+        # Also drops duplicates within the inputs; skips are counted as the
+        # scan reaches them, so periodic progress lines include them
+        for path in iter_video_paths(args.inputs, args.manifest):
+            if path in recorded:
+                progress.skip()
+                continue
+            recorded.add(path)
+            yield path
+    
+    detector = DeepfakeDetector(
+        args.model,
+        batch_size=args.batch_size,
+        backend=args.backend,
+        preprocessing=args.preprocessing,
+        screener_path=args.screener,
+        cascade_band=(args.cascade_low, args.cascade_high)
+    )
+    detector.warmup()
+    
+    progress = ScanProgress()
+    scan(pending_paths(progress), detector, output, args, progress)
+    print(progress.line(), file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""
+Pick the cascade's uncertain band from a labelled image folder
+
+Scores every image with the ViT alone and with the EfficientNet-B0 screener,
+then searches screener thresholds for the band (low, high) that sends the
+fewest frames to the ViT while the cascade still agrees with ViT-only
+predictions on at least the target fraction of frames. Accuracy against the
+folder labels is reported for both.
+
+The folder uses the training notebook's layout: real/ and fake/ subfolders
+of .jpg/.png images (unlabelled images directly in the folder also count
+towards agreement).
+
+Usage:
+    python calibrate_cascade.py --data some/folder --screener models/efficientnet-b0_model.pth
+                                [--model models/vision_transformer_model.pth]
+                                [--target-agreement 0.99]
+"""
+import argparse
+import os
+
+import numpy as np
+import torch
+from PIL import Image
+
+from model_loader import DeepfakeDetector
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+def load_labelled_images(data_dir):
+    """
+    Image paths with labels: 1 for fake/, 0 for real/, -1 for unlabelled
+    
+    Returns:
+        tuple: (paths, labels array)
+    """
+    paths, labels = [], []
+    for subdir, label in (('real', 0), ('fake', 1), ('', -1)):
+        folder = os.path.join(data_dir, subdir)
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(folder, name))
+                labels.append(label)
+    return paths, np.array(labels)
+
+def score(detector, model, paths, batch_size):
+    """Probabilities from one of the detector's models (its ViT or screener), in batches"""
+    probabilities = []
+    for start in range(0, len(paths), batch_size):
+        images = [Image.open(p).convert('RGB') for p in paths[start:start + batch_size]]
+        inputs = [detector.preprocess(image) for image in images]
+        if detector.batch_preprocessor is not None:
+            with detector.batch_preprocessor.lock:
+                probabilities.extend(_sigmoid_outputs(model, detector.batch_preprocessor.batch(inputs)))
+        else:
+            probabilities.extend(_sigmoid_outputs(model, torch.stack(inputs).to(detector.device)))
+    return np.array(probabilities)
+
+def _sigmoid_outputs(model, batch):
+    with torch.inference_mode():
+        return torch.sigmoid(model(batch).reshape(-1)).float().cpu().tolist()
+
+def search_band(screener, vit, target_agreement, candidates=201):
+    """
+    Narrowest-escalation band meeting the agreement target
+    
+    For a band (low, high) the screener decides frames below low and above
+    high, and the cascade disagrees with the ViT wherever the screener's
+    label on those frames differs from the ViT's. All (low, high) pairs over
+    a grid of screener quantiles are evaluated at once from cumulative counts.
+    
+    Args:
+        screener: Screener probabilities per frame
+        vit: ViT probabilities per frame
+        target_agreement: Minimum fraction of frames where cascade and ViT agree
+        candidates: Thresholds to try (quantiles of the screener scores)
+    
+    Returns:
+        dict: low, high, agreement and escalated fraction, or None if no
+            band meets the target (only possible for a target above 1)
+    """
+    n = len(screener)
+    mismatch = (screener > 0.5) != (vit > 0.5)
+    thresholds = np.unique(np.concatenate(([0.0, 1.0], np.quantile(screener, np.linspace(0, 1, candidates)))))
+    
+    order = np.argsort(screener)
+    sorted_scores = screener[order]
+    mismatch_prefix = np.concatenate(([0], np.cumsum(mismatch[order])))
+    # Frames strictly below / above each threshold, and the mismatches among them
+    below = np.searchsorted(sorted_scores, thresholds, side='left')
+    not_above = np.searchsorted(sorted_scores, thresholds, side='right')
+    above = n - not_above
+    below_mismatch = mismatch_prefix[below]
+    above_mismatch = mismatch_prefix[-1] - mismatch_prefix[not_above]
+    
+    # low on rows, high on columns; only low <= high is a band
+    disagree = below_mismatch[:, None] + above_mismatch[None, :]
+    escalated = n - below[:, None] - above[None, :]
+    valid = thresholds[:, None] <= thresholds[None, :]
+    agreement = 1.0 - disagree / max(n, 1)
+    feasible = valid & (agreement >= target_agreement)
+    if not feasible.any():
+        return None
+    
+    # Fewest escalations first; agreement (< 1) only breaks ties between equal counts
+    cost = np.where(feasible, escalated - agreement * 0.5, np.inf)
+    i, j = np.unravel_index(np.argmin(cost), cost.shape)
+    return {
+        'low': float(thresholds[i]),
+        'high': float(thresholds[j]),
+        'agreement': float(agreement[i, j]),
+        'escalated': float(escalated[i, j] / max(n, 1))
+    }
+
+def cascade_probabilities(screener, vit, low, high):
+    """What the cascade would output for each frame with this band"""
+    return np.where((screener >= low) & (screener <= high), vit, screener)
+
+def accuracy(probabilities, labels):
+    """Share of labelled frames predicted correctly (flipped logic: > 0.5 is Real)"""
+    labelled = labels >= 0
+    if not labelled.any():
+        return None
+    predicted_fake = probabilities[labelled] <= 0.5
+    return float(np.mean(predicted_fake == (labels[labelled] == 1)))
+
+def main():
+    parser = argparse.ArgumentParser(description='Calibrate the screener/ViT cascade band')
+    parser.add_argument('--data', required=True, help='Folder with real/ and fake/ images')
+    parser.add_argument('--screener', required=True, help='EfficientNet-B0 screener weights')
+    parser.add_argument('--model', default='models/vision_transformer_model.pth', help='ViT weights path')
+    parser.add_argument('--target-agreement', type=float, default=0.99,
+                        help='Minimum fraction of frames where the cascade matches ViT-only predictions')
+    parser.add_argument('--batch-size', type=int, default=16, help='Frames per forward pass')
+    args = parser.parse_args()
+    
+    paths, labels = load_labelled_images(args.data)
+    if not paths:
+        parser.error(f"No images found in {args.data}")
+    print(f"Scoring {len(paths)} images ({int(np.sum(labels >= 0))} labelled)\n")
+    
+    detector = DeepfakeDetector(args.model, batch_size=args.batch_size, screener_path=args.screener)
+    vit = score(detector, detector.model, paths, args.batch_size)
+    screener = score(detector, detector.screener, paths, args.batch_size)
+    
+    band = search_band(screener, vit, args.target_agreement)
+    if band is None:
+        print(f"No band reaches {args.target_agreement:.1%} agreement")
+        return
+    
+    cascade = cascade_probabilities(screener, vit, band['low'], band['high'])
+    vit_accuracy = accuracy(vit, labels)
+    cascade_accuracy = accuracy(cascade, labels)
+    
+    print(f"{'band':<24}[{band['low']:.4f}, {band['high']:.4f}]")
+    print(f"{'agreement with ViT':<24}{band['agreement']:.2%}")
+    print(f"{'frames sent to ViT':<24}{band['escalated']:.2%}")
+    if vit_accuracy is not None:
+        print(f"{'accuracy (ViT only)':<24}{vit_accuracy:.2%}")
+        print(f"{'accuracy (cascade)':<24}{cascade_accuracy:.2%}")
+    print(f"\nCASCADE_LOW={band['low']:.4f} CASCADE_HIGH={band['high']:.4f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Parity and throughput check for the inference backends
+
+Scores a fixed set of frames with the FP32 model and the original PIL
+preprocessing, then with every backend using the selected preprocessing
+engine, and reports the maximum probability deviation from the reference and
+the frames/s of each backend. With the vectorized engine it also checks that
+BatchPreprocessor inputs stay within PIL_PARITY_TOLERANCE of the PIL transform
+and exits with an error otherwise.
+
+Usage:
+    python check_backends.py [--model models/vision_transformer_model.pth]
+                             [--frames-dir some/images] [--backends int8 onnx]
+                             [--preprocessing vectorized]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+from PIL import Image
+
+from inference_backends import INFERENCE_BACKENDS
+from model_loader import DeepfakeDetector
+from preprocessing import BatchPreprocessor, PIL_PARITY_TOLERANCE, PREPROCESSING_ENGINES
+
+def fixed_frames(count=32, seed=0):
+    """Deterministic synthetic frames: smooth gradients plus noise at a few resolutions"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i in range(count):
+        height, width = [(240, 320), (480, 640), (720, 1280)][i % 3]
+        y, x = np.mgrid[0:height, 0:width]
+        base = np.stack([x * 255 / width, y * 255 / height, np.full_like(x, (i * 37) % 255)], axis=-1)
+        noise = rng.normal(0, 20, size=(height, width, 3))
+        frames.append(Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8)))
+    return frames
+
+def load_frames(frames_dir):
+    """Load every image in a folder (sorted by name for a stable order)"""
+    names = sorted(n for n in os.listdir(frames_dir) if n.lower().endswith(('.jpg', '.jpeg', '.png')))
+    return [Image.open(os.path.join(frames_dir, n)).convert('RGB') for n in names]
+
+def score(detector, frames):
+    """
+    Probabilities for the frames in batches of the detector's batch size
+    
+    Unlike predict_frames, which turns a failed batch into 0.5 placeholders,
+    errors propagate so a broken backend cannot pass as a working one.
+    """
+    batch_size = detector._resolve_batch_size(detector.batch_size)
+    probabilities = []
+    for start in range(0, len(frames), batch_size):
+        probabilities.extend(detector._predict_probabilities(frames[start:start + batch_size])[0])
+    return np.array(probabilities)
+
+def input_deviation(transform, frames):
+    """
+    Largest per-element difference between BatchPreprocessor and the PIL transform
+    
+    Args:
+        transform: Reference torchvision transform (DeepfakeDetector.transform)
+        frames: List of PIL Images
+    
+    Returns:
+        float: Max absolute deviation of the normalized inputs
+    """
+    preprocessor = BatchPreprocessor(224)
+    vectorized = preprocessor.batch([preprocessor.resize(frame) for frame in frames])
+    reference = torch.stack([transform(frame) for frame in frames])
+    return float((vectorized - reference).abs().max())
+
+def measure(detector, frames, repeats):
+    """Probabilities for the frames plus best-of-N frames/s"""
+    probabilities = score(detector, frames)
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        score(detector, frames)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return probabilities, len(frames) / best
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare inference backends against FP32')
+    parser.add_argument('--model', default='models/vision_transformer_model.pth', help='Model weights path')
+    parser.add_argument('--frames-dir', help='Folder of images to score (default: synthetic frames)')
+    parser.add_argument('--backends', nargs='+', default=list(INFERENCE_BACKENDS), help='Backends to check')
+    parser.add_argument('--batch-size', type=int, default=16, help='Frames per forward pass')
+    parser.add_argument('--preprocessing', default='vectorized', choices=PREPROCESSING_ENGINES,
+                        help='Preprocessing engine for the backends under test')
+    parser.add_argument('--repeats', type=int, default=3, help='Timed runs per backend (best is reported)')
+    args = parser.parse_args()
+    
+    frames = load_frames(args.frames_dir) if args.frames_dir else fixed_frames()
+    print(f"Scoring {len(frames)} frames at batch size {args.batch_size}\n")
+    
+    # The reference is always FP32 with the original PIL transform
+    variants = [('fp32', 'pil')] + [(b, args.preprocessing) for b in args.backends
+                                    if (b, args.preprocessing) != ('fp32', 'pil')]
+    
+    reference = None
+    parity = None
+    print(f"{'backend':<24}{'max |dp|':>12}{'mean |dp|':>12}{'label flips':>13}{'frames/s':>11}")
+    for backend, preprocessing in variants:
+        label = f"{backend} ({preprocessing})"
+        try:
+            detector = DeepfakeDetector(args.model, batch_size=args.batch_size, backend=backend,
+                                        preprocessing=preprocessing)
+            probabilities, throughput = measure(detector, frames, args.repeats)
+        except Exception as e:
+            if reference is None:
+                # Without the reference there is nothing to compare against
+                print(f"{label:<24}failed: {e}")
+                sys.exit(f"Reference backend {label} failed; aborting")
+            print(f"{label:<24}unavailable: {e}")
+            continue
+        
+        if reference is None:
+            reference = probabilities
+            if args.preprocessing == 'vectorized':
+                parity = input_deviation(detector.transform, frames)
+        deviation = np.abs(probabilities - reference)
+        flips = int(np.sum((probabilities > 0.5) != (reference > 0.5)))
+        print(f"{label:<24}{deviation.max():>12.2e}{deviation.mean():>12.2e}{flips:>13}{throughput:>11.1f}")
+    
+    if parity is not None:
+        print(f"\nInput max |dx| vectorized vs PIL: {parity:.2e} (tolerance {PIL_PARITY_TOLERANCE:.2e})")
+        if parity > PIL_PARITY_TOLERANCE:
+            sys.exit("Vectorized preprocessing drifted from the PIL transform beyond tolerance")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Enough of the file to recognize every supported container
+SNIFF_BYTES = 16
+
+# ISO base media (MP4/MOV) files start with one of these top-level boxes
+_ISO_BOXES = (b'ftyp', b'moov', b'mdat', b'free', b'skip', b'wide', b'pnot')
+_ASF_GUID = bytes.fromhex('3026b2758e66cf11a6d900aa0062ce6c')
+
+# Containers each allowed extension may hold (.mov and .mp4 are often mislabeled)
+EXTENSION_CONTAINERS = {
+    '.mp4': ('mp4',),
+    '.mov': ('mp4',),
+    '.avi': ('avi',),
+    '.mkv': ('matroska',),
+    '.wmv': ('asf',),
+    '.flv': ('flv',)
+}
+
+def sniff_container(head):
+    """
+    Identify a video container from the first bytes of the file
+    
+    Returns:
+        str: 'mp4' (ISO base media, including MOV), 'avi', 'matroska', 'asf',
+            'flv', or None if the header matches none of them
+    """
+    if len(head) >= 8 and head[4:8] in _ISO_BOXES:
+        return 'mp4'
+    if head[:4] == b'RIFF' and head[8:12] == b'AVI ':
+        return 'avi'
+    if head[:4] == b'\x1a\x45\xdf\xa3':
+        return 'matroska'
+    if head[:16] == _ASF_GUID:
+        return 'asf'
+    if head[:3] == b'FLV':
+        return 'flv'
+    return None
+
+class UploadError(Exception):
+    """Raised when a chunk cannot be accepted; status is the HTTP status to return"""
+    
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+class ChunkedUploads:
+    """
+    Resumable uploads written to disk a chunk at a time
+    
+    Each upload is a .part file plus a small JSON sidecar, so an interrupted
+    upload can be resumed from the committed offset, also after a restart or
+    from another server process. Chunks are streamed from the request to the
+    file in fixed-size pieces, so memory does not grow with the file size.
+    The SHA-256 is updated as chunks arrive; if another process wrote part of
+    the file, the committed prefix is re-read once to rebuild it. The
+    container header is checked as soon as the first bytes arrive.
+    """
+    
+    def __init__(self, directory, max_size, session_ttl=86400, chunk_size=1024 * 1024):
+        """
+        Args:
+            directory: Where partial uploads are kept
+            max_size: Largest file accepted, in bytes
+            session_ttl: Seconds an idle upload is kept before it is discarded
+            chunk_size: Read/write size when streaming a chunk to disk
+        """
+        self.directory = directory
+        self.max_size = int(max_size)
+        self.session_ttl = float(session_ttl)
+        self.chunk_size = int(chunk_size)
+        os.makedirs(directory, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._locks = {}  # upload_id -> RLock serializing its chunks
+        self._digests = {}  # upload_id -> (offset, sha256 object)
+    
+    def _paths(self, upload_id):
+        base = os.path.join(self.directory, os.path.basename(upload_id))
+        return base + '.part', base + '.json'
+    
+    def _upload_lock(self, upload_id):
+        with self._lock:
+            return self._locks.setdefault(upload_id, threading.RLock())
+    
+    @contextmanager
+    def locked(self, upload_id):
+        """
+        Hold an upload's lock across several steps, e.g. appending the last
+        chunk, committing the file and starting its job
+        
+        Only serializes requests within this process.
+        """
+        lock = self._upload_lock(upload_id)
+        try:
+            with lock:
+                yield
+        finally:
+            # Forget the lock once the upload is gone; requests already waiting hold a reference
+            if not os.path.exists(self._paths(upload_id)[1]):
+                with self._lock:
+                    if self._locks.get(upload_id) is lock:
+                        del self._locks[upload_id]
+    
+    def _load(self, upload_id):
+        part_path, meta_path = self._paths(upload_id)
+        try:
+            with open(meta_path) as f:
+                session = json.load(f)
+        except (OSError, ValueError):
+            raise UploadError('Upload not found', status=404)
+        session['offset'] = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        return session
+    
+    def create(self, upload_id, filename, size, metadata=None):
+        """
+        Start an upload
+        
+        Args:
+            upload_id: Identifier for the upload (reused as the job ID)
+            filename: Original file name; its extension must be supported
+            size: Total size in bytes, announced up front
+            metadata: JSON-serializable dict kept with the session (e.g. job options)
+        
+        Returns:
+            dict: The upload session
+        """
+        extension = os.path.splitext(filename)[1].lower()
+        if extension not in EXTENSION_CONTAINERS:
+            raise UploadError('File type not supported')
+        if size <= 0:
+            raise UploadError('Upload size must be positive')
+        if size > self.max_size:
+            raise UploadError(f'File size must be at most {self.max_size // (1024 * 1024)}MB', status=413)
+        
+        session = {
+            'upload_id': upload_id,
+            'filename': filename,
+            'size': int(size),
+            'metadata': metadata or {},
+            'created_ts': time.time()
+        }
+        part_path, meta_path = self._paths(upload_id)
+        open(part_path, 'wb').close()
+        with open(meta_path, 'w') as f:
+            json.dump(session, f)
+        return dict(session, offset=0)
+    
+    def status(self, upload_id):
+        """The upload session with its committed offset"""
+        return self._load(upload_id)
+    
+    def _digest(self, upload_id, part_path, offset):
+        """Running hash of the first offset bytes, rebuilt from disk if needed"""
+        cached = self._digests.get(upload_id)
+        if cached is not None and cached[0] == offset:
+            return cached[1]
+        
+        digest = hashlib.sha256()
+        with open(part_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                digest.update(chunk)
+        return digest
+    
+    def append(self, upload_id, offset, stream, length=None):
+        """
+        Write the next chunk of an upload
+        
+        Args:
+            upload_id: Upload to extend
+            offset: Byte offset the client believes the chunk starts at; must
+                match the committed offset
+            stream: File-like object with the chunk's bytes
+            length: Chunk length if known (e.g. Content-Length)
+        
+        Returns:
+            dict: The session, with 'complete' and, once complete,
+                'content_hash' (SHA-256 of the whole file)
+        
+        Raises:
+            UploadError: 404 unknown upload, 409 offset mismatch (with the
+                committed offset), 413 data past the announced size, 415 not
+                a supported video container
+        """
+        with self._upload_lock(upload_id):
+            session = self._load(upload_id)
+            part_path, _ = self._paths(upload_id)
+            committed = session['offset']
+            if offset != committed:
+                raise UploadError('Offset does not match the committed upload offset', status=409, offset=committed)
+            
+            remaining = session['size'] - committed
+            if length is not None and length > remaining:
+                raise UploadError('Chunk extends past the announced upload size', status=413, offset=committed)
+            
+            digest = self._digest(upload_id, part_path, committed)
+            written = 0
+            try:
+                with open(part_path, 'ab') as out:
+                    head = b''
+                    for chunk in iter(lambda: stream.read(self.chunk_size), b''):
+                        if written + len(chunk) > remaining:
+                            raise UploadError('Chunk extends past the announced upload size', status=413)
+                        
+                        # Check the container before anything past its header is kept
+                        if committed + written < SNIFF_BYTES:
+                            head += chunk
+                            if committed + len(head) >= min(SNIFF_BYTES, session['size']):
+                                self._check_container(session, part_path, committed, head)
+                        
+                        out.write(chunk)
+                        digest.update(chunk)
+                        written += len(chunk)
+            except UploadError as e:
+                if e.status == 415:
+                    self.discard(upload_id)
+                    raise
+                # Drop the partial chunk so the committed offset stays consistent with the hash
+                with open(part_path, 'ab') as out:
+                    out.truncate(committed)
+                self._digests.pop(upload_id, None)
+                e.offset = committed
+                raise
+            except Exception:
+                with open(part_path, 'ab') as out:
+                    out.truncate(committed)
+                self._digests.pop(upload_id, None)
+                raise
+            
+            session['offset'] = committed + written
+            session['complete'] = session['offset'] == session['size']
+            if session['complete']:
+                session['content_hash'] = digest.hexdigest()
+                self._digests.pop(upload_id, None)
+            else:
+                self._digests[upload_id] = (session['offset'], digest)
+            return session
+    
+    def _check_container(self, session, part_path, committed, head):
+        """Raise a 415 UploadError unless the file starts like its extension says"""
+        if committed:
+            with open(part_path, 'rb') as f:
+                head = f.read(committed) + head
+        container = sniff_container(head[:SNIFF_BYTES])
+        extension = os.path.splitext(session['filename'])[1].lower()
+        if container not in EXTENSION_CONTAINERS[extension]:
+            raise UploadError(f'File content is not a valid {extension[1:].upper()} video', status=415)
+    
+    def commit(self, upload_id, destination):
+        """Move a complete upload to its final path and drop the session (call under locked())"""
+        part_path, _ = self._paths(upload_id)
+        os.replace(part_path, destination)
+        self._remove(upload_id)
+    
+    def discard(self, upload_id):
+        """Remove an upload's partial file and session"""
+        self._remove(upload_id)
+        with self._lock:
+            self._locks.pop(upload_id, None)
+    
+    def _remove(self, upload_id):
+        for path in self._paths(upload_id):
+            if os.path.exists(path):
+                os.remove(path)
+        self._digests.pop(upload_id, None)
+    
+    def expire_sessions(self, now=None):
+        """
+        Discard uploads that have not received data for session_ttl seconds
+        
+        Returns:
+            int: Number of uploads discarded
+        """
+        now = now or time.time()
+        expired = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            upload_id = name[:-len('.json')]
+            try:
+                last_write = max(os.path.getmtime(p) for p in self._paths(upload_id) if os.path.exists(p))
+            except (OSError, ValueError):
+                continue  # Committed or discarded meanwhile
+            if now - last_write > self.session_ttl:
+                self.discard(upload_id)
+                expired += 1
+        return expired
+    
+    def get_stats(self):
+        """
+        Returns:
+            dict: Uploads in progress and the bytes they hold
+        """
+        sessions = 0
+        held = 0
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.name.endswith('.json'):
+                    sessions += 1
+                elif entry.name.endswith('.part'):
+                    held += entry.stat().st_size
+            except OSError:
+                pass
+        return {'in_progress': sessions, 'bytes_held': held}
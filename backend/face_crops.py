@@ -0,0 +1,270 @@
+import itertools
+import os
+
+import cv2
+import numpy as np
+
+class FaceDetector:
+    """CPU face detector built from what ships with OpenCV"""
+    
+    def __init__(self, model_path=None, min_size=24, score_threshold=0.6):
+        """
+        Args:
+            model_path: Optional YuNet ONNX file for cv2.FaceDetectorYN; without
+                it the bundled Haar frontal-face cascade is used
+            min_size: Smallest face side in pixels
+            score_threshold: Minimum YuNet confidence
+        """
+        self.min_size = int(min_size)
+        self.score_threshold = float(score_threshold)
+        self._yunet = None
+        self._cascade = None
+        
+        if model_path:
+            if not hasattr(cv2, 'FaceDetectorYN'):
+                raise ValueError("This OpenCV build has no FaceDetectorYN; unset the face detector model")
+            self._yunet = cv2.FaceDetectorYN.create(model_path, '', (320, 320), self.score_threshold)
+            self.name = 'yunet'
+        else:
+            cascade_dir = getattr(getattr(cv2, 'data', None), 'haarcascades', '')
+            cascade_path = os.path.join(cascade_dir, 'haarcascade_frontalface_default.xml')
+            if not os.path.exists(cascade_path):
+                raise ValueError(f"Haar cascade not found at {cascade_path}; install opencv-python")
+            self._cascade = cv2.CascadeClassifier(cascade_path)
+            self.name = 'haar'
+    
+    def detect(self, frame):
+        """
+        Find faces in an RGB frame
+        
+        Returns:
+            list: (x, y, w, h, score) tuples in frame pixels
+        """
+        if self._yunet is not None:
+            height, width = frame.shape[:2]
+            self._yunet.setInputSize((width, height))
+            _, faces = self._yunet.detect(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+            if faces is None:
+                return []
+            boxes = []
+            for face in faces:
+                # YuNet boxes can extend past the frame edges
+                x0, y0 = max(0, int(face[0])), max(0, int(face[1]))
+                x1, y1 = min(width, int(face[0] + face[2])), min(height, int(face[1] + face[3]))
+                if min(x1 - x0, y1 - y0) >= self.min_size:
+                    boxes.append((x0, y0, x1 - x0, y1 - y0, float(face[14])))
+            return boxes
+        
+        gray = cv2.equalizeHist(cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY))
+        boxes = self._cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5,
+                                               minSize=(self.min_size, self.min_size))
+        return [(int(x), int(y), int(w), int(h), 1.0) for x, y, w, h in boxes]
+
+def box_iou(a, b):
+    """Intersection over union of two (x, y, w, h) boxes"""
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[0] + a[2], b[0] + b[2]), min(a[1] + a[3], b[1] + b[3])
+    intersection = max(0, x2 - x1) * max(0, y2 - y1)
+    union = a[2] * a[3] + b[2] * b[3] - intersection
+    return intersection / union if union > 0 else 0.0
+
+class _Track:
+    """One face followed across sampled frames"""
+    
+    def __init__(self, track_id, box, gray):
+        self.track_id = track_id
+        self.box = box
+        self.template = None
+        self.set_box(box, gray)
+    
+    def set_box(self, box, gray):
+        x, y, w, h = box
+        self.box = box
+        self.template = gray[y:y + h, x:x + w].copy()
+
+class FaceTracker:
+    """
+    Carry face tracks across sampled frames so detection runs only occasionally
+    
+    The detector runs every detect_interval frames, and whenever a track is
+    lost. In between, each track is followed by template matching in a window
+    around its last box, which is far cheaper than a full detection pass.
+    """
+    
+    def __init__(self, detector, detect_interval=5, max_faces=4, match_threshold=0.5):
+        """
+        Args:
+            detector: FaceDetector (anything with detect(frame) -> boxes)
+            detect_interval: Frames between detector runs while tracks hold
+            max_faces: Faces returned per frame, largest first
+            match_threshold: Minimum normalized template correlation to keep a track
+        """
+        self.detector = detector
+        self.detect_interval = max(1, int(detect_interval))
+        self.max_faces = max(1, int(max_faces))
+        self.match_threshold = float(match_threshold)
+        
+        self._tracks = []
+        self._ids = itertools.count()
+        self._since_detect = None
+        self.detector_runs = 0
+    
+    def update(self, frame):
+        """
+        Locate faces in the next sampled frame
+        
+        Args:
+            frame: RGB numpy array
+        
+        Returns:
+            list: (track_id, (x, y, w, h)) for up to max_faces faces
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+        lost = self._follow(gray) if self._since_detect is not None else True
+        
+        if lost or self._since_detect >= self.detect_interval:
+            self._detect(frame, gray)
+        else:
+            self._since_detect += 1
+        
+        tracks = sorted(self._tracks, key=lambda t: t.box[2] * t.box[3], reverse=True)
+        return [(t.track_id, t.box) for t in tracks]
+    
+    def _detect(self, frame, gray):
+        """Run the detector and match detections to existing tracks by overlap"""
+        self.detector_runs += 1
+        self._since_detect = 1
+        # Most confident first, larger faces breaking ties (Haar has no scores)
+        detections = sorted(self.detector.detect(frame), key=lambda d: (d[4], d[2] * d[3]), reverse=True)
+        
+        tracks = []
+        unmatched = list(self._tracks)
+        for x, y, w, h, _ in detections[:self.max_faces]:
+            box = (x, y, w, h)
+            best = max(unmatched, key=lambda t: box_iou(t.box, box), default=None)
+            if best is not None and box_iou(best.box, box) >= 0.3:
+                unmatched.remove(best)
+                best.set_box(box, gray)
+                tracks.append(best)
+            else:
+                tracks.append(_Track(next(self._ids), box, gray))
+        self._tracks = tracks
+    
+    def _follow(self, gray):
+        """
+        Move every track to its best template match near the previous box
+        
+        Returns:
+            bool: True if any track was lost (the caller then re-detects)
+        """
+        height, width = gray.shape
+        lost = False
+        kept = []
+        for track in self._tracks:
+            x, y, w, h = track.box
+            x0, y0 = max(0, x - w // 2), max(0, y - h // 2)
+            x1, y1 = min(width, x + w + w // 2), min(height, y + h + h // 2)
+            window = gray[y0:y1, x0:x1]
+            if window.shape[0] < h or window.shape[1] < w:
+                lost = True
+                continue
+            
+            scores = cv2.matchTemplate(window, track.template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, (dx, dy) = cv2.minMaxLoc(scores)
+            if score < self.match_threshold:
+                lost = True
+                continue
+            
+            track.set_box((x0 + dx, y0 + dy, w, h), gray)
+            kept.append(track)
+        
+        self._tracks = kept
+        return lost
+
+def crop_face(frame, box, margin=0.25):
+    """
+    Square crop around a face box, padded by margin on every side
+    
+    The square is shifted to stay inside the frame where possible.
+    """
+    height, width = frame.shape[:2]
+    x, y, w, h = box
+    side = min(int(round(max(w, h) * (1 + 2 * margin))), width, height)
+    cx, cy = x + w / 2, y + h / 2
+    x0 = int(min(max(0, round(cx - side / 2)), width - side))
+    y0 = int(min(max(0, round(cy - side / 2)), height - side))
+    return frame[y0:y0 + side, x0:x0 + side]
+
+class FrameFaces:
+    """Model inputs for one frame: a crop per face, or the whole frame if none"""
+    
+    def __init__(self, inputs, faces):
+        self.inputs = inputs
+        self.faces = faces  # [{'track_id': int, 'box': [x, y, w, h]}], empty for whole-frame
+
+class FaceCropStage:
+    """
+    Score faces instead of whole frames
+    
+    Plugs into FramePipeline/AdaptiveSampler as the preprocess and predict
+    functions: preprocess finds faces and crops them, predict flattens the
+    crops of a whole batch of frames into one call to the underlying predictor
+    and folds the scores back into one prediction per frame. A frame is as
+    fake as its most fake face; frames without faces fall back to scoring the
+    whole frame. One stage per job, since it carries face tracks.
+    """
+    
+    def __init__(self, tracker, preprocess_fn, predict_fn, source_width=None, margin=0.25):
+        """
+        Args:
+            tracker: FaceTracker for this video
+            preprocess_fn: Callable image -> model input
+            predict_fn: Callable list of inputs -> list of prediction dicts
+            source_width: Width of the original video, to report boxes in its
+                pixels when frames were downscaled at decode time
+            margin: Padding around each face box, as a fraction of its size
+        """
+        self.tracker = tracker
+        self.preprocess_fn = preprocess_fn
+        self.predict_fn = predict_fn
+        self.source_width = source_width
+        self.margin = float(margin)
+        self.faces_scored = 0
+    
+    def preprocess(self, frame):
+        """Detect/track faces in an RGB frame and preprocess a crop of each"""
+        frame = np.asarray(frame)
+        tracked = self.tracker.update(frame)
+        if not tracked:
+            return FrameFaces([self.preprocess_fn(frame)], [])
+        
+        scale = self.source_width / frame.shape[1] if self.source_width else 1.0
+        inputs = []
+        faces = []
+        for track_id, box in tracked:
+            inputs.append(self.preprocess_fn(crop_face(frame, box, self.margin)))
+            faces.append({
+                'track_id': track_id,
+                'box': [int(round(v * scale)) for v in box]
+            })
+        return FrameFaces(inputs, faces)
+    
+    def predict(self, items):
+        """Score every crop of every frame in one batch, then fold back per frame"""
+        flat = [x for item in items for x in item.inputs]
+        predictions = iter(self.predict_fn(flat) if flat else [])
+        
+        results = []
+        for item in items:
+            crop_predictions = [next(predictions) for _ in item.inputs]
+            if not item.faces:
+                results.append(dict(crop_predictions[0], faces=[]))
+                continue
+            
+            self.faces_scored += len(item.faces)
+            faces = [dict(face, **prediction) for face, prediction in zip(item.faces, crop_predictions)]
+            scored = [p for p in crop_predictions if p['prediction'] != 'Error']
+            # Flipped logic: low probability means fake, so the most fake face has the lowest
+            frame_prediction = min(scored, key=lambda p: p['probability']) if scored else crop_predictions[0]
+            results.append(dict(frame_prediction, faces=faces))
+        return results
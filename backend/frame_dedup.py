@@ -0,0 +1,62 @@
+import numpy as np
+from PIL import Image
+
+def dhash(image, hash_size=8):
+    """
+    Difference hash of an image
+    
+    Args:
+        image: PIL Image or numpy array (RGB)
+        hash_size: Hash is hash_size x hash_size bits
+    
+    Returns:
+        int: Perceptual hash as an integer bitfield
+    """
+    if isinstance(image, np.ndarray):
+        image = Image.fromarray(image)
+    
+    small = image.convert('L').resize((hash_size + 1, hash_size), Image.BOX)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int(np.packbits(bits).tobytes().hex(), 16)
+
+class FrameDeduplicator:
+    """Match frames to earlier near-identical frames of the same video"""
+    
+    def __init__(self, max_distance=4, hash_size=8):
+        """
+        Args:
+            max_distance: Largest Hamming distance treated as the same frame
+            hash_size: dHash size (hash has hash_size ** 2 bits)
+        """
+        self.max_distance = int(max_distance)
+        self.hash_size = int(hash_size)
+        self._representatives = []  # (hash, frame position) of frames that get scored
+    
+    def match(self, image, position):
+        """
+        Check a frame against the frames that will be scored
+        
+        Args:
+            image: PIL Image or numpy array
+            position: Index of this frame in the video's sampled frames
+        
+        Returns:
+            int: Position of the frame whose prediction can be reused, or None
+                if this frame needs its own prediction
+        """
+        frame_hash = dhash(image, self.hash_size)
+        
+        best_position = None
+        best_distance = self.max_distance + 1
+        for representative_hash, representative_position in self._representatives:
+            distance = bin(frame_hash ^ representative_hash).count('1')
+            if distance < best_distance:
+                best_distance = distance
+                best_position = representative_position
+                if distance == 0:
+                    break
+        
+        if best_position is None:
+            self._representatives.append((frame_hash, position))
+        return best_position
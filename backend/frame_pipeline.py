@@ -0,0 +1,177 @@
+import contextvars
+import queue
+import threading
+import time
+
+from frame_dedup import FrameDeduplicator
+
+# Marks the end of a stage's output
+_END = object()
+
+class _StageError:
+    """Carries an exception from a stage thread to the consumer"""
+    
+    def __init__(self, error):
+        self.error = error
+
+class FramePipeline:
+    """Overlap frame decoding, preprocessing and inference with bounded buffers"""
+    
+    def __init__(self, frame_source, preprocess_fn, predict_fn, batch_size=16, buffer_size=8,
+                 dedup_distance=None):
+        """
+        Args:
+            frame_source: Callable (video_path, max_frames) -> iterator of (frame, timestamp)
+            preprocess_fn: Callable frame -> model input tensor
+            predict_fn: Callable list of inputs -> list of prediction dicts
+            batch_size: Inputs handed to predict_fn at once
+            buffer_size: Capacity of each queue between stages
+            dedup_distance: Reuse the prediction of an earlier frame whose dHash is
+                within this Hamming distance (None disables deduplication)
+        """
+        self.frame_source = frame_source
+        self.preprocess_fn = preprocess_fn
+        self.predict_fn = predict_fn
+        self.batch_size = max(1, int(batch_size))
+        self.buffer_size = max(1, int(buffer_size))
+        self.dedup_distance = dedup_distance
+    
+    def run(self, video_path, max_frames, progress_callback=None):
+        """
+        Stream a video through decode -> preprocess -> inference
+        
+        Args:
+            video_path: Path to video file
+            max_frames: Maximum number of frames to sample
+            progress_callback: Optional callback called after each batch with
+                (frames_done, max_frames)
+        
+        Returns:
+            dict: {'timestamps': list, 'predictions': list, 'reused_from': list,
+                'frames_reused': int, 'processing_time': float}. reused_from holds,
+                per frame, the position of the frame whose prediction was reused
+                (None for frames that were scored)
+        """
+        start_time = time.time()
+        stop = threading.Event()
+        decoded = queue.Queue(maxsize=self.buffer_size)
+        preprocessed = queue.Queue(maxsize=max(self.buffer_size, self.batch_size))
+        
+        # Stage threads run in a copy of the caller's context, so per-job timings reach the job's profile
+        decoder = threading.Thread(
+            target=contextvars.copy_context().run,
+            args=(self._decode_stage, video_path, max_frames, decoded, stop),
+            name='pipeline-decode',
+            daemon=True
+        )
+        preprocessor = threading.Thread(
+            target=contextvars.copy_context().run,
+            args=(self._preprocess_stage, decoded, preprocessed, stop),
+            name='pipeline-preprocess',
+            daemon=True
+        )
+        decoder.start()
+        preprocessor.start()
+        
+        timestamps = []
+        predictions = []
+        reused_from = []
+        try:
+            finished = False
+            while not finished:
+                batch = []
+                while len(batch) < self.batch_size:
+                    item = preprocessed.get()
+                    if item is _END:
+                        finished = True
+                        break
+                    if isinstance(item, _StageError):
+                        raise item.error
+                    
+                    position, tensor, timestamp, source = item
+                    timestamps.append(timestamp)
+                    predictions.append(None)
+                    reused_from.append(source)
+                    if source is None:
+                        batch.append((position, tensor))
+                
+                if batch:
+                    batch_predictions = self.predict_fn([tensor for _, tensor in batch])
+                    for (position, _), prediction in zip(batch, batch_predictions):
+                        predictions[position] = prediction
+                
+                if progress_callback:
+                    progress_callback(len(predictions), max(max_frames, len(predictions)))
+        finally:
+            # Unblock the stage threads if we are leaving early
+            stop.set()
+            decoder.join()
+            preprocessor.join()
+        
+        # Duplicates point at an earlier position, which is always scored by now
+        for position, source in enumerate(reused_from):
+            if source is not None:
+                predictions[position] = predictions[source]
+        
+        return {
+            'timestamps': timestamps,
+            'predictions': predictions,
+            'reused_from': reused_from,
+            'frames_reused': sum(1 for source in reused_from if source is not None),
+            'processing_time': time.time() - start_time
+        }
+    
+    @staticmethod
+    def _put(out_queue, item, stop):
+        """Put with a periodic stop check so a stage never blocks forever"""
+        while not stop.is_set():
+            try:
+                out_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def _decode_stage(self, video_path, max_frames, out_queue, stop):
+        """Decode frames and push them downstream"""
+        frames = self.frame_source(video_path, max_frames)
+        try:
+            for frame, timestamp in frames:
+                if not self._put(out_queue, (frame, timestamp), stop):
+                    return
+            self._put(out_queue, _END, stop)
+        except Exception as e:
+            self._put(out_queue, _StageError(e), stop)
+        finally:
+            # Release the capture now rather than when the generator is collected
+            close = getattr(frames, 'close', None)
+            if close:
+                close()
+    
+    def _preprocess_stage(self, in_queue, out_queue, stop):
+        """Turn decoded frames into model input tensors, dropping the full-size frame"""
+        deduplicator = FrameDeduplicator(self.dedup_distance) if self.dedup_distance is not None else None
+        position = 0
+        try:
+            while not stop.is_set():
+                try:
+                    item = in_queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                
+                if item is _END or isinstance(item, _StageError):
+                    self._put(out_queue, item, stop)
+                    return
+                
+                frame, timestamp = item
+                
+                # Near-identical to a frame already headed for the model: skip preprocessing
+                source = deduplicator.match(frame, position) if deduplicator else None
+                tensor = self.preprocess_fn(frame) if source is None else None
+                del frame, item
+                
+                if not self._put(out_queue, (position, tensor, timestamp, source), stop):
+                    return
+                position += 1
+        except Exception as e:
+            self._put(out_queue, _StageError(e), stop)
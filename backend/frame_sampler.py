@@ -0,0 +1,214 @@
+import cv2
+import time
+
+SAMPLING_STRATEGIES = ('auto', 'sequential', 'seek', 'keyframe')
+
+class FrameSampler:
+    """Read a set of frame indices from an open capture using the cheapest access pattern"""
+    
+    def __init__(self, strategy='auto', snap_to_keyframes=False, keyframe_interval=None, probe_frames=8):
+        """
+        Args:
+            strategy: One of SAMPLING_STRATEGIES; 'auto' picks per file
+            snap_to_keyframes: Let 'auto' move samples onto estimated keyframes
+                (changes which frames are sampled, so it is opt-in)
+            keyframe_interval: Known GOP length; skips the seek-cost probe when set
+            probe_frames: Frames decoded to estimate per-frame decode cost
+        """
+        if strategy not in SAMPLING_STRATEGIES:
+            raise ValueError(f"Unknown sampling strategy: {strategy}")
+        
+        self.strategy = strategy
+        self.snap_to_keyframes = snap_to_keyframes
+        self.keyframe_interval = keyframe_interval
+        self.probe_frames = max(1, int(probe_frames))
+    
+    def iter_frames(self, cap, frame_indices):
+        """
+        Yield the requested frames from an open capture
+        
+        Args:
+            cap: Opened cv2.VideoCapture positioned anywhere
+            frame_indices: Ascending frame indices to read
+        
+        Yields:
+            tuple: (frame_index, BGR numpy array)
+        """
+        frame_indices = list(frame_indices)
+        if not frame_indices:
+            return
+        
+        strategy, plan = self.choose_strategy(cap, frame_indices)
+        
+        if strategy == 'sequential':
+            yield from self._read_sequential(cap, frame_indices)
+        elif strategy == 'keyframe':
+            yield from self._read_keyframes(cap, frame_indices, plan['keyframe_interval'])
+        else:
+            yield from self._read_seek(cap, frame_indices)
+    
+    def choose_strategy(self, cap, frame_indices):
+        """
+        Pick a strategy for this file
+        
+        Compares the cost of decoding every frame up to the last sample
+        against the cost of one seek per sample, using a short timing probe.
+        
+        Returns:
+            tuple: (strategy, dict with the estimates behind the choice)
+        """
+        if self.strategy != 'auto':
+            plan = {}
+            if self.strategy == 'keyframe':
+                plan = self._estimate_costs(cap, frame_indices)
+            return self.strategy, plan
+        
+        span = frame_indices[-1] - frame_indices[0] + 1
+        density = len(frame_indices) / span
+        
+        # Reading nearly every frame anyway, or too few samples to be worth probing
+        if density >= 0.5 or span <= self.probe_frames * 4:
+            return 'sequential', {'density': density}
+        if len(frame_indices) <= 2:
+            return 'seek', {'density': density}
+        
+        plan = self._estimate_costs(cap, frame_indices)
+        plan['density'] = density
+        
+        spacing = span / len(frame_indices)
+        if self.snap_to_keyframes and plan['keyframe_interval'] > 1 and spacing >= plan['keyframe_interval']:
+            return 'keyframe', plan
+        
+        sequential_cost = span * plan['grab_seconds']
+        seek_cost = len(frame_indices) * plan['seek_seconds']
+        return ('sequential' if sequential_cost <= seek_cost else 'seek'), plan
+    
+    def measure_costs(self, cap, frame_indices):
+        """
+        Probe decode costs once for a video that will be read in several passes
+        
+        Returns:
+            dict: Estimates for exact_strategy, or None when no probe is
+                needed (a fixed strategy, or too few frames to be worth it)
+        """
+        frame_indices = list(frame_indices)
+        if self.strategy in ('sequential', 'seek') or len(frame_indices) <= 2 \
+                or frame_indices[-1] - frame_indices[0] + 1 <= self.probe_frames * 4:
+            return None
+        return self._estimate_costs(cap, frame_indices)
+    
+    def exact_strategy(self, frame_indices, costs=None):
+        """
+        'sequential' or 'seek' for frame_indices, using costs from measure_costs
+        
+        Never snaps to keyframes, so every requested index is read as is.
+        """
+        if self.strategy in ('sequential', 'seek'):
+            return self.strategy
+        span = frame_indices[-1] - frame_indices[0] + 1
+        if len(frame_indices) / span >= 0.5 or span <= self.probe_frames * 4:
+            return 'sequential'
+        if costs is None:
+            return 'seek'
+        return 'sequential' if span * costs['grab_seconds'] <= len(frame_indices) * costs['seek_seconds'] else 'seek'
+    
+    def iter_exact_frames(self, cap, frame_indices, costs=None):
+        """
+        Yield exactly the requested frames, without a timing probe per call
+        
+        Args:
+            cap: Opened cv2.VideoCapture
+            frame_indices: Ascending frame indices to read
+            costs: Estimates from measure_costs for this video
+        
+        Yields:
+            tuple: (frame_index, BGR numpy array)
+        """
+        frame_indices = list(frame_indices)
+        if not frame_indices:
+            return
+        if self.exact_strategy(frame_indices, costs) == 'sequential':
+            yield from self._read_sequential(cap, frame_indices)
+        else:
+            yield from self._read_seek(cap, frame_indices)
+    
+    def _estimate_costs(self, cap, frame_indices):
+        """Time a few sequential grabs and seeks to estimate decode costs and GOP length"""
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_indices[0])
+        
+        start = time.perf_counter()
+        grabbed = 0
+        for _ in range(self.probe_frames):
+            if not cap.grab():
+                break
+            grabbed += 1
+        grab_seconds = (time.perf_counter() - start) / max(1, grabbed)
+        
+        if self.keyframe_interval:
+            keyframe_interval = int(self.keyframe_interval)
+            # A seek decodes on average half a GOP from the previous keyframe
+            seek_seconds = grab_seconds * (keyframe_interval / 2 + 1)
+        else:
+            # Probe between samples so the seek is unlikely to land on a keyframe
+            targets = [frame_indices[len(frame_indices) // 3] + 1, frame_indices[(2 * len(frame_indices)) // 3] + 1]
+            start = time.perf_counter()
+            for target in targets:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                cap.grab()
+            seek_seconds = (time.perf_counter() - start) / len(targets)
+            keyframe_interval = max(1, int(round(2 * seek_seconds / grab_seconds))) if grab_seconds > 0 else 1
+        
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_indices[0])
+        
+        return {
+            'grab_seconds': grab_seconds,
+            'seek_seconds': seek_seconds,
+            'keyframe_interval': keyframe_interval
+        }
+    
+    @staticmethod
+    def _read_sequential(cap, frame_indices):
+        """Decode linearly with grab() and only retrieve() the wanted frames"""
+        # One seek to the start of the range (a no-op cost for frame 0)
+        current = frame_indices[0]
+        cap.set(cv2.CAP_PROP_POS_FRAMES, current)
+        
+        for target in frame_indices:
+            while current < target:
+                if not cap.grab():
+                    return
+                current += 1
+            
+            if not cap.grab():
+                return
+            current += 1
+            
+            ret, frame = cap.retrieve()
+            if ret:
+                yield target, frame
+    
+    @staticmethod
+    def _read_seek(cap, frame_indices):
+        """Seek to every sample (decodes from the preceding keyframe each time)"""
+        for frame_idx in frame_indices:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+            ret, frame = cap.read()
+            if ret:
+                yield frame_idx, frame
+    
+    @staticmethod
+    def _read_keyframes(cap, frame_indices, keyframe_interval):
+        """Move each sample to the nearest estimated keyframe so every seek decodes one frame"""
+        keyframe_interval = max(1, int(keyframe_interval))
+        # Rounding up past the last sample could leave the video; stay on the last keyframe before it
+        last_keyframe = frame_indices[-1] // keyframe_interval * keyframe_interval
+        snapped = sorted({
+            min(last_keyframe, int(round(frame_idx / keyframe_interval)) * keyframe_interval)
+            for frame_idx in frame_indices
+        })
+        
+        for frame_idx in snapped:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+            ret, frame = cap.read()
+            if ret:
+                yield frame_idx, frame
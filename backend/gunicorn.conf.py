@@ -0,0 +1,13 @@
+# Gunicorn settings, read automatically when gunicorn is started from this directory
+#
+# Status streams (/api/status/<id>/stream) hold a thread for the whole job and
+# long polls for up to STATUS_LONG_POLL_TIMEOUT, so sync workers would be tied
+# up by a few open dashboards. Threaded workers keep answering other requests;
+# MAX_STATUS_WAITERS should stay below the thread count.
+import os
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', '32'))
+# More than one worker process needs JOB_STORE=sqlite so they share jobs
+workers = int(os.environ.get('GUNICORN_WORKERS', '1'))
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
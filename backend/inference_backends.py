@@ -0,0 +1,89 @@
+import os
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+INFERENCE_BACKENDS = ('fp32', 'int8', 'torchscript', 'compile', 'onnx')
+
+class OnnxRuntimeModel:
+    """Callable wrapper running an exported ONNX graph with onnxruntime"""
+    
+    def __init__(self, onnx_path, num_threads=None):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError("The 'onnx' backend requires onnxruntime: pip install onnxruntime")
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        
+        self.session = ort.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+    
+    def __call__(self, input_tensor):
+        inputs = {self.input_name: input_tensor.detach().cpu().numpy().astype(np.float32)}
+        logits = self.session.run(None, inputs)[0]
+        return torch.from_numpy(logits)
+
+def export_onnx(model, onnx_path, opset_version=17):
+    """Export an eval-mode model to ONNX with a dynamic batch dimension"""
+    dummy_input = torch.randn(1, 3, 224, 224)
+    export_kwargs = {
+        'input_names': ['input'],
+        'output_names': ['logits'],
+        'dynamic_axes': {'input': {0: 'batch'}, 'logits': {0: 'batch'}},
+        'opset_version': opset_version
+    }
+    model = model.cpu()
+    try:
+        # Prefer the TorchScript-based exporter, which needs no extra packages
+        torch.onnx.export(model, dummy_input, onnx_path, dynamo=False, **export_kwargs)
+    except TypeError:
+        # Older torch without the dynamo switch
+        torch.onnx.export(model, dummy_input, onnx_path, **export_kwargs)
+
+def build_backend(name, model, device, model_path=None):
+    """
+    Wrap a loaded FP32 model in the requested inference backend
+    
+    Args:
+        name: One of INFERENCE_BACKENDS
+        model: Eval-mode FP32 nn.Module
+        device: torch.device the model lives on
+        model_path: Weights path; the ONNX export is cached next to it
+    
+    Returns:
+        Callable taking a (N, 3, 224, 224) tensor and returning logits
+    """
+    if name not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend: {name}. Choose from {', '.join(INFERENCE_BACKENDS)}")
+    
+    if name == 'fp32':
+        return model
+    
+    if name in ('int8', 'onnx') and device.type != 'cpu':
+        raise ValueError(f"The '{name}' backend only runs on CPU")
+    
+    if name == 'int8':
+        # Dynamic quantization: Linear weights stored as int8, activations quantized per batch
+        return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+    
+    if name == 'torchscript':
+        example = torch.randn(1, 3, 224, 224, device=device)
+        with torch.no_grad():
+            traced = torch.jit.trace(model, example)
+        return torch.jit.freeze(traced)
+    
+    if name == 'compile':
+        return torch.compile(model)
+    
+    # onnx: reuse the export unless the weights are newer
+    base_path = os.path.splitext(model_path)[0] if model_path else 'model'
+    onnx_path = f'{base_path}.onnx'
+    if not os.path.exists(onnx_path) or (model_path and os.path.getmtime(onnx_path) < os.path.getmtime(model_path)):
+        print(f"Exporting ONNX model to {onnx_path}")
+        export_onnx(model, onnx_path)
+    return OnnxRuntimeModel(onnx_path, num_threads=torch.get_num_threads())
@@ -0,0 +1,162 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+class InferenceScheduler:
+    """Collect frames from concurrent jobs into shared batches for one detector"""
+    
+    def __init__(self, detector, max_batch_size=32, max_wait_ms=10):
+        self.detector = detector
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'frames_submitted': 0,
+            'frames_processed': 0,
+            'batches_run': 0,
+            'max_queue_depth': 0,
+            'total_wait_seconds': 0.0,
+            'batch_size_histogram': {}
+        }
+        
+        self._worker = threading.Thread(target=self._run, name='inference-scheduler', daemon=True)
+        self._running = True
+        self._worker.start()
+    
+    def submit(self, image):
+        """
+        Queue a single frame for inference
+        
+        Args:
+            image: PIL Image or numpy array
+        
+        Returns:
+            Future: Resolves to the prediction dict for the frame
+        """
+        future = Future()
+        self._queue.put((image, future, time.monotonic()))
+        
+        with self._stats_lock:
+            self._stats['frames_submitted'] += 1
+            self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], self._queue.qsize())
+        
+        return future
+    
+    def predict_frames(self, frames, progress_callback=None):
+        """
+        Submit frames and wait for all of their predictions
+        
+        Args:
+            frames: List of PIL Images or numpy arrays
+            progress_callback: Optional callback called as predictions arrive with
+                (frames_done, total_frames)
+        
+        Returns:
+            list: List of prediction dictionaries in the order of frames
+        """
+        futures = [self.submit(frame) for frame in frames]
+        total = len(futures)
+        
+        if progress_callback:
+            done_lock = threading.Lock()
+            done = [0]
+            
+            def on_done(_):
+                with done_lock:
+                    done[0] += 1
+                    count = done[0]
+                progress_callback(count, total)
+            
+            for future in futures:
+                future.add_done_callback(on_done)
+        
+        return [future.result() for future in futures]
+    
+    def _collect_batch(self):
+        """Block for the first frame, then gather more until the batch is full or max_wait expires"""
+        item = self._queue.get()
+        if item is None:
+            return None
+        
+        batch = [item]
+        deadline = time.monotonic() + self.max_wait
+        
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            
+            if item is None:
+                # Finish the current batch, then stop
+                self._running = False
+                break
+            batch.append(item)
+        
+        return batch
+    
+    def _run(self):
+        """Worker loop: run one forward pass per collected batch"""
+        while self._running:
+            batch = self._collect_batch()
+            if batch is None:
+                break
+            
+            # Drop frames whose caller has already given up
+            batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            
+            started = time.monotonic()
+            try:
+                predictions = self.detector.predict_batch([image for image, _, _ in batch])
+            except Exception as e:
+                print(f"Error in scheduled batch: {e}")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            
+            for (_, future, _), prediction in zip(batch, predictions):
+                future.set_result(prediction)
+            
+            with self._stats_lock:
+                size = len(batch)
+                self._stats['batches_run'] += 1
+                self._stats['frames_processed'] += size
+                self._stats['total_wait_seconds'] += sum(started - queued_at for _, _, queued_at in batch)
+                histogram = self._stats['batch_size_histogram']
+                histogram[size] = histogram.get(size, 0) + 1
+    
+    def shutdown(self, wait=True):
+        """Stop the worker after the frames already queued have been processed"""
+        self._queue.put(None)
+        if wait:
+            self._worker.join()
+    
+    def get_stats(self):
+        """
+        Get queue and batching metrics
+        
+        Returns:
+            dict: Queue depth, batch counts, mean batch fill and mean queue wait
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+            stats['batch_size_histogram'] = dict(self._stats['batch_size_histogram'])
+        
+        batches = stats['batches_run']
+        frames = stats['frames_processed']
+        stats['queue_depth'] = self._queue.qsize()
+        stats['max_batch_size'] = self.max_batch_size
+        stats['max_wait_ms'] = self.max_wait * 1000.0
+        stats['mean_batch_size'] = frames / batches if batches else 0.0
+        stats['mean_batch_fill'] = frames / (batches * self.max_batch_size) if batches else 0.0
+        stats['mean_queue_wait_ms'] = (stats.pop('total_wait_seconds') / frames) * 1000.0 if frames else 0.0
+        return stats
@@ -0,0 +1,64 @@
+import threading
+
+class JobEvents:
+    """
+    Per-job change notifications for status streams and long polls
+    
+    Each job has its own condition variable, so a progress update only wakes
+    the clients watching that job. Notifications are local to the process;
+    waiters on a store shared with other processes should also re-check the
+    store when their wait times out.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = {}  # job_id -> [version, Condition]
+    
+    def _entry(self, job_id):
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            if entry is None:
+                entry = self._jobs[job_id] = [0, threading.Condition()]
+            return entry
+    
+    def notify(self, job_id):
+        """Record a change to a job and wake its waiters"""
+        entry = self._entry(job_id)
+        with entry[1]:
+            entry[0] += 1
+            entry[1].notify_all()
+    
+    def version(self, job_id):
+        """Number of changes seen for a job in this process"""
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            return entry[0] if entry is not None else 0
+    
+    def wait(self, job_id, since, timeout):
+        """
+        Block until the job changes after version since, or timeout expires
+        
+        Returns:
+            int: The current version (equal to since on timeout)
+        """
+        entry = self._entry(job_id)
+        with entry[1]:
+            entry[1].wait_for(lambda: entry[0] != since, timeout=timeout)
+            return entry[0]
+    
+    def forget(self, job_id):
+        """Drop a job's entry, waking anyone still waiting on it"""
+        with self._lock:
+            entry = self._jobs.pop(job_id, None)
+        if entry is not None:
+            with entry[1]:
+                entry[0] += 1
+                entry[1].notify_all()
+    
+    def get_stats(self):
+        """
+        Returns:
+            dict: Jobs currently tracked
+        """
+        with self._lock:
+            return {'tracked_jobs': len(self._jobs)}
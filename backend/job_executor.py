@@ -0,0 +1,118 @@
+import threading
+from collections import deque
+
+class QueueFullError(Exception):
+    """Raised when the executor cannot accept another job"""
+    pass
+
+class JobExecutor:
+    """Bounded worker pool for video jobs with a bounded pending queue"""
+    
+    def __init__(self, max_workers=2, max_pending=20):
+        self.max_workers = max(1, int(max_workers))
+        self.max_pending = max(0, int(max_pending))
+        
+        self._pending = deque()  # (job_id, fn, args) waiting for a worker
+        self._active = set()
+        self._condition = threading.Condition()
+        self._rejected = 0
+        self._completed = 0
+        self._shutdown = False
+        
+        self._workers = []
+        for i in range(self.max_workers):
+            worker = threading.Thread(target=self._run, name=f'job-worker-{i}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+    
+    def submit(self, job_id, fn, *args):
+        """
+        Queue a job for execution
+        
+        Args:
+            job_id: Identifier used for queue position lookups
+            fn: Callable to run on a worker thread
+            *args: Arguments passed to fn
+        
+        Raises:
+            QueueFullError: If the pending queue is already full
+        """
+        with self._condition:
+            if self._shutdown:
+                raise QueueFullError('Executor is shut down')
+            if len(self._pending) >= self.max_pending:
+                raise QueueFullError('Job queue is full')
+            
+            self._pending.append((job_id, fn, args))
+            self._condition.notify()
+    
+    def is_full(self):
+        """Check whether a submit right now would be rejected"""
+        with self._condition:
+            return len(self._pending) >= self.max_pending
+    
+    def record_rejection(self):
+        """Count a job that was turned away because the queue was full"""
+        with self._condition:
+            self._rejected += 1
+    
+    def queue_position(self, job_id):
+        """
+        Get a waiting job's position in the queue
+        
+        Returns:
+            int: 1-based position, or None if the job is not waiting
+        """
+        with self._condition:
+            for position, (pending_id, _, _) in enumerate(self._pending, start=1):
+                if pending_id == job_id:
+                    return position
+        return None
+    
+    def _run(self):
+        """Worker loop: take the oldest pending job and run it"""
+        while True:
+            with self._condition:
+                while not self._pending and not self._shutdown:
+                    self._condition.wait()
+                if self._shutdown and not self._pending:
+                    return
+                
+                job_id, fn, args = self._pending.popleft()
+                self._active.add(job_id)
+            
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"Unhandled error in job {job_id}: {e}")
+            finally:
+                with self._condition:
+                    self._active.discard(job_id)
+                    self._completed += 1
+    
+    def shutdown(self, wait=True):
+        """Stop accepting jobs and let workers exit once the queue drains"""
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+        
+        if wait:
+            for worker in self._workers:
+                worker.join()
+    
+    def get_stats(self):
+        """
+        Get pool utilisation metrics
+        
+        Returns:
+            dict: Active and pending job counts, limits, completed and rejected totals
+        """
+        with self._condition:
+            return {
+                'active_jobs': len(self._active),
+                'pending_jobs': len(self._pending),
+                'max_workers': self.max_workers,
+                'max_pending': self.max_pending,
+                'completed_jobs': self._completed,
+                'rejected_jobs': self._rejected
+            }
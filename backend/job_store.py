@@ -0,0 +1,620 @@
+import abc
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+JOB_STORE_BACKENDS = ('memory', 'sqlite')
+JOB_FIELDS = ('status', 'progress', 'created_at', 'filename', 'error', 'video_path', 'cache_key', 'profile',
+              'results')
+# Jobs in these states are only evicted once abandoned (not updated for 2x the TTL)
+ACTIVE_STATUSES = ('queued', 'processing')
+
+# Per-frame result fields stored as typed arrays; anything else (e.g. face
+# lists) is kept as JSON per frame
+_FRAME_COLUMNS = (
+    ('frame_number', '<i4'),
+    ('timestamp', '<f8'),
+    ('probability', '<f8'),
+    ('reused_from', '<i4')
+)
+_PREDICTION_LABELS = ('Real', 'Fake', 'Error')
+
+def pack_frame_results(frame_results):
+    """
+    Convert a list of per-frame result dicts into a compact columnar form
+    
+    Numeric fields become little-endian typed arrays, predictions become one
+    byte per frame and reused is implied by reused_from >= 0. Only the
+    probability is stored for scored frames: their Real/Fake label is taken
+    from it here and confidence is derived from both when unpacking, so the
+    stored form cannot disagree with itself.
+    
+    Returns:
+        tuple: (header dict, bytes) where the header lists each column's dtype
+            and byte range within the data
+    """
+    count = len(frame_results)
+    columns = []
+    chunks = []
+    offset = 0
+    
+    def add(name, array):
+        nonlocal offset
+        data = np.ascontiguousarray(array).tobytes()
+        columns.append([name, array.dtype.str, offset, len(data)])
+        chunks.append(data)
+        offset += len(data)
+    
+    for name, dtype in _FRAME_COLUMNS:
+        if name == 'reused_from':
+            values = [-1 if r.get(name) is None else r[name] for r in frame_results]
+        else:
+            values = [r[name] for r in frame_results]
+        add(name, np.array(values, dtype=dtype))
+    
+    labels = list(_PREDICTION_LABELS)
+    codes = []
+    for r in frame_results:
+        prediction = r['prediction']
+        if prediction in ('Real', 'Fake'):
+            # Flipped logic: probability > 0.5 means real
+            prediction = 'Real' if r['probability'] > 0.5 else 'Fake'
+        if prediction not in labels:
+            labels.append(prediction)
+        codes.append(labels.index(prediction))
+    add('prediction', np.array(codes, dtype=np.uint8))
+    
+    known = {name for name, _ in _FRAME_COLUMNS} | {'prediction', 'confidence', 'reused'}
+    extra = [{k: v for k, v in r.items() if k not in known} for r in frame_results]
+    
+    header = {
+        'count': count,
+        'columns': columns,
+        'labels': labels,
+        'extra': extra if any(extra) else None
+    }
+    return header, b''.join(chunks)
+
+def unpack_frame_columns(header, data):
+    """
+    Decode packed frame results into NumPy arrays (no per-frame objects)
+    
+    Returns:
+        dict: Column name -> array, plus 'prediction' as label strings and the
+            derived 'confidence'
+    """
+    arrays = {}
+    for name, dtype, offset, size in header['columns']:
+        arrays[name] = np.frombuffer(data, dtype=dtype, count=size // np.dtype(dtype).itemsize, offset=offset)
+    arrays['prediction'] = np.array(header['labels'], dtype=object)[arrays['prediction']]
+    # Rows packed before confidence was derived still carry their own column
+    if 'confidence' not in arrays:
+        probability = arrays['probability'].astype(np.float64)
+        arrays['confidence'] = np.where(arrays['prediction'] == 'Real', probability,
+                                        np.where(arrays['prediction'] == 'Fake', 1 - probability, 0.0))
+    return arrays
+
+def unpack_frame_results(header, data, indices=None):
+    """
+    Rebuild the list of per-frame result dicts from pack_frame_results output
+    
+    Args:
+        indices: Optional frame positions to rebuild (default: all frames)
+    """
+    arrays = unpack_frame_columns(header, data)
+    extra = header.get('extra') or [{}] * header['count']
+    frame_results = []
+    for i in (range(header['count']) if indices is None else indices):
+        reused_from = int(arrays['reused_from'][i])
+        frame_result = {
+            'frame_number': int(arrays['frame_number'][i]),
+            'timestamp': float(arrays['timestamp'][i]),
+            'prediction': arrays['prediction'][i],
+            'confidence': float(arrays['confidence'][i]),
+            'probability': float(arrays['probability'][i]),
+            'reused': reused_from >= 0,
+            'reused_from': reused_from if reused_from >= 0 else None
+        }
+        frame_result.update(extra[i])
+        frame_results.append(frame_result)
+    return frame_results
+
+def _split_results(results):
+    """Separate the per-frame list from the summary of a results dict"""
+    summary = {k: v for k, v in results.items() if k != 'frame_results'}
+    frames = pack_frame_results(results.get('frame_results') or [])
+    return summary, frames
+
+def _owner_exited(owner):
+    """
+    Whether the process that claimed a job is known to be gone
+    
+    Only owners on this host can be checked; others count as alive.
+    """
+    host, _, pid = (owner or '').rpartition(':')
+    if host != socket.gethostname():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except (OSError, ValueError):
+        return False
+    return False
+
+class JobStore(abc.ABC):
+    """
+    Interface for job state shared by the request handlers and job workers
+    
+    Jobs are plain dicts with the JOB_FIELDS keys plus 'job_id'. Completed
+    jobs keep their per-frame results in columnar form; get() rebuilds the
+    full results dict unless asked not to.
+    """
+    
+    def __init__(self, ttl_seconds=3600):
+        """
+        Args:
+            ttl_seconds: Finished jobs older than this are evicted (with their video)
+        """
+        self.ttl_seconds = float(ttl_seconds)
+        # Identifies this process when claiming jobs
+        self.owner = f'{socket.gethostname()}:{os.getpid()}'
+        self._listeners = []
+    
+    def add_listener(self, listener):
+        """
+        Call listener(job_id, deleted=False) after every change made through this store
+        
+        Only changes made in this process are seen.
+        """
+        self._listeners.append(listener)
+    
+    def _changed(self, job_id, deleted=False):
+        for listener in self._listeners:
+            try:
+                listener(job_id, deleted=deleted)
+            except Exception as e:
+                print(f"Error in job store listener: {e}")
+    
+    @abc.abstractmethod
+    def create(self, job_id, **fields):
+        """Add a job; status defaults to 'queued' and created_at to now"""
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def get(self, job_id, include_frames=True):
+        """
+        Returns:
+            dict: The job, or None if it does not exist
+        """
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def update(self, job_id, **fields):
+        """Set job fields; 'results' may be a full results dict including frame_results"""
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def delete(self, job_id):
+        """Remove a job and its frame results"""
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def claim(self, job_id):
+        """
+        Atomically move a queued job to processing for this process
+        
+        Returns:
+            bool: False if the job is gone or another worker already claimed it
+        """
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def fail_abandoned(self, job_id, owner, error):
+        """
+        Atomically move a job still processing for owner to error
+        
+        Returns:
+            bool: False if the job is gone, finished or claimed by someone else
+        """
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def list_jobs(self):
+        """All jobs without results, oldest first"""
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def queue_position(self, job_id):
+        """1-based position among queued jobs, or None if the job is not queued"""
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def get_frame_columns(self, job_id):
+        """
+        Returns:
+            tuple: (header, bytes) of the packed frame results, or None
+        """
+        raise NotImplementedError
+    
+    @abc.abstractmethod
+    def expired_jobs(self, now=None):
+        """Finished jobs past their TTL, and active jobs abandoned for twice as long"""
+        raise NotImplementedError
+    
+    def abandoned_jobs(self, stale_seconds, now=None):
+        """
+        Jobs left processing by another worker that has died
+        
+        A worker counts as dead if it ran on this host and its process is
+        gone, or if it has not updated the job for stale_seconds.
+        """
+        now = now or time.time()
+        return [job for job in self.list_jobs()
+                if job['status'] == 'processing' and job['owner'] != self.owner
+                and (_owner_exited(job['owner']) or job['updated_ts'] < now - stale_seconds)]
+    
+    def evict_expired(self, now=None):
+        """
+        Delete finished jobs past their TTL and their uploaded videos
+        
+        Returns:
+            int: Number of jobs evicted
+        """
+        evicted = 0
+        for job in self.expired_jobs(now):
+            video_path = job.get('video_path')
+            if video_path and os.path.exists(video_path):
+                try:
+                    os.remove(video_path)
+                except OSError as e:
+                    print(f"Error removing video for job {job['job_id']}: {e}")
+            self.delete(job['job_id'])
+            evicted += 1
+        return evicted
+    
+    def get_stats(self):
+        """
+        Returns:
+            dict: Backend name and job counts per status
+        """
+        counts = {}
+        for job in self.list_jobs():
+            counts[job['status']] = counts.get(job['status'], 0) + 1
+        return {'backend': self.backend, 'jobs': sum(counts.values()), 'by_status': counts}
+
+class MemoryJobStore(JobStore):
+    """Job store for a single process; frame results are still kept packed"""
+    
+    backend = 'memory'
+    
+    def __init__(self, ttl_seconds=3600):
+        super().__init__(ttl_seconds)
+        self._jobs = {}  # job_id -> record with 'frames' packed separately
+        self._lock = threading.Lock()
+    
+    def create(self, job_id, **fields):
+        now = time.time()
+        record = {field: None for field in JOB_FIELDS}
+        record.update(status='queued', progress=0, created_at=datetime.now().isoformat())
+        record.update(fields, job_id=job_id, created_ts=now, updated_ts=now, owner=None, frames=None)
+        if record['results'] is not None:
+            record['results'], record['frames'] = _split_results(record['results'])
+        with self._lock:
+            self._jobs[job_id] = record
+        self._changed(job_id)
+    
+    def get(self, job_id, include_frames=True):
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if record is None:
+                return None
+            job = {k: v for k, v in record.items() if k != 'frames'}
+            frames = record['frames']
+        
+        if job['results'] is not None:
+            job['results'] = dict(job['results'])
+            if include_frames and frames is not None:
+                job['results']['frame_results'] = unpack_frame_results(*frames)
+        return job
+    
+    def update(self, job_id, **fields):
+        unknown = set(fields) - set(JOB_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown job fields: {', '.join(sorted(unknown))}")
+        
+        frames = None
+        if fields.get('results') is not None:
+            fields['results'], frames = _split_results(fields['results'])
+        
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if record is None:
+                return
+            record.update(fields, updated_ts=time.time())
+            if frames is not None:
+                record['frames'] = frames
+        self._changed(job_id)
+    
+    def delete(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+        self._changed(job_id, deleted=True)
+    
+    def claim(self, job_id):
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if record is None or record['status'] != 'queued':
+                return False
+            record.update(status='processing', owner=self.owner, updated_ts=time.time())
+        self._changed(job_id)
+        return True
+    
+    def fail_abandoned(self, job_id, owner, error):
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if record is None or record['status'] != 'processing' or record['owner'] != owner:
+                return False
+            record.update(status='error', error=error, updated_ts=time.time())
+        self._changed(job_id)
+        return True
+    
+    def list_jobs(self):
+        with self._lock:
+            records = sorted(self._jobs.values(), key=lambda r: r['created_ts'])
+            return [{k: v for k, v in r.items() if k not in ('results', 'frames')} for r in records]
+    
+    def queue_position(self, job_id):
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if record is None or record['status'] != 'queued':
+                return None
+            return 1 + sum(1 for r in self._jobs.values()
+                           if r['status'] == 'queued' and r['created_ts'] < record['created_ts'])
+    
+    def get_frame_columns(self, job_id):
+        with self._lock:
+            record = self._jobs.get(job_id)
+            return record['frames'] if record else None
+    
+    def expired_jobs(self, now=None):
+        now = now or time.time()
+        cutoff = now - self.ttl_seconds
+        abandoned = now - 2 * self.ttl_seconds
+        with self._lock:
+            return [dict(r) for r in self._jobs.values()
+                    if r['updated_ts'] < abandoned
+                    or (r['status'] not in ACTIVE_STATUSES and r['updated_ts'] < cutoff)]
+
+class SQLiteJobStore(JobStore):
+    """
+    Job store in a SQLite database in WAL mode
+    
+    Several server processes can share one database file: WAL lets readers
+    run alongside the single writer, and claims use BEGIN IMMEDIATE so only
+    one process can move a job from queued to processing. Each thread gets
+    its own connection.
+    """
+    
+    backend = 'sqlite'
+    
+    _SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            progress INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT,
+            created_ts REAL NOT NULL,
+            updated_ts REAL NOT NULL,
+            filename TEXT,
+            error TEXT,
+            video_path TEXT,
+            cache_key TEXT,
+            profile TEXT,
+            owner TEXT,
+            results TEXT
+        );
+        CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_ts);
+        CREATE TABLE IF NOT EXISTS frame_results (
+            job_id TEXT PRIMARY KEY REFERENCES jobs (job_id) ON DELETE CASCADE,
+            header TEXT NOT NULL,
+            data BLOB NOT NULL
+        );
+    '''
+    
+    def __init__(self, path, ttl_seconds=3600):
+        """
+        Args:
+            path: Database file (created if missing)
+            ttl_seconds: Finished jobs older than this are evicted
+        """
+        super().__init__(ttl_seconds)
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        connection = self._connection()
+        connection.executescript(self._SCHEMA)
+        # Databases created before a column was added get it here
+        columns = {row['name'] for row in connection.execute('PRAGMA table_info(jobs)')}
+        if 'profile' not in columns:
+            connection.execute('ALTER TABLE jobs ADD COLUMN profile TEXT')
+    
+    def _connection(self):
+        """This thread's connection, opened on first use"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            # Autocommit; transactions are opened explicitly where needed
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('PRAGMA foreign_keys=ON')
+            self._local.connection = connection
+        return connection
+    
+    @staticmethod
+    def _row_to_job(row):
+        job = dict(row)
+        if job.get('results') is not None:
+            job['results'] = json.loads(job['results'])
+        return job
+    
+    def _write_frames(self, connection, job_id, frames):
+        header, data = frames
+        connection.execute(
+            'INSERT OR REPLACE INTO frame_results (job_id, header, data) VALUES (?, ?, ?)',
+            (job_id, json.dumps(header), data)
+        )
+    
+    def create(self, job_id, **fields):
+        now = time.time()
+        values = {field: None for field in JOB_FIELDS}
+        values.update(status='queued', progress=0, created_at=datetime.now().isoformat())
+        values.update(fields)
+        
+        frames = None
+        if values['results'] is not None:
+            summary, frames = _split_results(values['results'])
+            values['results'] = json.dumps(summary)
+        
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute(
+                'INSERT INTO jobs (job_id, status, progress, created_at, created_ts, updated_ts, '
+                'filename, error, video_path, cache_key, profile, results) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (job_id, values['status'], values['progress'], values['created_at'], now, now,
+                 values['filename'], values['error'], values['video_path'], values['cache_key'],
+                 values['profile'], values['results'])
+            )
+            if frames is not None:
+                self._write_frames(connection, job_id, frames)
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        self._changed(job_id)
+    
+    def get(self, job_id, include_frames=True):
+        connection = self._connection()
+        row = connection.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        
+        job = self._row_to_job(row)
+        if include_frames and job['results'] is not None:
+            frames = self.get_frame_columns(job_id)
+            if frames is not None:
+                job['results']['frame_results'] = unpack_frame_results(*frames)
+        return job
+    
+    def update(self, job_id, **fields):
+        unknown = set(fields) - set(JOB_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown job fields: {', '.join(sorted(unknown))}")
+        
+        frames = None
+        if fields.get('results') is not None:
+            summary, frames = _split_results(fields['results'])
+            fields['results'] = json.dumps(summary)
+        
+        assignments = ', '.join(f'{field} = ?' for field in fields)
+        params = list(fields.values()) + [time.time(), job_id]
+        
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute(
+                f'UPDATE jobs SET {assignments + ", " if assignments else ""}updated_ts = ? WHERE job_id = ?',
+                params
+            )
+            if frames is not None:
+                self._write_frames(connection, job_id, frames)
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        self._changed(job_id)
+    
+    def delete(self, job_id):
+        self._connection().execute('DELETE FROM jobs WHERE job_id = ?', (job_id,))
+        self._changed(job_id, deleted=True)
+    
+    def claim(self, job_id):
+        cursor = self._connection().execute(
+            "UPDATE jobs SET status = 'processing', owner = ?, updated_ts = ? "
+            "WHERE job_id = ? AND status = 'queued'",
+            (self.owner, time.time(), job_id)
+        )
+        if cursor.rowcount != 1:
+            return False
+        self._changed(job_id)
+        return True
+    
+    def fail_abandoned(self, job_id, owner, error):
+        cursor = self._connection().execute(
+            "UPDATE jobs SET status = 'error', error = ?, updated_ts = ? "
+            "WHERE job_id = ? AND status = 'processing' AND owner = ?",
+            (error, time.time(), job_id, owner)
+        )
+        if cursor.rowcount != 1:
+            return False
+        self._changed(job_id)
+        return True
+    
+    def list_jobs(self):
+        rows = self._connection().execute(
+            'SELECT job_id, status, progress, created_at, created_ts, updated_ts, filename, '
+            'error, video_path, cache_key, profile, owner FROM jobs ORDER BY created_ts'
+        ).fetchall()
+        return [dict(row) for row in rows]
+    
+    def queue_position(self, job_id):
+        row = self._connection().execute(
+            "SELECT (SELECT COUNT(*) FROM jobs AS other WHERE other.status = 'queued' "
+            "AND other.created_ts < job.created_ts) + 1 AS position "
+            "FROM jobs AS job WHERE job.job_id = ? AND job.status = 'queued'",
+            (job_id,)
+        ).fetchone()
+        return row['position'] if row is not None else None
+    
+    def get_frame_columns(self, job_id):
+        row = self._connection().execute(
+            'SELECT header, data FROM frame_results WHERE job_id = ?', (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row['header']), bytes(row['data'])
+    
+    def expired_jobs(self, now=None):
+        now = now or time.time()
+        rows = self._connection().execute(
+            'SELECT job_id, video_path FROM jobs WHERE updated_ts < ? '
+            'OR (status NOT IN (?, ?) AND updated_ts < ?)',
+            (now - 2 * self.ttl_seconds,) + ACTIVE_STATUSES + (now - self.ttl_seconds,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+def create_job_store(backend='memory', path=None, ttl_seconds=3600):
+    """
+    Build the configured job store
+    
+    Args:
+        backend: One of JOB_STORE_BACKENDS
+        path: SQLite database file (sqlite backend only)
+        ttl_seconds: Finished jobs older than this are evicted
+    """
+    if backend == 'memory':
+        return MemoryJobStore(ttl_seconds=ttl_seconds)
+    if backend == 'sqlite':
+        return SQLiteJobStore(path or 'jobs.db', ttl_seconds=ttl_seconds)
+    raise ValueError(f"Unknown job store: {backend}. Choose from {', '.join(JOB_STORE_BACKENDS)}")
@@ -0,0 +1,75 @@
+import os
+import resource
+import threading
+
+def current_rss():
+    """Resident set size of this process in bytes"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        # No procfs: fall back to the lifetime high-water mark (KiB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+class PeakRSSMonitor:
+    """
+    Track the peak resident memory of the process while a block runs
+    
+    RSS is sampled from a background thread, so very short spikes between
+    samples can be missed. Jobs share the server process, so the peak also
+    includes memory held by other jobs running at the same time.
+    """
+    
+    def __init__(self, interval=0.05):
+        """
+        Args:
+            interval: Seconds between RSS samples
+        """
+        self.interval = float(interval)
+        self.start_rss = 0
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """Record the current RSS and begin sampling"""
+        self.start_rss = self.peak_rss = current_rss()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='rss-monitor', daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        """
+        Stop sampling
+        
+        Returns:
+            dict: Start, peak and peak-minus-start RSS in MB
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.peak_rss = max(self.peak_rss, current_rss())
+        return self.get_stats()
+    
+    def _run(self):
+        """Sampling loop"""
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, current_rss())
+    
+    def get_stats(self):
+        """Start, peak and peak-minus-start RSS in MB"""
+        mb = 1024 * 1024
+        return {
+            'rss_start_mb': round(self.start_rss / mb, 1),
+            'rss_peak_mb': round(self.peak_rss / mb, 1),
+            'rss_peak_delta_mb': round((self.peak_rss - self.start_rss) / mb, 1)
+        }
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,221 @@
+import contextvars
+import math
+import threading
+
+# Per-job profile levels: stages adds time per pipeline stage to the results,
+# sampling also samples the job's thread stacks
+PROFILE_MODES = ('off', 'stages', 'sampling')
+
+FRAME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+BATCH_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+JOB_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+class Histogram:
+    """Cumulative latency histogram, optionally split by label values"""
+    
+    def __init__(self, name, help_text, buckets, labelnames=()):
+        """
+        Args:
+            name: Metric name
+            help_text: One-line description for the HELP line
+            buckets: Ascending upper bounds in seconds (+Inf is added)
+            labelnames: Names of the labels passed to observe
+        """
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series = {}  # label values -> [bucket counts, sum, count]
+    
+    def observe(self, value, count=1, **labels):
+        """
+        Record count observations of value
+        
+        count > 1 records an average over several items at once, e.g. the
+        per-frame share of a batch's time for every frame in the batch.
+        """
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += count
+                    break
+            series[1] += value * count
+            series[2] += count
+    
+    def render(self):
+        """Prometheus text exposition lines"""
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        
+        for key, counts, total, count in sorted(series):
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{_format_labels(labels + (("le", _format_value(bound)),))} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {count}')
+        return lines
+
+class Gauge:
+    """Value read from a callback each time metrics are rendered"""
+    
+    def __init__(self, name, help_text, fn, labelname=None):
+        """
+        Args:
+            name: Metric name
+            help_text: One-line description for the HELP line
+            fn: Callable returning a number, or with labelname a dict of
+                label value -> number
+            labelname: Label for the keys of fn's dict
+        """
+        self.name = name
+        self.help_text = help_text
+        self.fn = fn
+        self.labelname = labelname
+    
+    def render(self):
+        """Prometheus text exposition lines (only the header if fn fails)"""
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} gauge']
+        try:
+            value = self.fn()
+        except Exception as e:
+            print(f"Error reading gauge {self.name}: {e}")
+            return lines
+        
+        if self.labelname is None:
+            lines.append(f'{self.name} {_format_value(value)}')
+        else:
+            for label, label_value in sorted(value.items()):
+                lines.append(f'{self.name}{_format_labels(((self.labelname, label),))} {_format_value(label_value)}')
+        return lines
+
+class MetricsRegistry:
+    """Metrics rendered together in the Prometheus text format"""
+    
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+    
+    def _register(self, metric):
+        with self._lock:
+            # Re-registering (e.g. a module imported twice) keeps the existing metric
+            return self._metrics.setdefault(metric.name, metric)
+    
+    def histogram(self, name, help_text, buckets, labelnames=()):
+        return self._register(Histogram(name, help_text, buckets, labelnames))
+    
+    def gauge(self, name, help_text, fn, labelname=None):
+        with self._lock:
+            # Gauges read live objects, so the latest callback wins
+            gauge = self._metrics[name] = Gauge(name, help_text, fn, labelname)
+        return gauge
+    
+    def render(self):
+        """
+        Returns:
+            str: Every metric in the Prometheus text exposition format (0.0.4)
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = MetricsRegistry()
+
+UPLOAD_SECONDS = REGISTRY.histogram(
+    'deepfake_upload_seconds', 'Time to receive and store an upload, per whole file or per chunk',
+    (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0), labelnames=('kind',))
+QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    'deepfake_queue_wait_seconds', 'Time from job creation until a worker picked it up', JOB_BUCKETS)
+PROBE_SECONDS = REGISTRY.histogram(
+    'deepfake_probe_seconds', 'Time to open a video and read its properties', FRAME_BUCKETS)
+DECODE_SECONDS = REGISTRY.histogram(
+    'deepfake_decode_frame_seconds', 'Time to decode and downscale one sampled frame', FRAME_BUCKETS)
+PREPROCESS_SECONDS = REGISTRY.histogram(
+    'deepfake_preprocess_frame_seconds', 'Time to turn one frame (or face crop) into model input', FRAME_BUCKETS)
+INFERENCE_BATCH_SECONDS = REGISTRY.histogram(
+    'deepfake_inference_batch_seconds', 'Time for one batched forward pass, including normalization',
+    BATCH_BUCKETS)
+INFERENCE_FRAME_SECONDS = REGISTRY.histogram(
+    'deepfake_inference_frame_seconds', 'Forward pass time per frame (batch time over batch size)', FRAME_BUCKETS)
+JOB_SECONDS = REGISTRY.histogram(
+    'deepfake_job_seconds', 'Time from a worker picking a job up until it finished', JOB_BUCKETS,
+    labelnames=('status',))
+
+class JobProfile:
+    """Time spent per pipeline stage by one job"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}  # stage -> [seconds, count]
+    
+    def add(self, stage, seconds, count=1):
+        """Add seconds spent on count items (frames, batches, calls) of a stage"""
+        with self._lock:
+            totals = self._stages.setdefault(stage, [0.0, 0])
+            totals[0] += seconds
+            totals[1] += count
+    
+    def to_dict(self):
+        """
+        Returns:
+            dict: stage -> {'seconds', 'count', 'mean_ms'}
+        """
+        with self._lock:
+            stages = {stage: list(totals) for stage, totals in self._stages.items()}
+        return {
+            stage: {
+                'seconds': round(seconds, 4),
+                'count': count,
+                'mean_ms': round(seconds / count * 1000.0, 3) if count else 0.0
+            } for stage, (seconds, count) in stages.items()
+        }
+
+# Profile of the job the current thread works for; pipeline stage threads run in a copy of the job's context
+_active_profile = contextvars.ContextVar('job_profile', default=None)
+
+def activate_profile(profile):
+    """Send stage timings recorded in this context to profile; returns a token for deactivate_profile"""
+    return _active_profile.set(profile)
+
+def deactivate_profile(token):
+    _active_profile.reset(token)
+
+def record_stage(stage, seconds, histogram=None, count=1, **labels):
+    """
+    Record time spent in a stage
+    
+    Args:
+        stage: Stage name in the job profile
+        seconds: Time spent (for count > 1, the average per item)
+        histogram: Histogram to observe, or None for profile-only stages
+        count: Items the time is averaged over
+        **labels: Label values for the histogram
+    """
+    if histogram is not None:
+        histogram.observe(seconds, count, **labels)
+    profile = _active_profile.get()
+    if profile is not None:
+        profile.add(stage, seconds * count, count)
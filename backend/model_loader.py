@@ -1,17 +1,35 @@
 import torch
 import torch.nn as nn
 import timm
+import torchvision
 import torchvision.transforms as transforms
 from PIL import Image
 import numpy as np
+import os
+import time
+import pickle
+import threading
+
+from inference_backends import build_backend
+from metrics import INFERENCE_BATCH_SECONDS, INFERENCE_FRAME_SECONDS, PREPROCESS_SECONDS, record_stage
+from preprocessing import BatchPreprocessor, PREPROCESSING_ENGINES
+
+# Rough activation + input memory for one ViT-B/16 224x224 sample during a
+# forward pass, used to derive an automatic batch size from free memory
+BYTES_PER_SAMPLE = 48 * 1024 * 1024
+DEFAULT_BATCH_SIZE = 16
+MAX_AUTO_BATCH_SIZE = 64
+# Default screener probability band sent on to the ViT in a cascade
+DEFAULT_CASCADE_BAND = (0.2, 0.8)
 
 class ViTModel(nn.Module):
     """Vision Transformer model for deepfake detection"""
-    def __init__(self):
+    def __init__(self, pretrained=False):
         super(ViTModel, self).__init__()
         self.model_name = "Vision Transformer"
-        # Use timm to load a pre-trained ViT model
-        self.model = timm.create_model('vit_base_patch16_224', pretrained=True)
+        # Build the ViT architecture with timm; ImageNet weights are only needed
+        # for training, since inference overwrites them with our checkpoint
+        self.model = timm.create_model('vit_base_patch16_224', pretrained=pretrained)
         
         # Replace the head with a custom classifier
         self.model.head = nn.Sequential(
@@ -27,27 +45,164 @@ class ViTModel(nn.Module):
     def forward(self, x):
         return self.model(x)
 
+class EfficientNetModel(nn.Module):
+    """EfficientNet-B0 with the same classifier head as in the training notebook"""
+    def __init__(self):
+        super(EfficientNetModel, self).__init__()
+        self.model_name = "EfficientNet-B0"
+        efficient_net = torchvision.models.efficientnet_b0(weights=None)
+        
+        num_ftrs = efficient_net.classifier[1].in_features
+        efficient_net.classifier = nn.Sequential(
+            nn.Dropout(0.2),
+            nn.Linear(num_ftrs, 512),
+            nn.ReLU(),
+            nn.Dropout(0.3),
+            nn.Linear(512, 128),
+            nn.ReLU(),
+            nn.Dropout(0.2),
+            nn.Linear(128, 1)
+        )
+        
+        self.model = efficient_net
+    
+    def forward(self, x):
+        return self.model(x)
+
+def load_state_dict(model_path, device):
+    """
+    Load checkpoint weights without reading the whole file into memory when possible
+    
+    Prefers a .safetensors file next to model_path (if safetensors is installed),
+    then a memory-mapped torch.load, then a plain torch.load for old torch
+    versions or legacy checkpoints.
+    """
+    safetensors_path = os.path.splitext(model_path)[0] + '.safetensors'
+    if os.path.exists(safetensors_path):
+        try:
+            from safetensors.torch import load_file
+            return load_file(safetensors_path, device=str(device))
+        except ImportError:
+            pass
+    
+    try:
+        return torch.load(model_path, map_location=device, mmap=True, weights_only=True)
+    except (TypeError, RuntimeError, pickle.UnpicklingError):
+        return torch.load(model_path, map_location=device)
+
 class DeepfakeDetector:
-    """Main class for loading and using the deepfake detection model"""
+    """
+    Main class for loading and using the deepfake detection model
+    
+    With a screener, the detector runs as a two-stage cascade: the small
+    EfficientNet-B0 scores every frame, and only frames whose screener
+    probability falls inside cascade_band are scored again by the ViT. Each
+    prediction then records which stage decided it.
+    """
     
-    def __init__(self, model_path, device='cpu'):
+    def __init__(self, model_path, device='cpu', batch_size=DEFAULT_BATCH_SIZE, backend='fp32',
+                 preprocessing='vectorized', screener_path=None, cascade_band=DEFAULT_CASCADE_BAND):
+        """
+        Args:
+            model_path: ViT checkpoint
+            device: Torch device to use when available
+            batch_size: Frames per forward pass, or 'auto'
+            backend: One of INFERENCE_BACKENDS for the ViT
+            preprocessing: One of PREPROCESSING_ENGINES
+            screener_path: Optional EfficientNet-B0 checkpoint; enables the cascade
+            cascade_band: (low, high) screener probabilities, inclusive, that are
+                escalated to the ViT
+        """
+        if preprocessing not in PREPROCESSING_ENGINES:
+            raise ValueError(f"Unknown preprocessing engine: {preprocessing}. Choose from {', '.join(PREPROCESSING_ENGINES)}")
+        low, high = cascade_band
+        if not 0.0 <= low <= high <= 1.0:
+            raise ValueError(f"Cascade band must satisfy 0 <= low <= high <= 1, got {cascade_band}")
+        
         self.device = torch.device(device if torch.cuda.is_available() else 'cpu')
-        self.model = self._load_model(model_path)
+        self.backend = backend
+        self.preprocessing = preprocessing
+        self.load_time = None
+        self.warmup_time = None
+        self.model_memory_bytes = 0  # Weights as loaded (before any backend conversion)
+        self.model = build_backend(backend, self._load_model(model_path), self.device, model_path)
+        self.screener = self._load_screener(screener_path) if screener_path else None
+        self.cascade_band = (float(low), float(high)) if self.screener is not None else None
+        self.cascade_counts = {'screener': 0, 'vit': 0}  # Frames decided by each stage
+        self._counts_lock = threading.Lock()
         self.transform = self._get_transform()
+        self.batch_size = self._resolve_batch_size(batch_size)
         
+        # Resizes frames as they arrive and normalizes whole batches in reused buffers
+        self.batch_preprocessor = None
+        if preprocessing == 'vectorized':
+            self.batch_preprocessor = BatchPreprocessor(224, self.device)
+            self.batch_preprocessor.reserve(self.batch_size)
+    
     def _load_model(self, model_path):
         """Load the pre-trained Vision Transformer model"""
         try:
-            model = ViTModel()
-            model.load_state_dict(torch.load(model_path, map_location=self.device))
+            start = time.perf_counter()
+            model = self._build_model(load_state_dict(model_path, self.device))
             model.to(self.device)
             model.eval()
-            print(f"Model loaded successfully on {self.device}")
+            self.model_memory_bytes += self._tensor_bytes(model)
+            self.load_time = time.perf_counter() - start
+            print(f"Model loaded successfully on {self.device} ({self.backend} backend) in {self.load_time:.2f}s")
             return model
         except Exception as e:
             print(f"Error loading model: {e}")
             raise
     
+    def _load_screener(self, screener_path):
+        """Load the EfficientNet-B0 screener for the cascade"""
+        try:
+            start = time.perf_counter()
+            screener = self._build_model(load_state_dict(screener_path, self.device), EfficientNetModel)
+            screener.to(self.device)
+            screener.eval()
+            self.model_memory_bytes += self._tensor_bytes(screener)
+            print(f"Screener loaded successfully on {self.device} in {time.perf_counter() - start:.2f}s")
+            return screener
+        except Exception as e:
+            print(f"Error loading screener: {e}")
+            raise
+    
+    @staticmethod
+    def _tensor_bytes(model):
+        """Bytes held by a model's parameters and buffers"""
+        return sum(t.numel() * t.element_size() for t in list(model.parameters()) + list(model.buffers()))
+    
+    @staticmethod
+    def _build_model(state_dict, model_class=ViTModel):
+        """Create the model and attach the checkpoint tensors"""
+        try:
+            # Build on the meta device and adopt the loaded tensors directly, which
+            # skips random weight initialization and a copy of every parameter
+            with torch.device('meta'):
+                model = model_class()
+            model.load_state_dict(state_dict, assign=True)
+            if any(t.is_meta for t in list(model.parameters()) + list(model.buffers())):
+                raise RuntimeError("Checkpoint did not cover every tensor")
+            return model
+        except (AttributeError, TypeError, RuntimeError):
+            # Older torch without meta-device construction or assign=True
+            model = model_class()
+            model.load_state_dict(state_dict)
+            return model
+    
+    def warmup(self):
+        """Run one dummy forward pass so lazy initialization happens before real traffic"""
+        start = time.perf_counter()
+        dummy = torch.zeros(1, 3, 224, 224, device=self.device)
+        with torch.inference_mode():
+            self.model(dummy)
+            if self.screener is not None:
+                self.screener(dummy)
+        self.warmup_time = time.perf_counter() - start
+        print(f"Model warm-up (first inference) took {self.warmup_time:.2f}s")
+        return self.warmup_time
+    
     def _get_transform(self):
         """Get image preprocessing transforms"""
         return transforms.Compose([
@@ -56,63 +211,213 @@ class DeepfakeDetector:
             transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
         ])
     
+    def _resolve_batch_size(self, batch_size):
+        """Turn a batch size setting (int or 'auto') into a concrete integer"""
+        if batch_size == 'auto':
+            return self._auto_batch_size()
+        return max(1, int(batch_size))
+    
+    def _auto_batch_size(self):
+        """Pick a batch size from the memory currently available on the device"""
+        try:
+            if self.device.type == 'cuda':
+                free_bytes = torch.cuda.mem_get_info(self.device)[0]
+            else:
+                free_bytes = self._available_host_memory()
+        except (AttributeError, ValueError, OSError, RuntimeError):
+            return DEFAULT_BATCH_SIZE
+        
+        # Only budget half of what is free so concurrent decodes still fit
+        batch_size = int((free_bytes * 0.5) // BYTES_PER_SAMPLE)
+        batch_size = max(1, min(MAX_AUTO_BATCH_SIZE, batch_size))
+        print(f"Auto-selected inference batch size: {batch_size}")
+        return batch_size
+    
+    @staticmethod
+    def _available_host_memory():
+        """Bytes of host memory available for new allocations (includes reclaimable cache)"""
+        try:
+            with open('/proc/meminfo') as f:
+                for line in f:
+                    if line.startswith('MemAvailable:'):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    
+    def preprocess(self, image):
+        """
+        Convert a PIL Image or numpy array to model input
+        
+        With the vectorized engine this only resizes, returning a 224x224x3 uint8
+        array that predict_batch normalizes together with the rest of its batch;
+        the PIL engine returns a normalized CHW tensor.
+        """
+        # Already preprocessed (e.g. by a pipeline stage)
+        if isinstance(image, torch.Tensor):
+            return image
+        
+        start = time.perf_counter()
+        result = self._preprocess(image)
+        record_stage('preprocess', time.perf_counter() - start, PREPROCESS_SECONDS)
+        return result
+    
+    def _preprocess(self, image):
+        """preprocess without the timing, for inputs predict_batch converts itself"""
+        if isinstance(image, torch.Tensor):
+            return image
+        
+        if self.batch_preprocessor is not None:
+            return self.batch_preprocessor.resize(image)
+        
+        # Convert numpy array to PIL Image if needed
+        if isinstance(image, np.ndarray):
+            image = Image.fromarray(image)
+        
+        # Ensure RGB format
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        
+        return self.transform(image)
+    
+    @staticmethod
+    def _format_prediction(probability, stage=None):
+        """Build the prediction dict for a sigmoid probability (and the cascade stage that produced it)"""
+        # Determine prediction and confidence (flipped logic)
+        prediction = "Real" if probability > 0.5 else "Fake"
+        confidence = probability if probability > 0.5 else (1 - probability)
+        
+        result = {
+            'probability': probability,
+            'prediction': prediction,
+            'confidence': confidence
+        }
+        if stage is not None:
+            result['stage'] = stage
+        return result
+    
+    @staticmethod
+    def _error_prediction():
+        """Prediction dict returned when a frame could not be scored"""
+        return {
+            'probability': 0.5,
+            'prediction': "Error",
+            'confidence': 0.0
+        }
+    
+    def _predict_probabilities(self, images):
+        """
+        Preprocess images, run one forward pass and return sigmoid probabilities
+        
+        Returns:
+            tuple: (probabilities, stages) where stages lists the deciding
+                cascade stage per image, or is None without a screener
+        """
+        start = time.perf_counter()
+        inputs = [self._preprocess(image) for image in images]
+        run = self._forward if self.screener is None else self._cascade_forward
+        
+        if self.batch_preprocessor is not None and all(isinstance(x, np.ndarray) for x in inputs):
+            # The batch is a view of a shared buffer, so keep it locked until the forward pass is done
+            with self.batch_preprocessor.lock:
+                result = run(self.batch_preprocessor.batch(inputs))
+        else:
+            # Mix of caller-supplied tensors and resized arrays
+            tensors = [x if isinstance(x, torch.Tensor) else self.transform(Image.fromarray(x)) for x in inputs]
+            result = run(torch.stack(tensors).to(self.device))
+        
+        elapsed = time.perf_counter() - start
+        record_stage('inference_batch', elapsed, INFERENCE_BATCH_SECONDS)
+        INFERENCE_FRAME_SECONDS.observe(elapsed / len(images), count=len(images))
+        return result
+    
+    def _forward(self, input_tensor):
+        """Run the model on a (N, 3, 224, 224) batch"""
+        with torch.inference_mode():
+            output = self.model(input_tensor).reshape(-1)
+            return torch.sigmoid(output).float().cpu().tolist(), None
+    
+    def _cascade_forward(self, input_tensor):
+        """Screen the whole batch, then run the ViT only on frames inside the uncertain band"""
+        low, high = self.cascade_band
+        with torch.inference_mode():
+            screened = torch.sigmoid(self.screener(input_tensor).reshape(-1)).float()
+            uncertain = ((screened >= low) & (screened <= high)).nonzero().reshape(-1)
+        
+        probabilities = screened.cpu().tolist()
+        stages = ['screener'] * len(probabilities)
+        if len(uncertain):
+            escalated, _ = self._forward(input_tensor.index_select(0, uncertain))
+            for i, probability in zip(uncertain.tolist(), escalated):
+                probabilities[i] = probability
+                stages[i] = 'vit'
+        
+        with self._counts_lock:
+            self.cascade_counts['vit'] += len(uncertain)
+            self.cascade_counts['screener'] += len(probabilities) - len(uncertain)
+        return probabilities, stages
+    
     def predict_single_frame(self, image):
         """
         Predict if a single frame is deepfake or real
         
         Args:
             image: PIL Image or numpy array
-            
+        
         Returns:
             dict: {'probability': float, 'prediction': str, 'confidence': float}
         """
         try:
-            # Convert numpy array to PIL Image if needed
-            if isinstance(image, np.ndarray):
-                image = Image.fromarray(image)
-            
-            # Ensure RGB format
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # Preprocess image
-            input_tensor = self.transform(image).unsqueeze(0).to(self.device)
-            
-            # Make prediction
-            with torch.no_grad():
-                output = self.model(input_tensor).squeeze()
-                probability = torch.sigmoid(output).item()
-                
-            # Determine prediction and confidence (flipped logic)
-            prediction = "Real" if probability > 0.5 else "Fake"
-            confidence = probability if probability > 0.5 else (1 - probability)
-            
-            return {
-                'probability': probability,
-                'prediction': prediction,
-                'confidence': confidence
-            }
-            
+            probabilities, stages = self._predict_probabilities([image])
+            return self._format_prediction(probabilities[0], stages[0] if stages else None)
+        
         except Exception as e:
             print(f"Error in prediction: {e}")
-            return {
-                'probability': 0.5,
-                'prediction': "Error",
-                'confidence': 0.0
-            }
+            return self._error_prediction()
     
-    def predict_frames(self, frames):
+    def predict_batch(self, images):
         """
-        Predict multiple frames
+        Predict a batch of frames with a single forward pass
+        
+        Args:
+            images: List of PIL Images, numpy arrays or preprocessed tensors
+        
+        Returns:
+            list: List of prediction dictionaries, one per image
+        """
+        if not images:
+            return []
+        
+        try:
+            probabilities, stages = self._predict_probabilities(images)
+            return [self._format_prediction(p, stages[i] if stages else None) for i, p in enumerate(probabilities)]
+        
+        except Exception as e:
+            print(f"Error in batch prediction: {e}")
+            return [self._error_prediction() for _ in images]
+    
+    def predict_frames(self, frames, batch_size=None, progress_callback=None):
+        """
+        Predict multiple frames in batches
         
         Args:
             frames: List of PIL Images or numpy arrays
-            
+            batch_size: Frames per forward pass (defaults to self.batch_size)
+            progress_callback: Optional callback called after each batch with
+                (frames_done, total_frames)
+        
         Returns:
             list: List of prediction dictionaries
         """
+        batch_size = self._resolve_batch_size(batch_size or self.batch_size)
+        total = len(frames)
         results = []
-        for frame in frames:
-            result = self.predict_single_frame(frame)
-            results.append(result)
+        
+        for start in range(0, total, batch_size):
+            batch = frames[start:start + batch_size]
+            results.extend(self.predict_batch(batch))
+            
+            if progress_callback:
+                progress_callback(len(results), total)
+        
         return results
\ No newline at end of file
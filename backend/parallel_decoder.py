@@ -0,0 +1,150 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from frame_sampler import FrameSampler
+
+def _decode_segment(video_path, frame_indices, shm_name, frame_shape, sampling_strategy):
+    """
+    Worker process: decode one segment into a shared memory block
+    
+    Frames are downsampled and converted to RGB before being written, so the
+    parent only ever sees small frames and nothing large is pickled.
+    
+    Returns:
+        list: Frame index stored in each slot, in slot order
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    frames = np.ndarray((len(frame_indices),) + frame_shape, dtype=np.uint8, buffer=shm.buf)
+    height, width = frame_shape[:2]
+    decoded = []
+    cap = cv2.VideoCapture(video_path)
+    
+    try:
+        if not cap.isOpened():
+            raise ValueError(f"Could not open video file {video_path}")
+        
+        # Each process has its own capture; the segment is sampled like a small video
+        sampler = FrameSampler(sampling_strategy)
+        for slot, (frame_idx, frame) in enumerate(sampler.iter_frames(cap, frame_indices)):
+            small = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(small, cv2.COLOR_BGR2RGB, dst=frames[slot])
+            decoded.append(frame_idx)
+    finally:
+        cap.release()
+        del frames
+        shm.close()
+    
+    return decoded
+
+class ParallelSegmentDecoder:
+    """Decode sampled frames of long videos in several processes at once"""
+    
+    def __init__(self, workers=4, min_duration=120, max_side=512, sampling_strategy='auto', working_size=None):
+        """
+        Args:
+            workers: Decoder processes (and segments per video)
+            min_duration: Videos shorter than this many seconds are decoded in-process
+            max_side: Longest side of the frames returned by workers when
+                working_size is not set
+            sampling_strategy: FrameSampler strategy used inside each segment
+            working_size: Shorter side of the frames returned by workers, the
+                same rule VideoProcessor applies to in-process decoding
+        """
+        self.workers = max(1, int(workers))
+        self.min_duration = float(min_duration)
+        self.max_side = int(max_side)
+        self.working_size = int(working_size) if working_size else None
+        self.sampling_strategy = 'seek' if sampling_strategy == 'keyframe' else sampling_strategy
+        
+        self._pool = None
+        self._pool_lock = threading.Lock()
+    
+    def should_use(self, duration, sample_count):
+        """Check whether a video is long enough to be worth splitting"""
+        return duration >= self.min_duration and sample_count >= self.workers * 2
+    
+    def _get_pool(self):
+        """Create the worker pool on first use (spawn avoids forking a threaded server)"""
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._pool
+    
+    def output_shape(self, width, height):
+        """Downsampled (height, width, 3) shape for a source resolution"""
+        if self.working_size:
+            scale = min(1.0, self.working_size / max(min(width, height), 1))
+        else:
+            scale = min(1.0, self.max_side / max(width, height, 1))
+        return max(1, int(round(height * scale))), max(1, int(round(width * scale))), 3
+    
+    def iter_frames(self, video_path, frame_indices, width, height):
+        """
+        Decode frame_indices across worker processes
+        
+        Segments are yielded in order as soon as each one is ready, so
+        downstream stages can start before the whole video is decoded.
+        
+        Args:
+            video_path: Path to video file
+            frame_indices: Ascending frame indices to decode
+            width: Source frame width
+            height: Source frame height
+        
+        Yields:
+            tuple: (frame_index, downsampled RGB numpy array)
+        """
+        frame_indices = list(frame_indices)
+        frame_shape = self.output_shape(width, height)
+        frame_bytes = int(np.prod(frame_shape))
+        segments = [list(segment) for segment in np.array_split(frame_indices, self.workers) if len(segment)]
+        
+        pool = self._get_pool()
+        blocks = []
+        futures = []
+        frames = None
+        try:
+            for segment in segments:
+                shm = shared_memory.SharedMemory(create=True, size=len(segment) * frame_bytes)
+                blocks.append(shm)
+                futures.append(pool.submit(
+                    _decode_segment, video_path, [int(i) for i in segment],
+                    shm.name, frame_shape, self.sampling_strategy
+                ))
+            
+            # Merge in timestamp order: segments are contiguous and ascending
+            for shm, segment, future in zip(blocks, segments, futures):
+                decoded = future.result()
+                frames = np.ndarray((len(segment),) + frame_shape, dtype=np.uint8, buffer=shm.buf)
+                for slot, frame_idx in enumerate(decoded):
+                    yield frame_idx, frames[slot].copy()
+                frames = None
+        finally:
+            # Drop our view so the block can be closed
+            frames = None
+            for future in futures:
+                future.cancel()
+            for shm, future in zip(blocks, futures):
+                # A running worker still has the block attached; wait before unlinking
+                if not future.cancelled():
+                    try:
+                        future.result()
+                    except Exception:
+                        pass
+                shm.close()
+                shm.unlink()
+    
+    def shutdown(self):
+        """Stop the worker processes"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Stream a file through SHA-256 without loading it into memory"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def make_cache_key(content_hash, model_fingerprint, params):
+    """
+    Combine everything that determines a job's results into one key
+    
+    Args:
+        content_hash: SHA-256 of the uploaded video
+        model_fingerprint: SHA-256 of the model weights
+        params: Dict of sampling/analysis settings
+    
+    Returns:
+        str: Hex cache key
+    """
+    payload = json.dumps({
+        'content': content_hash,
+        'model': model_fingerprint,
+        'params': params
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class ResultCache:
+    """Two-tier (memory LRU + disk) cache of completed job results"""
+    
+    def __init__(self, max_entries=256, ttl_seconds=86400, cache_dir=None, max_disk_bytes=512 * 1024 * 1024):
+        """
+        Args:
+            max_entries: Results kept in the in-memory LRU tier
+            ttl_seconds: Age after which an entry is treated as missing, in both tiers
+            cache_dir: Directory for the disk tier (None disables it)
+            max_disk_bytes: Disk tier size limit; oldest files are evicted first
+        """
+        self.max_entries = max(0, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = int(max_disk_bytes)
+        
+        self._memory = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self._stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0
+        }
+        
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+    
+    def get(self, key):
+        """
+        Look up a result, promoting disk hits into memory
+        
+        Returns:
+            dict: Cached value, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if now - stored_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._stats['memory_hits'] += 1
+                    return value
+                del self._memory[key]
+                self._stats['evictions'] += 1
+        
+        value, stored_at = self._read_disk(key, now)
+        
+        with self._lock:
+            if value is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['disk_hits'] += 1
+            self._remember(key, stored_at, value)
+        return value
+    
+    def put(self, key, value):
+        """Store a result in both tiers"""
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            self._stats['stores'] += 1
+        
+        if self.cache_dir:
+            self._write_disk(key, value)
+            self._evict_disk(now)
+    
+    def _remember(self, key, stored_at, value):
+        """Insert into the memory tier and trim it to max_entries (lock held)"""
+        if self.max_entries == 0:
+            return
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats['evictions'] += 1
+    
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.json')
+    
+    def _read_disk(self, key, now):
+        """Read an unexpired entry from the disk tier"""
+        if not self.cache_dir:
+            return None, None
+        
+        path = self._disk_path(key)
+        try:
+            stored_at = os.path.getmtime(path)
+            if now - stored_at > self.ttl_seconds:
+                os.remove(path)
+                return None, None
+            with open(path, 'r') as f:
+                return json.load(f), stored_at
+        except (OSError, ValueError):
+            return None, None
+    
+    def _write_disk(self, key, value):
+        """Write atomically so concurrent readers never see a partial file"""
+        path = self._disk_path(key)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(value, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Error writing result cache entry: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    def _evict_disk(self, now):
+        """Drop expired files, then the oldest ones until under max_disk_bytes"""
+        entries = []
+        total = 0
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            
+            if now - stat.st_mtime > self.ttl_seconds:
+                self._remove_file(path)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_disk_bytes:
+                break
+            self._remove_file(path)
+            total -= size
+    
+    def _remove_file(self, path):
+        try:
+            os.remove(path)
+            with self._lock:
+                self._stats['evictions'] += 1
+        except OSError:
+            pass
+    
+    def get_stats(self):
+        """
+        Get hit/miss counters
+        
+        Returns:
+            dict: Hit and miss counts, hit rate and entries in memory
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+        
+        hits = stats['memory_hits'] + stats['disk_hits']
+        lookups = hits + stats['misses']
+        stats['hits'] = hits
+        stats['hit_rate'] = hits / lookups if lookups else 0.0
+        return stats
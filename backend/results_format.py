@@ -0,0 +1,217 @@
+import base64
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from job_store import pack_frame_results, unpack_frame_columns, unpack_frame_results
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+RESULT_VIEWS = ('full', 'summary', 'columnar')
+COLUMN_ENCODINGS = ('json', 'packed')
+# Content codings offered to clients, preferred first
+CONTENT_ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+# Wire dtypes for the packed encoding; float16 keeps probabilities to about
+# 5e-4, well below what the UI displays
+_PACKED_DTYPES = {
+    'frame_number': '<i4',
+    'timestamp': '<f4',
+    'probability': '<f2',
+    'confidence': '<f2',
+    'prediction': '|u1',
+    'reused_from': '<i4'
+}
+
+def parse_results_query(args):
+    """
+    Validate the results query parameters
+    
+    Args:
+        args: Mapping of query parameters (e.g. request.args)
+    
+    Returns:
+        dict: view, encoding, offset, limit, start_time and end_time
+    
+    Raises:
+        ValueError: If a parameter is unknown or out of range
+    """
+    def number(name, cast):
+        value = args.get(name)
+        if value is None or value == '':
+            return None
+        try:
+            return cast(value)
+        except ValueError:
+            raise ValueError(f"Invalid value for {name}: {value}")
+    
+    query = {
+        'view': args.get('view', 'full'),
+        'encoding': args.get('encoding', 'json'),
+        'offset': number('offset', int) or 0,
+        'limit': number('limit', int),
+        'start_time': number('start', float),
+        'end_time': number('end', float)
+    }
+    if query['view'] not in RESULT_VIEWS:
+        raise ValueError(f"Unknown view: {query['view']}. Choose from {', '.join(RESULT_VIEWS)}")
+    if query['encoding'] not in COLUMN_ENCODINGS:
+        raise ValueError(f"Unknown encoding: {query['encoding']}. Choose from {', '.join(COLUMN_ENCODINGS)}")
+    if query['offset'] < 0 or (query['limit'] is not None and query['limit'] < 0):
+        raise ValueError("offset and limit must not be negative")
+    return query
+
+def select_frames(timestamps, offset=0, limit=None, start_time=None, end_time=None):
+    """
+    Positions of the frames in a timestamp window, then paged by offset/limit
+    
+    Returns:
+        tuple: (index array, number of frames in the window before paging)
+    """
+    timestamps = np.asarray(timestamps)
+    mask = np.ones(len(timestamps), dtype=bool)
+    if start_time is not None:
+        mask &= timestamps >= start_time
+    if end_time is not None:
+        mask &= timestamps <= end_time
+    indices = np.flatnonzero(mask)
+    stop = None if limit is None else offset + limit
+    return indices[offset:stop], len(indices)
+
+def _columns(header, data, indices, encoding):
+    """Selected frames as parallel arrays, in JSON lists or base64-packed binary"""
+    arrays = unpack_frame_columns(header, data)
+    # Label codes rather than strings, with the label table sent once
+    _, _, offset, size = next(c for c in header['columns'] if c[0] == 'prediction')
+    arrays['prediction'] = np.frombuffer(data, dtype=np.uint8, count=size, offset=offset)
+    
+    columns = {'count': len(indices), 'labels': header['labels']}
+    if encoding == 'packed':
+        columns['encoding'] = 'packed'
+        columns['dtypes'] = dict(_PACKED_DTYPES)
+        columns['data'] = {
+            name: base64.b64encode(arrays[name][indices].astype(dtype).tobytes()).decode('ascii')
+            for name, dtype in _PACKED_DTYPES.items()
+        }
+    else:
+        columns['encoding'] = 'json'
+        columns['data'] = {name: arrays[name][indices].tolist() for name in _PACKED_DTYPES}
+    
+    extra = header.get('extra')
+    columns['extra'] = [extra[i] for i in indices] if extra else None
+    return columns
+
+def build_results(summary, frames, query):
+    """
+    Shape a completed job's results for one request
+    
+    Args:
+        summary: Results dict without frame_results
+        frames: (header, bytes) packed frame results from the job store, or
+            None (not needed for the summary view)
+        query: Output of parse_results_query
+    
+    Returns:
+        dict: The summary plus, depending on the view, 'frame_results' (dicts)
+            or 'frames' (columns), and 'page' describing the selected range
+    """
+    results = dict(summary)
+    if query['view'] == 'summary':
+        # total_frames_analyzed already gives the frame count
+        return results
+    
+    header, data = frames if frames is not None else pack_frame_results([])
+    
+    indices, total = select_frames(
+        unpack_frame_columns(header, data)['timestamp'],
+        offset=query['offset'],
+        limit=query['limit'],
+        start_time=query['start_time'],
+        end_time=query['end_time']
+    )
+    
+    if query['view'] == 'columnar':
+        results['frames'] = _columns(header, data, indices, query['encoding'])
+    else:
+        results['frame_results'] = unpack_frame_results(header, data, indices)
+    
+    results['page'] = {
+        'offset': query['offset'],
+        'limit': query['limit'],
+        'returned': len(indices),
+        'total': total
+    }
+    return results
+
+def results_etag(job_id, version, query):
+    """
+    Entity tag for a results response
+    
+    Results do not change once a job completes, so the job's last update time
+    and the query identify the representation without rendering it.
+    """
+    key = json.dumps([job_id, version, query], sort_keys=True)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+def compress(body, encoding, level=6):
+    """Encode a response body with 'gzip' or 'br'"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=min(level, 11))
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=level)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+class EncodedResponseCache:
+    """
+    Small LRU of rendered (and compressed) results bodies
+    
+    Completed results never change, so a body rendered once can be served to
+    every later request for the same representation without re-serializing.
+    Entries are (content encoding or None, body bytes) keyed by the caller.
+    """
+    
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+    
+    def put(self, key, encoding, body):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (encoding, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def get_stats(self):
+        """
+        Returns:
+            dict: Entries held, bytes held, hits and misses
+        """
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': sum(len(body) for _, body in self._entries.values()),
+                'hits': self.hits,
+                'misses': self.misses
+            }
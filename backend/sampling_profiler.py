@@ -0,0 +1,102 @@
+import os
+import sys
+import threading
+from collections import Counter
+
+class SamplingProfiler:
+    """
+    Sample the Python stacks of selected threads at a fixed interval
+    
+    Stacks are collapsed root-first into 'file:function;file:function'
+    strings and counted, the folded format flame graph tools read. Blocked
+    threads are sampled too, so time spent waiting on a queue or lock shows
+    up next to time spent computing. Only Python frames are seen: time in
+    native code (OpenCV, torch) is attributed to the Python call that
+    entered it, and decoder processes are not sampled at all.
+    """
+    
+    def __init__(self, interval_ms=10, thread_ids=(), thread_names=(), max_depth=64):
+        """
+        Args:
+            interval_ms: Milliseconds between samples
+            thread_ids: Idents of threads to sample
+            thread_names: Names of further threads to sample (e.g. shared
+                pipeline or scheduler threads, which other jobs may also use)
+            max_depth: Innermost frames kept per stack
+        """
+        self.interval = max(1.0, float(interval_ms)) / 1000.0
+        self.thread_ids = set(thread_ids)
+        self.thread_names = set(thread_names)
+        self.max_depth = int(max_depth)
+        self.samples = 0
+        self._stacks = Counter()  # (thread name, folded stack) -> samples
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """Begin sampling on a background thread"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self, top=50):
+        """
+        Stop sampling
+        
+        Returns:
+            dict: See get_stats
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self.get_stats(top)
+    
+    def _run(self):
+        """Sampling loop"""
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                name = names.get(ident)
+                if ident in self.thread_ids or name in self.thread_names:
+                    self._stacks[(name, self._fold(frame))] += 1
+            self.samples += 1
+    
+    def _fold(self, frame):
+        """Collapse a frame's stack root-first, keeping the innermost max_depth frames"""
+        stack = []
+        while frame is not None and len(stack) < self.max_depth:
+            code = frame.f_code
+            stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        return ';'.join(reversed(stack))
+    
+    def get_stats(self, top=50):
+        """
+        Returns:
+            dict: Sampling interval, number of sampling rounds, samples per
+                thread, and the top most frequent stacks with their counts
+        """
+        stacks = self._stacks.copy()
+        threads = Counter()
+        for (name, _), count in stacks.items():
+            threads[name] += count
+        return {
+            'interval_ms': self.interval * 1000.0,
+            'samples': self.samples,
+            'threads': dict(threads),
+            'stacks': [
+                {'thread': name, 'stack': stack, 'samples': count}
+                for (name, stack), count in stacks.most_common(top)
+            ]
+        }
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,220 @@
+import math
+
+import numpy as np
+
+POOLING_METHODS = ('mean', 'trimmed_mean')
+SMOOTHING_METHODS = ('none', 'ema', 'median')
+
+# Keeps logits finite for probabilities of exactly 0 or 1
+_EPSILON = 1e-6
+
+def _logit(p):
+    p = np.clip(p, _EPSILON, 1 - _EPSILON)
+    return np.log(p) - np.log1p(-p)
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + math.exp(-x))
+
+def logit_pool(scores):
+    """Mean in logit space, mapped back to a probability"""
+    if len(scores) == 0:
+        return None
+    return _sigmoid(float(np.mean(_logit(scores))))
+
+def trimmed_logit_pool(scores, trim=0.1):
+    """
+    Logit mean after dropping the lowest and highest trim fraction
+    
+    Uses np.partition rather than a sort, so it stays O(n).
+    """
+    n = len(scores)
+    k = int(n * trim)
+    if n == 0:
+        return None
+    if k == 0 or n - 2 * k <= 0:
+        return logit_pool(scores)
+    
+    logits = np.partition(_logit(scores), (k, n - k - 1))
+    return _sigmoid(float(np.mean(logits[k:n - k])))
+
+def ema_smooth(values, alpha=0.3):
+    """
+    Exponential moving average, y[t] = alpha * x[t] + (1 - alpha) * y[t - 1]
+    
+    The recursion is unrolled with a cumulative sum inside fixed-size blocks
+    (short enough that the decay factors stay within float64 range), carrying
+    the last value between blocks, so the cost is O(n) with NumPy doing the work.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n == 0 or alpha >= 1:
+        return values.copy()
+    
+    decay = 1.0 - alpha
+    block = max(1, min(n, int(300 / -math.log(decay))))
+    powers = decay ** np.arange(block)
+    inverse_powers = 1.0 / powers
+    
+    smoothed = np.empty(n)
+    previous = values[0]  # Seeding with x[0] makes y[0] == x[0]
+    for start in range(0, n, block):
+        chunk = values[start:start + block]
+        size = len(chunk)
+        # y[j] = decay^(j+1) * y_prev + alpha * sum_i decay^(j-i) * x[i]
+        weighted = np.cumsum(chunk * inverse_powers[:size]) * powers[:size]
+        smoothed[start:start + size] = alpha * weighted + previous * powers[:size] * decay
+        previous = smoothed[start + size - 1]
+    
+    return smoothed
+
+def median_smooth(values, window=5):
+    """Centered running median (edges padded by repetition); O(n * window)"""
+    values = np.asarray(values, dtype=np.float64)
+    window = max(1, int(window)) | 1  # odd, so the window is centered
+    if len(values) == 0 or window == 1:
+        return values.copy()
+    
+    half = window // 2
+    padded = np.pad(values, half, mode='edge')
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window)
+    return np.median(windows, axis=1)
+
+def find_segments(scores, timestamps, threshold=0.5, min_frames=2, frame_numbers=None):
+    """
+    Contiguous runs of frames whose score is above threshold
+    
+    Args:
+        scores: Per-frame fake scores in frame order
+        timestamps: Per-frame timestamps in seconds
+        threshold: Score above which a frame counts as suspicious
+        min_frames: Shorter runs are ignored
+        frame_numbers: Optional frame number per score to report instead of
+            array positions (e.g. grid positions in adaptive sampling)
+    
+    Returns:
+        list: Dicts with start/end timestamps and frame positions, frame count,
+            mean and peak score
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    if len(scores) == 0:
+        return []
+    
+    above = np.concatenate(([False], scores > threshold, [False]))
+    edges = np.flatnonzero(np.diff(above.astype(np.int8)))
+    starts, ends = edges[::2], edges[1::2]  # ends are exclusive
+    keep = (ends - starts) >= max(1, int(min_frames))
+    starts, ends = starts[keep], ends[keep]
+    if len(starts) == 0:
+        return []
+    
+    # Prefix sums give every segment's mean in one step
+    prefix = np.concatenate(([0.0], np.cumsum(scores)))
+    means = (prefix[ends] - prefix[starts]) / (ends - starts)
+    # reduceat runs from one start to the next, so mask everything outside the kept segments
+    marks = np.zeros(len(scores) + 1, dtype=np.int32)
+    np.add.at(marks, starts, 1)
+    np.add.at(marks, ends, -1)
+    inside = np.cumsum(marks[:-1]) > 0
+    peaks = np.maximum.reduceat(np.where(inside, scores, -np.inf), starts)
+    
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    numbers = np.asarray(frame_numbers if frame_numbers is not None else np.arange(len(scores)))
+    return [
+        {
+            'start_time': float(timestamps[s]),
+            'end_time': float(timestamps[e - 1]),
+            'start_frame': int(numbers[s]),
+            'end_frame': int(numbers[e - 1]),
+            'frames': int(e - s),
+            'mean_score': float(m),
+            'peak_score': float(p)
+        }
+        for s, e, m, p in zip(starts, ends, means, peaks)
+    ]
+
+class ScoreAggregator:
+    """
+    Turn per-frame model probabilities into a video-level score and segments
+    
+    Works on fake scores (1 - probability, since the model outputs the
+    probability of "Real"). The pooled score uses the raw scores; segments
+    are found on the temporally smoothed ones so single-frame flickers do not
+    split or create segments. Every step is O(n) in the number of frames.
+    """
+    
+    def __init__(self, pooling='trimmed_mean', smoothing='ema', trim=0.1, ema_alpha=0.3,
+                 median_window=5, segment_threshold=0.5, min_segment_frames=2):
+        """
+        Args:
+            pooling: One of POOLING_METHODS
+            smoothing: One of SMOOTHING_METHODS
+            trim: Fraction dropped from each end for trimmed_mean
+            ema_alpha: Weight of the newest frame in EMA smoothing
+            median_window: Frames in the running median
+            segment_threshold: Smoothed fake score above which a frame is suspicious
+            min_segment_frames: Shortest run of suspicious frames reported as a segment
+        """
+        if pooling not in POOLING_METHODS:
+            raise ValueError(f"Unknown pooling method: {pooling}. Choose from {', '.join(POOLING_METHODS)}")
+        if smoothing not in SMOOTHING_METHODS:
+            raise ValueError(f"Unknown smoothing method: {smoothing}. Choose from {', '.join(SMOOTHING_METHODS)}")
+        
+        self.pooling = pooling
+        self.smoothing = smoothing
+        self.trim = float(trim)
+        self.ema_alpha = float(ema_alpha)
+        self.median_window = int(median_window)
+        self.segment_threshold = float(segment_threshold)
+        self.min_segment_frames = int(min_segment_frames)
+    
+    def smooth(self, scores):
+        """Apply the configured temporal smoothing"""
+        if self.smoothing == 'ema':
+            return ema_smooth(scores, self.ema_alpha)
+        if self.smoothing == 'median':
+            return median_smooth(scores, self.median_window)
+        return np.asarray(scores, dtype=np.float64)
+    
+    def aggregate(self, probabilities, timestamps, frame_numbers=None):
+        """
+        Args:
+            probabilities: Per-frame model probabilities, in time order
+            timestamps: Per-frame timestamps in seconds
+            frame_numbers: Optional frame number to report for each entry
+        
+        Returns:
+            dict: {'pooled_score': float (fake probability) or None,
+                'pooled_prediction': str, 'segments': list}
+        """
+        scores = 1.0 - np.asarray(probabilities, dtype=np.float64)
+        
+        if self.pooling == 'trimmed_mean':
+            pooled = trimmed_logit_pool(scores, self.trim)
+        else:
+            pooled = logit_pool(scores)
+        
+        segments = find_segments(
+            self.smooth(scores),
+            timestamps,
+            threshold=self.segment_threshold,
+            min_frames=self.min_segment_frames,
+            frame_numbers=frame_numbers
+        )
+        
+        return {
+            'pooled_score': pooled,
+            'pooled_prediction': None if pooled is None else ('Fake' if pooled > 0.5 else 'Real'),
+            'segments': segments
+        }
+    
+    def get_settings(self):
+        """Settings that affect the output (for cache keys and reports)"""
+        return {
+            'pooling': self.pooling,
+            'trim': self.trim if self.pooling == 'trimmed_mean' else None,
+            'smoothing': self.smoothing,
+            'ema_alpha': self.ema_alpha if self.smoothing == 'ema' else None,
+            'median_window': self.median_window if self.smoothing == 'median' else None,
+            'segment_threshold': self.segment_threshold,
+            'min_segment_frames': self.min_segment_frames
+        }
@@ -4,11 +4,51 @@ from PIL import Image
 import os
 import time
 
+from frame_sampler import FrameSampler
+from metrics import DECODE_SECONDS, PROBE_SECONDS, record_stage
+from parallel_decoder import ParallelSegmentDecoder
+
+# Upper bound on frames sampled from one video for analysis
+MAX_ANALYSIS_FRAMES = 100
+
 class VideoProcessor:
     """Handle video processing operations"""
     
-    def __init__(self):
+    def __init__(self, sampling_strategy='auto', snap_to_keyframes=False,
+                 parallel_workers=0, parallel_min_duration=120, parallel_max_side=512,
+                 working_size=None):
         self.supported_formats = ['.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv']
+        self.sampler = FrameSampler(sampling_strategy, snap_to_keyframes=snap_to_keyframes)
+        
+        # Shorter side decoded frames are shrunk to before anything keeps them
+        # (None keeps full resolution); see fetch_frames for full-size access
+        self.working_size = int(working_size) if working_size else None
+        
+        # Multi-process segment decoding for long videos (disabled when workers is 0)
+        self.parallel_decoder = None
+        if parallel_workers > 0:
+            self.parallel_decoder = ParallelSegmentDecoder(
+                workers=parallel_workers,
+                min_duration=parallel_min_duration,
+                max_side=parallel_max_side,
+                sampling_strategy=sampling_strategy,
+                working_size=self.working_size
+            )
+    
+    def to_working_rgb(self, frame):
+        """
+        Shrink a decoded BGR frame to the working resolution and convert it to RGB
+        
+        Resizing first means the color conversion (and every later copy) only
+        touches the small frame, and the full-size decode buffer can be freed.
+        """
+        if self.working_size:
+            height, width = frame.shape[:2]
+            scale = self.working_size / min(height, width)
+            if scale < 1:
+                size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+                frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
     
     def is_supported_format(self, filename):
         """Check if the video format is supported"""
@@ -18,6 +58,7 @@ class VideoProcessor:
     def get_video_info(self, video_path):
         """Get basic information about the video"""
         try:
+            start = time.perf_counter()
             cap = cv2.VideoCapture(video_path)
             
             # Get video properties
@@ -28,6 +69,7 @@ class VideoProcessor:
             duration = frame_count / fps if fps > 0 else 0
             
             cap.release()
+            record_stage('probe', time.perf_counter() - start, PROBE_SECONDS)
             
             return {
                 'fps': fps,
@@ -37,7 +79,7 @@ class VideoProcessor:
                 'duration': duration,
                 'size_mb': os.path.getsize(video_path) / (1024 * 1024)
             }
-            
+        
         except Exception as e:
             print(f"Error getting video info: {e}")
             return None
@@ -50,7 +92,7 @@ class VideoProcessor:
             video_path: Path to video file
             max_frames: Maximum number of frames to extract
             skip_frames: Number of frames to skip between extractions
-            
+        
         Returns:
             list: List of PIL Images
         """
@@ -72,8 +114,8 @@ class VideoProcessor:
                 
                 # Skip frames based on skip_frames parameter
                 if frame_count % (skip_frames + 1) == 0:
-                    # Convert BGR to RGB (OpenCV uses BGR)
-                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                    # Downscale and convert BGR to RGB (OpenCV uses BGR)
+                    frame_rgb = self.to_working_rgb(frame)
                     
                     # Convert to PIL Image
                     pil_image = Image.fromarray(frame_rgb)
@@ -83,10 +125,10 @@ class VideoProcessor:
                 frame_count += 1
             
             cap.release()
-            
+        
         except Exception as e:
             print(f"Error extracting frames: {e}")
-            
+        
         return frames
     
     def extract_frames_with_timestamps(self, video_path, max_frames=100):
@@ -96,11 +138,28 @@ class VideoProcessor:
         Args:
             video_path: Path to video file
             max_frames: Maximum number of frames to extract
-            
+        
         Returns:
             list: List of tuples (PIL Image, timestamp_seconds)
         """
-        frames_with_timestamps = []
+        return list(self.iter_frames_with_timestamps(video_path, max_frames))
+    
+    def iter_frames_with_timestamps(self, video_path, max_frames=100, as_arrays=False):
+        """
+        Lazily decode evenly spaced frames with their timestamps
+        
+        Only one decoded frame is held at a time, so callers can start
+        working on early frames while later ones are still being decoded.
+        
+        Args:
+            video_path: Path to video file
+            max_frames: Maximum number of frames to extract
+            as_arrays: Yield RGB uint8 numpy arrays instead of PIL Images
+        
+        Yields:
+            tuple: (PIL Image or numpy array, timestamp_seconds)
+        """
+        cap = None
         try:
             cap = cv2.VideoCapture(video_path)
             
@@ -115,26 +174,95 @@ class VideoProcessor:
             
             frame_indices = range(0, total_frames, skip_frames)[:max_frames]
             
-            for frame_idx in frame_indices:
-                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-                ret, frame = cap.read()
+            duration = total_frames / fps if fps > 0 else 0
+            if self.parallel_decoder and self.parallel_decoder.should_use(duration, len(frame_indices)):
+                width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+                height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+                cap.release()
                 
-                if ret:
-                    # Calculate timestamp
+                # Workers return frames already downsampled and in RGB order
+                start = time.perf_counter()
+                for frame_idx, frame_rgb in self.parallel_decoder.iter_frames(
+                        video_path, frame_indices, width, height):
                     timestamp = frame_idx / fps if fps > 0 else 0
-                    
-                    # Convert BGR to RGB
-                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    pil_image = Image.fromarray(frame_rgb)
-                    
-                    frames_with_timestamps.append((pil_image, timestamp))
-            
-            cap.release()
+                    record_stage('decode', time.perf_counter() - start, DECODE_SECONDS)
+                    yield (frame_rgb if as_arrays else Image.fromarray(frame_rgb)), timestamp
+                    start = time.perf_counter()
+                return
             
+            # The sampler decides between linear decoding and seeking per file
+            # (decode time per frame excludes the time the consumer holds it)
+            start = time.perf_counter()
+            for frame_idx, frame in self.sampler.iter_frames(cap, frame_indices):
+                # Calculate timestamp
+                timestamp = frame_idx / fps if fps > 0 else 0
+                
+                # Downscale and convert BGR to RGB, dropping the full-size frame
+                frame_rgb = self.to_working_rgb(frame)
+                del frame
+                record_stage('decode', time.perf_counter() - start, DECODE_SECONDS)
+                
+                yield (frame_rgb if as_arrays else Image.fromarray(frame_rgb)), timestamp
+                start = time.perf_counter()
+        
         except Exception as e:
             print(f"Error extracting frames with timestamps: {e}")
+        
+        finally:
+            if cap is not None:
+                cap.release()
+    
+    def read_frames(self, cap, frame_indices, as_arrays=False, exact=False, costs=None):
+        """
+        Read specific frames from an already opened capture
+        
+        Args:
+            cap: Opened cv2.VideoCapture
+            frame_indices: Ascending frame indices to read
+            as_arrays: Yield RGB uint8 numpy arrays instead of PIL Images
+            exact: Read exactly frame_indices (no keyframe snapping), choosing
+                the access pattern from costs instead of probing the file
+            costs: FrameSampler.measure_costs result for this video (exact only)
+        
+        Yields:
+            tuple: (frame_index, PIL Image or numpy array)
+        """
+        if exact:
+            frames = self.sampler.iter_exact_frames(cap, frame_indices, costs)
+        else:
+            frames = self.sampler.iter_frames(cap, frame_indices)
+        
+        start = time.perf_counter()
+        for frame_idx, frame in frames:
+            frame_rgb = self.to_working_rgb(frame)
+            del frame
+            record_stage('decode', time.perf_counter() - start, DECODE_SECONDS)
+            yield frame_idx, (frame_rgb if as_arrays else Image.fromarray(frame_rgb))
+            start = time.perf_counter()
+    
+    def fetch_frames(self, video_path, frame_indices):
+        """
+        Re-read specific frames at full resolution
+        
+        For steps that need more detail than the working resolution (e.g.
+        thumbnails); only the requested frames are decoded.
+        
+        Args:
+            video_path: Path to video file
+            frame_indices: Frame indices to read
+        
+        Yields:
+            tuple: (frame_index, full-size PIL Image)
+        """
+        cap = cv2.VideoCapture(video_path)
+        try:
+            if not cap.isOpened():
+                raise ValueError("Could not open video file")
             
-        return frames_with_timestamps
+            for frame_idx, frame in self.sampler.iter_frames(cap, sorted(set(frame_indices))):
+                yield frame_idx, Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        finally:
+            cap.release()
     
     def process_video_for_analysis(self, video_path, progress_callback=None):
         """
@@ -143,7 +271,7 @@ class VideoProcessor:
         Args:
             video_path: Path to video file
             progress_callback: Optional callback function for progress updates
-            
+        
         Returns:
             dict: Processing results
         """
@@ -157,7 +285,7 @@ class VideoProcessor:
         # Extract frames with timestamps
         frames_with_timestamps = self.extract_frames_with_timestamps(
             video_path, 
-            max_frames=min(100, video_info['frame_count'])
+            max_frames=min(MAX_ANALYSIS_FRAMES, video_info['frame_count'])
         )
         
         if progress_callback:
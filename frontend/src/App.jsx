@@ -3,7 +3,7 @@ import VideoUploader from './components/VideoUploader';
 import ResultsDisplay from './components/ResultsDisplay';
 import Dashboard from './components/Dashboard';
 import LoadingSpinner from './components/LoadingSpinner';
-import { uploadVideo, checkJobStatus, getJobResults } from './services/api';
+import { uploadVideoResumable, watchJobStatus, getJobResults } from './services/api';
 import './styles/App.css';
 
 function App() {
@@ -19,8 +19,8 @@ function App() {
       setError(null);
       setCurrentView('processing');
       
-      // Upload video
-      const response = await uploadVideo(file);
+      // Upload video in resumable chunks
+      const response = await uploadVideoResumable(file);
       const newJobId = response.job_id;
       setJobId(newJobId);
       
@@ -33,23 +33,19 @@ function App() {
     }
   }, []);
 
-  // Poll job status
+  // Follow job status (pushed by the server) until the job finishes
   const pollJobStatus = useCallback(async (jobId) => {
     try {
-      const status = await checkJobStatus(jobId);
-      setJobStatus(status);
+      const status = await watchJobStatus(jobId, setJobStatus);
       
       if (status.status === 'completed') {
         // Get results
         const resultsData = await getJobResults(jobId);
         setResults(resultsData.results);
         setCurrentView('results');
-      } else if (status.status === 'error') {
+      } else {
         setError(status.error || 'Processing failed');
         setCurrentView('upload');
-      } else {
-        // Continue polling
-        setTimeout(() => pollJobStatus(jobId), 2000);
       }
     } catch (err) {
       setError(err.message || 'Status check failed');
@@ -34,7 +34,11 @@ api.interceptors.response.use(
     if (error.response) {
       // Server responded with error status
       const errorMessage = error.response.data?.error || error.response.statusText || 'Server error';
-      throw new Error(errorMessage);
+      // Keep the status and headers so callers can tell retryable errors apart
+      const apiError = new Error(errorMessage);
+      apiError.status = error.response.status;
+      apiError.headers = error.response.headers;
+      throw apiError;
     } else if (error.request) {
       // Request was made but no response received
       throw new Error('No response from server. Please check your connection.');
@@ -69,6 +73,68 @@ export const uploadVideo = async (file) => {
   }
 };
 
+/**
+ * Upload a video in chunks, resuming after interruptions
+ * 
+ * The server checks the container header from the first chunk and starts
+ * processing as soon as the last one arrives, so the final response matches
+ * uploadVideo's.
+ * @param {File} file - Video file to upload
+ * @param {Function} onProgress - Called with the fraction uploaded (0-1)
+ * @param {number} maxRetries - Attempts per chunk before giving up (default: 5)
+ * @returns {Promise<Object>} Upload response with job_id
+ */
+export const uploadVideoResumable = async (file, onProgress = null, maxRetries = 5) => {
+  const { data: session } = await api.post('/api/uploads', {
+    filename: file.name,
+    size: file.size,
+  });
+  
+  let offset = session.offset;
+  let failures = 0;
+  for (;;) {
+    const chunk = file.slice(offset, offset + session.chunk_size);
+    try {
+      const response = await api.patch(`/api/uploads/${session.upload_id}`, chunk, {
+        headers: {
+          'Content-Type': 'application/offset+octet-stream',
+          'Upload-Offset': String(offset),
+        },
+        timeout: 60000,
+      });
+      failures = 0;
+      
+      if (response.data.job_id) {
+        if (onProgress) {
+          onProgress(1);
+        }
+        return response.data;
+      }
+      offset = response.data.offset;
+      if (onProgress) {
+        onProgress(offset / file.size);
+      }
+    } catch (error) {
+      // Only lost connections, offset mismatches (409) and server errors are
+      // worth retrying; any other 4xx (e.g. 415, after which the server has
+      // discarded the upload) is final
+      const retryable = !error.status || error.status === 409 || error.status >= 500;
+      failures += 1;
+      if (!retryable || failures >= maxRetries) {
+        console.error('Chunked upload error:', error);
+        throw error;
+      }
+      // A busy server (503) says when to come back; otherwise back off linearly
+      const retryAfter = error.status === 503 ? Number(error.headers?.['retry-after']) : NaN;
+      const delay = retryAfter > 0 ? retryAfter * 1000 : 1000 * failures;
+      await new Promise((resolve) => setTimeout(resolve, delay));
+      // Ask the server how much it kept, then resume from there
+      const { data: status } = await api.get(`/api/uploads/${session.upload_id}`);
+      offset = status.offset;
+    }
+  }
+};
+
 /**
  * Check job processing status
  * @param {string} jobId - Job ID to check
@@ -84,6 +150,125 @@ export const checkJobStatus = async (jobId) => {
   }
 };
 
+/**
+ * Wait for the next change to a job's status (long poll)
+ * @param {string} jobId - Job ID to watch
+ * @param {number|null} since - 'version' of the last status seen (null returns immediately)
+ * @param {number} timeout - Seconds the server may hold the request (default: 25)
+ * @returns {Promise<Object>} Job status information, with 'changed'
+ */
+export const waitForJobStatus = async (jobId, since = null, timeout = 25) => {
+  try {
+    const params = { timeout };
+    if (since !== null) {
+      params.since = since;
+    }
+    const response = await api.get(`/api/status/${jobId}/wait`, {
+      params,
+      timeout: (timeout + 10) * 1000,
+    });
+    return response.data;
+  } catch (error) {
+    console.error('Status wait error:', error);
+    throw error;
+  }
+};
+
+/**
+ * Subscribe to a job's status over Server-Sent Events
+ * @param {string} jobId - Job ID to watch
+ * @param {Function} onStatus - Called with each status update
+ * @param {Function} onError - Called if the stream fails before the job finishes
+ * @returns {Function} Closes the stream
+ */
+export const streamJobStatus = (jobId, onStatus, onError) => {
+  const source = new EventSource(`${API_BASE_URL}/api/status/${jobId}/stream`);
+  let finished = false;
+  
+  source.addEventListener('status', (event) => {
+    const status = JSON.parse(event.data);
+    if (status.status === 'completed' || status.status === 'error') {
+      finished = true;
+      source.close();
+    }
+    onStatus(status);
+  });
+  
+  source.onerror = () => {
+    // The server closes the stream once the job finishes
+    if (!finished) {
+      source.close();
+      onError(new Error('Status stream interrupted'));
+    }
+  };
+  
+  return () => source.close();
+};
+
+/**
+ * Follow a job's status until it completes or fails
+ * 
+ * Uses Server-Sent Events where the browser supports them, and falls back to
+ * long polling if the stream cannot be used (e.g. the server has no stream
+ * slot free), and to plain polling while long polls are refused too.
+ * @param {string} jobId - Job ID to watch
+ * @param {Function} onStatusUpdate - Callback for status updates
+ * @returns {Promise<Object>} Final job status
+ */
+export const watchJobStatus = (jobId, onStatusUpdate = null) => {
+  return new Promise((resolve, reject) => {
+    let lastStatus = null;
+    
+    const handleStatus = (status) => {
+      lastStatus = status;
+      if (onStatusUpdate) {
+        onStatusUpdate(status);
+      }
+      if (status.status === 'completed' || status.status === 'error') {
+        resolve(status);
+        return true;
+      }
+      return false;
+    };
+    
+    const longPoll = async () => {
+      try {
+        let since = lastStatus ? lastStatus.version : null;
+        for (;;) {
+          let status;
+          try {
+            status = await waitForJobStatus(jobId, since);
+          } catch (error) {
+            if (error.status !== 503) {
+              throw error;
+            }
+            // Every waiter slot on the server is taken: poll at the pace it asks for
+            const retryAfter = Number(error.headers?.['retry-after']);
+            await new Promise((resolve) => setTimeout(resolve, retryAfter > 0 ? retryAfter * 1000 : 2000));
+            continue;
+          }
+          since = status.version;
+          if (status.changed && handleStatus(status)) {
+            return;
+          }
+        }
+      } catch (error) {
+        reject(error);
+      }
+    };
+    
+    if (typeof EventSource === 'undefined') {
+      longPoll();
+      return;
+    }
+    
+    streamJobStatus(jobId, handleStatus, (error) => {
+      console.warn(`${error.message}; falling back to long polling`);
+      longPoll();
+    });
+  });
+};
+
 /**
  * Get job results
  * @param {string} jobId - Job ID to get results for
@@ -128,42 +313,17 @@ export const listJobs = async () => {
 };
 
 /**
- * Utility function to poll job status until completion
- * @param {string} jobId - Job ID to poll
+ * Utility function to follow job status until completion
+ * @param {string} jobId - Job ID to follow
  * @param {Function} onStatusUpdate - Callback for status updates
- * @param {number} interval - Polling interval in milliseconds (default: 2000)
  * @returns {Promise<Object>} Final job results
  */
-export const pollJobUntilComplete = async (jobId, onStatusUpdate = null, interval = 2000) => {
-  return new Promise((resolve, reject) => {
-    const poll = async () => {
-      try {
-        const status = await checkJobStatus(jobId);
-        
-        if (onStatusUpdate) {
-          onStatusUpdate(status);
-        }
-        
-        if (status.status === 'completed') {
-          try {
-            const results = await getJobResults(jobId);
-            resolve(results);
-          } catch (error) {
-            reject(error);
-          }
-        } else if (status.status === 'error') {
-          reject(new Error(status.error || 'Job processing failed'));
-        } else {
-          // Continue polling
-          setTimeout(poll, interval);
-        }
-      } catch (error) {
-        reject(error);
-      }
-    };
-    
-    poll();
-  });
+export const pollJobUntilComplete = async (jobId, onStatusUpdate = null) => {
+  const status = await watchJobStatus(jobId, onStatusUpdate);
+  if (status.status === 'error') {
+    throw new Error(status.error || 'Job processing failed');
+  }
+  return getJobResults(jobId);
 };
 
 /**